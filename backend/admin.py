@@ -1,8 +1,16 @@
+import logging
 import sqlite3
-from flask import jsonify, request
+from flask import jsonify
+from events import event_broadcaster, record_events
 from init_db import get_db_connection
+from matching import DEFAULT_TOP_K, matching_engine
+from passwords import check_password
+from streaming import json_rows
+from tokens import token_issuer
 
-def admin_login(_user, password):
+logger = logging.getLogger(__name__)
+
+def admin_login(username, password):
     """Authenticate an admin user.
     ---
     tags:
@@ -36,45 +44,52 @@ def admin_login(_user, password):
                         properties:
                             username:
                                 type: string
+                    token:
+                        type: string
+                        description: Bearer access token
         401:
             description: Invalid admin credentials
         500:
             description: Server error
     """
-    data = request.get_json()
-    print("DEBUG: admin_login received payload:", data)
-    if not data or 'username' not in data or 'password' not in data:
+    logger.debug("admin_login received payload for %s", username)
+    if not username or not password:
         return jsonify({'error': 'Missing username or password'}), 400
-
-    username = data['username']
-    password = data['password']
+    if not isinstance(username, str) or not isinstance(password, str):
+        return jsonify({'error': 'Username and password must be strings'}), 400
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute(
-            'SELECT * FROM admins WHERE username = ? AND password = ?',
-            (username, password)
+            'SELECT * FROM admins WHERE username = ?',
+            (username,)
         )
         admin = cursor.fetchone()
-        conn.close()
 
-        if admin:
-            print("DEBUG: admin_login successful for user:", admin['username'])
+        if admin and check_password(conn, 'admins', admin, password):
+            logger.info("admin_login successful for user %s", admin['username'])
             return jsonify({
                 'message': 'Admin login successful',
-                'admin': {'username': admin['username']}
+                'admin': {'username': admin['username']},
+                'token': token_issuer.issue(admin['username'], role='admin')
             })
-        print("DEBUG: admin_login invalid credentials for:", username)
+        logger.info("admin_login invalid credentials for %s", username)
         return jsonify({'error': 'Invalid admin credentials'}), 401
     except (sqlite3.Error, ValueError) as e:
-        print("DEBUG: admin_login exception:", e)
+        logger.exception("admin_login failed: %s", e)
         return jsonify({'error': str(e)}), 500
 
-def get_pending_questionnaires():
-    """Get all pending questionnaires.
+def get_pending_questionnaires(top_k=DEFAULT_TOP_K):
+    """Get all pending questionnaires with suggested pets.
     ---
     tags:
       - admin
+    parameters:
+      - name: suggest
+        in: query
+        type: integer
+        required: false
+        description: Number of best-matching pets to suggest per questionnaire (0 disables)
     responses:
         200:
             description: List of pending questionnaires
@@ -99,6 +114,15 @@ def get_pending_questionnaires():
                             type: string
                         status:
                             type: string
+                        suggested_pets:
+                            type: array
+                            items:
+                                type: object
+                                properties:
+                                    id:
+                                        type: integer
+                                    score:
+                                        type: number
         500:
             description: Internal Server Error
     """
@@ -112,20 +136,16 @@ def get_pending_questionnaires():
             WHERE q.status = 'PENDING'
         """)
         questionnaires = cursor.fetchall()
-        print("DEBUG: Retrieved pending questionnaires:", [dict(row) for row in questionnaires])
-        return jsonify([dict(row) for row in questionnaires]), 200
+        logger.debug("Retrieved %d pending questionnaires", len(questionnaires))
+        return jsonify(_with_suggestions(conn, questionnaires, top_k)), 200
     except sqlite3.Error as e:
-        print("DEBUG: get_pending_questionnaires exception:", e)
+        logger.exception("get_pending_questionnaires failed: %s", e)
         return jsonify({'error': 'Internal Server Error'}), 500
-    finally:
-        conn.close()
 
 def approve_questionnaire(questionnaire_id, pet_ids):
-    print(f"DEBUG: Approve questionnaire called for ID: {questionnaire_id} with pet_ids: {pet_ids}")
-    # If needed, additionally print the incoming request JSON payload:
-    data = request.get_json()
-    print("DEBUG: Received request JSON payload:", data)
-
+    logger.debug("Approve questionnaire %s with pet_ids %s", questionnaire_id, pet_ids)
+    if not _valid_pet_ids(pet_ids):
+        return jsonify({'error': 'pet_ids must be a non-empty list of pet ids'}), 400
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -135,7 +155,7 @@ def approve_questionnaire(questionnaire_id, pet_ids):
         """, (questionnaire_id,))
         questionnaire = cursor.fetchone()
         if questionnaire is None:
-            print("DEBUG: Questionnaire not found or already processed for ID:", questionnaire_id)
+            logger.info("Questionnaire %s not found or already processed", questionnaire_id)
             return jsonify({'error': 'Questionnaire not found or already processed'}), 404
 
         cursor.execute("""
@@ -146,25 +166,25 @@ def approve_questionnaire(questionnaire_id, pet_ids):
         cursor.execute("SELECT id FROM users WHERE username = ?", (questionnaire['username'],))
         user = cursor.fetchone()
         if user is None:
-            print("DEBUG: User not found for username:", questionnaire['username'])
+            logger.warning("User not found for username %s", questionnaire['username'])
             return jsonify({'error': 'User not found'}), 404
 
-        for pet_id in pet_ids:
-            cursor.execute("""
-                INSERT INTO approved_pets (user_id, pet_id)
-                VALUES (?, ?)
-            """, (user['id'], pet_id))
+        cursor.executemany("""
+            INSERT INTO approved_pets (user_id, pet_id)
+            VALUES (?, ?)
+        """, [(user['id'], pet_id) for pet_id in pet_ids])
+        record_events(conn, [('questionnaire', questionnaire['username'], {
+            'id': questionnaire_id, 'status': 'APPROVED', 'pet_ids': pet_ids})])
         conn.commit()
-        print("DEBUG: Questionnaire approved. Approved pet IDs:", pet_ids)
+        event_broadcaster.notify()
+        logger.info("Questionnaire %s approved with pet_ids %s", questionnaire_id, pet_ids)
         return jsonify({
             'message': 'Questionnaire approved successfully',
             'approved_pets': pet_ids
         }), 200
     except sqlite3.Error as e:
-        print("DEBUG: approve_questionnaire exception:", e)
+        logger.exception("approve_questionnaire failed: %s", e)
         return jsonify({'error': 'Internal Server Error'}), 500
-    finally:
-        conn.close()
 
 def reject_questionnaire(questionnaire_id):
     """Reject a questionnaire.
@@ -190,7 +210,7 @@ def reject_questionnaire(questionnaire_id):
         500:
             description: Internal Server Error
     """
-    print(f"DEBUG: Reject questionnaire called with id: {questionnaire_id}")
+    logger.debug("Reject questionnaire %s", questionnaire_id)
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -198,70 +218,384 @@ def reject_questionnaire(questionnaire_id):
             UPDATE questionnaire_answers 
             SET status = 'REJECTED' 
             WHERE id = ?
+            RETURNING username
         """, (questionnaire_id,))
-        if cursor.rowcount == 0:
-            print("DEBUG: Questionnaire not found for id:", questionnaire_id)
+        rejected = cursor.fetchone()
+        if rejected is None:
+            logger.info("Questionnaire %s not found", questionnaire_id)
             return jsonify({'error': 'Questionnaire not found'}), 404
+        record_events(conn, [('questionnaire', rejected['username'], {
+            'id': questionnaire_id, 'status': 'REJECTED'})])
         conn.commit()
-        print("DEBUG: Questionnaire rejected for id:", questionnaire_id)
+        event_broadcaster.notify()
+        logger.info("Questionnaire %s rejected", questionnaire_id)
         return jsonify({'message': 'Questionnaire rejected successfully'}), 200
     except sqlite3.Error as e:
-        print("DEBUG: reject_questionnaire exception:", e)
+        logger.exception("reject_questionnaire failed: %s", e)
         return jsonify({'error': 'Internal Server Error'}), 500
-    finally:
-        conn.close()
 
-def get_all_adoption_requests_from_db():
-    print("DEBUG: Starting get_all_adoption_requests_from_db() query")
+BULK_CHUNK = 500   # ids per IN (...) list, well under SQLite's variable limit
+
+def _chunks(items, size=BULK_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _is_id(value):
+    # JSON true/false arrive as bool, which is an int subclass: True would mean id 1
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _valid_pet_ids(pet_ids):
+    return isinstance(pet_ids, list) and pet_ids and all(_is_id(p) for p in pet_ids)
+
+def _parse_bulk_review(approvals, rejections):
+    """Split raw bulk input into valid decisions and per-item error outcomes.
+
+    Returns (decisions, outcomes) where decisions maps questionnaire id to
+    ('approve', pet_ids) or ('reject', None), and outcomes is the response
+    list in request order with None placeholders for valid items.
+    """
+    decisions, outcomes = {}, []
+    items = [('approve', a) for a in approvals] + [('reject', r) for r in rejections]
+    for action, item in items:
+        if action == 'approve':
+            qid = item.get('questionnaire_id') if isinstance(item, dict) else None
+            pet_ids = item.get('pet_ids') if isinstance(item, dict) else None
+            valid = _valid_pet_ids(pet_ids)
+        else:
+            qid, pet_ids, valid = item, None, True
+        if not _is_id(qid) or not valid:
+            outcomes.append({'questionnaire_id': qid, 'action': action, 'status': 'invalid'})
+        elif qid in decisions:
+            outcomes.append({'questionnaire_id': qid, 'action': action, 'status': 'duplicate'})
+        else:
+            decisions[qid] = (action, pet_ids)
+            outcomes.append(None)
+    return decisions, outcomes
+
+def bulk_review_questionnaires(approvals, rejections):
+    """Approve and reject many questionnaires in one transaction.
+    ---
+    tags:
+      - admin
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            approve:
+              type: array
+              items:
+                type: object
+                properties:
+                  questionnaire_id:
+                    type: integer
+                  pet_ids:
+                    type: array
+                    items:
+                      type: integer
+            reject:
+              type: array
+              items:
+                type: integer
+    responses:
+        200:
+            description: >
+                Per-item outcomes: APPROVED, REJECTED, not_found, user_not_found,
+                invalid or duplicate
+        500:
+            description: Internal Server Error
+    """
+    decisions, outcomes = _parse_bulk_review(approvals, rejections)
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        results, approved, rejected = _apply_bulk_review(conn, decisions)
+        conn.commit()
+        event_broadcaster.notify()
+    except sqlite3.Error as e:
+        conn.rollback()
+        logger.exception("bulk_review_questionnaires failed: %s", e)
+        return jsonify({'error': 'Internal Server Error'}), 500
+
+    qids = iter(decisions)
+    for i, outcome in enumerate(outcomes):
+        if outcome is None:
+            qid = next(qids)
+            outcomes[i] = {
+                'questionnaire_id': qid,
+                'action': decisions[qid][0],
+                'status': results[qid],
+            }
+    logger.info("Bulk review: %d approved, %d rejected", len(approved), len(rejected))
+    return jsonify({
+        'approved': len(approved),
+        'rejected': len(rejected),
+        'results': outcomes
+    }), 200
+
+def _apply_bulk_review(conn, decisions):
+    """Run the set-based reads and writes of a bulk review on an open transaction."""
+    # One set-based read resolves which ids are still pending and, for
+    # approvals, the user id the approved pets are stored against.
+    pending = {}
+    for chunk in _chunks(list(decisions)):
+        rows = conn.execute(f"""
+            SELECT q.id, q.username, u.id AS user_id
+            FROM questionnaire_answers q
+            LEFT JOIN users u ON u.username = q.username
+            WHERE q.id IN ({', '.join('?' * len(chunk))}) AND q.status = 'PENDING'
+        """, chunk)
+        pending.update((row['id'], (row['user_id'], row['username'])) for row in rows)
+
+    results, approved, rejected, approved_pets, events = {}, [], [], [], []
+    for qid, (action, pet_ids) in decisions.items():
+        if qid not in pending:
+            results[qid] = 'not_found'
+        elif action == 'reject':
+            rejected.append(qid)
+            results[qid] = 'REJECTED'
+            events.append(('questionnaire', pending[qid][1], {'id': qid, 'status': 'REJECTED'}))
+        elif pending[qid][0] is None:
+            results[qid] = 'user_not_found'
+        else:
+            approved.append(qid)
+            approved_pets.extend((pending[qid][0], pet_id) for pet_id in pet_ids)
+            results[qid] = 'APPROVED'
+            events.append(('questionnaire', pending[qid][1],
+                           {'id': qid, 'status': 'APPROVED', 'pet_ids': pet_ids}))
+
+    for status, ids in (('APPROVED', approved), ('REJECTED', rejected)):
+        for chunk in _chunks(ids):
+            conn.execute(
+                "UPDATE questionnaire_answers SET status = ? "
+                f"WHERE id IN ({', '.join('?' * len(chunk))})",
+                [status, *chunk]
+            )
+    conn.executemany(
+        "INSERT INTO approved_pets (user_id, pet_id) VALUES (?, ?)", approved_pets
+    )
+    record_events(conn, events)
+    return results, approved, rejected
+
+QUEUE_PAGE_SIZE = 50
+MAX_QUEUE_PAGE_SIZE = 500
+MAX_SUGGESTIONS = 50
+MAX_ROW_ID = 2 ** 63 - 1   # largest SQLite INTEGER
+# queue section -> (table, keyset column, allowed statuses)
+QUEUES = {
+    'questionnaire': ('questionnaire_answers', 'id', ('PENDING', 'APPROVED', 'REJECTED')),
+    'adoption': ('adoptions', 'request_id', ('PENDING', 'APPROVE', 'REJECT')),
+}
+
+def _bounded_int(args, name, default, low, high):
+    """Query arg `name` (or `default`) as an int in [low, high]; ValueError if not."""
+    try:
+        value = int(args.get(name, default))
+    except (TypeError, ValueError):
+        value = None
+    if value is None or not low <= value <= high:
+        raise ValueError(f'{name} must be an integer between {low} and {high}')
+    return value
+
+def _parse_statuses(value, allowed):
+    """'PENDING,APPROVED' / 'ALL' -> tuple of statuses; ValueError if unknown."""
+    if value.upper() == 'ALL':
+        return allowed
+    statuses = tuple(dict.fromkeys(s.strip().upper() for s in value.split(',') if s.strip()))
+    unknown = [s for s in statuses if s not in allowed]
+    if unknown or not statuses:
+        raise ValueError(f"Unknown status: {', '.join(unknown) or value!r}")
+    return statuses
+
+def _queue_section(cursor, name, statuses, after_id, limit):
+    """One oldest-first keyset page of a queue plus its per-status counts.
+
+    Table and column names come from QUEUES, never from the client. A
+    single status seeks the (status, key) index; the counts are read from
+    status_counts, which triggers keep, so neither grows with history.
+    """
+    table, key, allowed = QUEUES[name]
+    cursor.execute(f"""
+        SELECT * FROM {table}
+        WHERE status IN ({', '.join('?' * len(statuses))}) AND {key} > ?
+        ORDER BY {key}
+        LIMIT ?
+    """, (*statuses, after_id, limit + 1))
+    rows = cursor.fetchall()
+    cursor.execute("SELECT status, n FROM status_counts WHERE table_name = ?", (table,))
+    counts = dict.fromkeys(allowed, 0)
+    counts.update((row['status'], row['n']) for row in cursor.fetchall())
+    return {
+        'items': rows[:limit],
+        'next_after_id': rows[limit - 1][key] if len(rows) > limit else None,
+        'counts': counts
+    }
+
+def _with_suggestions(conn, rows, top_k):
+    """Questionnaire rows as dicts, pending ones with suggested_pets."""
+    pending = [row for row in rows if row['status'] == 'PENDING']
+    matching_engine.refresh(conn)
+    suggestions = dict(zip((row['id'] for row in pending), matching_engine.top_k(pending, top_k)))
+    items = []
+    for row in rows:
+        item = dict(row)
+        if row['id'] in suggestions:
+            item['suggested_pets'] = [
+                {'id': pet_id, 'score': score} for pet_id, score in suggestions[row['id']]
+            ]
+        items.append(item)
+    return items
+
+def get_admin_queue(args):
+    """Paginated admin work queue with per-status counts.
+    ---
+    tags:
+      - admin
+    parameters:
+      - name: questionnaire_status
+        in: query
+        type: string
+        required: false
+        description: Comma-separated statuses or ALL (default PENDING)
+      - name: adoption_status
+        in: query
+        type: string
+        required: false
+        description: Comma-separated statuses or ALL (default PENDING)
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Page size for each list (default 50, max 500)
+      - name: questionnaire_after_id
+        in: query
+        type: integer
+        required: false
+      - name: adoption_after_id
+        in: query
+        type: integer
+        required: false
+      - name: suggest
+        in: query
+        type: integer
+        required: false
+        description: Suggested pets per pending questionnaire (default 3, max 50, 0 disables)
+    responses:
+        200:
+            description: >
+                questionnaires and adoptions, each with items (oldest first),
+                next_after_id and counts per status
+        400:
+            description: Invalid query parameters
+        500:
+            description: Internal Server Error
+    """
+    try:
+        limit = _bounded_int(args, 'limit', QUEUE_PAGE_SIZE, 1, MAX_QUEUE_PAGE_SIZE)
+        top_k = _bounded_int(args, 'suggest', DEFAULT_TOP_K, 0, MAX_SUGGESTIONS)
+        pages = {
+            name: (_parse_statuses(args.get(f'{name}_status', 'PENDING'), allowed),
+                   _bounded_int(args, f'{name}_after_id', 0, 0, MAX_ROW_ID))
+            for name, (_, _, allowed) in QUEUES.items()
+        }
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM adoptions")
-        rows = cursor.fetchall()
-        adoption_requests = [dict(row) for row in rows]
-        print("DEBUG: Retrieved adoption requests:", adoption_requests)
-        return adoption_requests
+        sections = {
+            name: _queue_section(cursor, name, statuses, after_id, limit)
+            for name, (statuses, after_id) in pages.items()
+        }
+        questionnaires, adoptions = sections['questionnaire'], sections['adoption']
+        questionnaires['items'] = _with_suggestions(conn, questionnaires['items'], top_k)
+        adoptions['items'] = [dict(row) for row in adoptions['items']]
+        return jsonify({'questionnaires': questionnaires, 'adoptions': adoptions}), 200
+    except sqlite3.Error as e:
+        logger.exception("get_admin_queue failed: %s", e)
+        return jsonify({'error': 'Internal Server Error'}), 500
+
+def get_all_adoption_requests_from_db():
+    """JSON response listing every adoption request (streamed), or None on error."""
+    try:
+        return json_rows("SELECT * FROM adoptions WHERE request_id > ? ORDER BY request_id",
+                         (0,), 'request_id')
     except sqlite3.Error as e:
-        print("DEBUG: Exception in get_all_adoption_requests_from_db:", e)
+        logger.exception("get_all_adoption_requests_from_db failed: %s", e)
         return None
-    finally:
-        conn.close()
-        print("DEBUG: Database connection closed in get_all_adoption_requests_from_db")
 
-def create_adoption_request_in_db(data):
+MAX_IDEMPOTENCY_KEY = 255
+
+# One round trip: the pet's name is copied in the same statement, and a repeat
+# of an open (pet_id, username) request or of an idempotency key inserts nothing.
+CREATE_ADOPTION_SQL = """
+    INSERT INTO adoptions (pet_id, username, status, pet_name, idempotency_key)
+    SELECT id, ?, 'PENDING', name, ? FROM pets WHERE id = ?
+    ON CONFLICT DO NOTHING
+    RETURNING *
+"""
+
+def _existing_adoption_request(cursor, pet_id, username, idempotency_key):
+    """The request a duplicate submission collided with, and whether it matches."""
+    if idempotency_key is not None:
+        cursor.execute("SELECT * FROM adoptions WHERE username = ? AND idempotency_key = ?",
+                       (username, idempotency_key))
+        row = cursor.fetchone()
+        if row is not None:
+            return row, str(row['pet_id']) == str(pet_id)
+    cursor.execute("SELECT * FROM adoptions WHERE pet_id = ? AND username = ?"
+                   " AND status = 'PENDING'", (pet_id, username))
+    return cursor.fetchone(), True
+
+def _adoption_request_error(pet_id, username, idempotency_key):
+    if pet_id is None or not username:
+        return 'pet_id and username are required'
+    if not _is_id(pet_id) or pet_id < 1:
+        return 'pet_id must be a positive integer'
+    if not isinstance(username, str):
+        return 'username must be a string'
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY:
+        return f'Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY} characters'
+    return None
+
+def create_adoption_request_in_db(data, idempotency_key=None):
+    """Create a PENDING adoption request, or return the one already open.
+
+    Returns (body, status): 201 with the new row, 200 with the existing
+    row when the user already has an open request for the pet or repeats
+    an idempotency key, 404 for an unknown pet, 400 or 422 for a bad
+    request, 500 on a database error.
+    """
     pet_id = data.get('pet_id')
     username = data.get('username')
-    if pet_id is None or not username:
-        print("DEBUG: Missing pet_id or username in data", data)
-        return None, "pet_id and username are required"
+    error = _adoption_request_error(pet_id, username, idempotency_key)
+    if error:
+        logger.info("Invalid adoption request %s: %s", data, error)
+        return {'error': error}, 400
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        # Find the pet_name from the pets table
-        cursor.execute("SELECT name FROM pets WHERE id = ?", (pet_id,))
-        pet_row = cursor.fetchone()
-        if pet_row is None:
-            print("DEBUG: Pet not found for pet_id", pet_id)
-            return None, "Pet not found"
-        pet_name = pet_row["name"]
-        print("DEBUG: Found pet_name:", pet_name)
-
-        query = """
-            INSERT INTO adoptions (pet_id, username, status, pet_name)
-            VALUES (?, ?, 'PENDING', ?)
-        """
-        cursor.execute(query, (pet_id, username, pet_name))
-        conn.commit()
-        new_id = cursor.lastrowid
-        print("DEBUG: New adoption request id:", new_id)
-        # Retrieve the newly inserted adoption request
-        cursor.execute("SELECT * FROM adoptions WHERE request_id = ?", (new_id,))
-        request_row = cursor.fetchone()
+        cursor.execute(CREATE_ADOPTION_SQL, (username, idempotency_key, pet_id))
+        created = cursor.fetchall()
+        if created:
+            conn.commit()
+            logger.debug("Created adoption request %s", created[0]['request_id'])
+            return dict(created[0]), 201
+        # nothing inserted: an unknown pet, or a duplicate of an existing request
+        row, matches = _existing_adoption_request(cursor, pet_id, username, idempotency_key)
         conn.commit()
-        print("DEBUG: Retrieved new adoption request row:", request_row)
-        return dict(request_row), None
+        if row is None:
+            logger.info("Pet not found for pet_id %s", pet_id)
+            return {'error': 'Pet not found'}, 404
+        if not matches:
+            logger.info("Idempotency key of request %s reused for pet %s",
+                        row['request_id'], pet_id)
+            return {'error': 'Idempotency-Key was already used for a different request'}, 422
+        return dict(row), 200
     except sqlite3.Error as e:
-        print("DEBUG: SQLite error in create_adoption_request_in_db:", e)
-        return None, str(e)
-    finally:
-        conn.close()
+        conn.rollback()
+        logger.exception("create_adoption_request_in_db failed: %s", e)
+        return {'error': 'Internal Server Error'}, 500
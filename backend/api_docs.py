@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+from importlib import metadata
+from werkzeug.wrappers import Response
+
+logger = logging.getLogger(__name__)
+
+# URL prefixes flasgger serves: the UI, the spec JSON and their assets.
+DOCS_PREFIXES = ('/apidocs', '/apispec', '/flasgger_static', '/oauth2-redirect.html')
+
+# Schemas shared by several handlers; docstrings $ref them as '#/definitions/<name>'.
+SWAGGER_TEMPLATE = {
+    'definitions': {
+        'Pet': {
+            'type': 'object',
+            'properties': {
+                'id': {'type': 'integer'},
+                'name': {'type': 'string'},
+                'type': {'type': 'string'},
+                'size': {'type': 'string'},
+                'activity_level': {'type': 'string'},
+                'maintenance_level': {'type': 'string'},
+                'budget': {'type': 'string'},
+            },
+        },
+    },
+}
+
+class LazyApiDocs:
+    """WSGI middleware that serves the Swagger UI and spec on demand.
+
+    Importing flasgger and parsing every handler's YAML docstring is paid
+    on the first docs request instead of at startup. build_docs_app()
+    returns a Flask app that carries the same routes plus flasgger; it is
+    built once per process. Generated specs are written to cache_dir under
+    a key hashed from the source files of every view function (and the
+    flasgger version), so later processes serve /apispec* straight from
+    disk without importing flasgger at all. An empty cache_dir disables
+    the disk cache.
+    """
+
+    def __init__(self, app, build_docs_app, cache_dir=None):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.build_docs_app = build_docs_app
+        self.cache_dir = cache_dir
+        self._docs_app = None
+        self._key = None
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(DOCS_PREFIXES):
+            return self.wsgi_app(environ, start_response)
+        if path.startswith('/apispec') and self.cache_dir:
+            return self._spec(path, environ, start_response)
+        return self.docs_app()(environ, start_response)
+
+    def docs_app(self):
+        if self._docs_app is None:
+            with self._lock:
+                if self._docs_app is None:
+                    self._docs_app = self.build_docs_app()
+                    logger.info("API docs app built on first request")
+        return self._docs_app
+
+    def spec_key(self):
+        """Hash of the handler sources and this module's template; changes whenever the spec can."""
+        if self._key is None:
+            files = sorted({
+                sys.modules[view.__module__].__file__
+                for view in self.app.view_functions.values()
+                if getattr(sys.modules.get(view.__module__), '__file__', None)
+            } | {__file__})
+            digest = hashlib.sha256(metadata.version('flasgger').encode('utf-8'))
+            for path in files:
+                with open(path, 'rb') as source:
+                    digest.update(source.read())
+            self._key = digest.hexdigest()[:16]
+        return self._key
+
+    def _spec(self, path, environ, start_response):
+        name = path.strip('/').replace('/', '_')
+        cache_path = os.path.join(self.cache_dir, f'{name}-{self.spec_key()}')
+        try:
+            with open(cache_path, 'rb') as cached:
+                body = cached.read()
+        except OSError:
+            response = Response.from_app(self.docs_app(), environ)
+            if response.status_code == 200:
+                self._store(cache_path, response.get_data())
+            return response(environ, start_response)
+        return Response(body, mimetype='application/json')(environ, start_response)
+
+    def _store(self, cache_path, body):
+        """Atomically write a spec; concurrent workers may race harmlessly."""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(body)
+            os.replace(tmp_path, cache_path)
+            stale = os.path.basename(cache_path).rsplit('-', 1)[0] + '-'
+            for entry in os.listdir(self.cache_dir):
+                if entry.startswith(stale) and entry != os.path.basename(cache_path):
+                    os.remove(os.path.join(self.cache_dir, entry))
+        except OSError as e:
+            logger.warning("could not cache API spec at %s: %s", cache_path, e)
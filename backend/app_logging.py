@@ -0,0 +1,89 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+# Attributes every LogRecord has; anything else came in through `extra=`.
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 6),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Enqueue a pickle-safe copy; JSON formatting happens on the listener."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class _State:  # pylint: disable=too-few-public-methods
+    listener = None
+
+def parse_module_levels(spec):
+    """Parse 'admin=DEBUG,pets=WARNING' into {'admin': 'DEBUG', ...}."""
+    levels = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def configure_logging(level=None, module_levels=None, stream=None):
+    """Route all logging through a queue to a background JSON writer.
+
+    Request threads only enqueue records; a QueueListener thread formats
+    and writes them, so slow stdout/stderr never stalls a request. Levels
+    default to the LOG_LEVEL and LOG_LEVELS ("module=LEVEL,...") env vars.
+    Calling this again replaces the previous configuration.
+    """
+    level = (level or os.environ.get('LOG_LEVEL', 'INFO')).upper()
+    if module_levels is None:
+        module_levels = parse_module_levels(os.environ.get('LOG_LEVELS'))
+    shutdown_logging()
+
+    records = queue.SimpleQueue()
+    writer = logging.StreamHandler(stream or sys.stderr)
+    writer.setFormatter(JsonFormatter())
+    _State.listener = logging.handlers.QueueListener(records, writer, respect_handler_level=True)
+    _State.listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(records))
+    root.setLevel(level)
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    if _State.listener is not None:
+        _State.listener.stop()
+        _State.listener = None
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,283 @@
+# pylint: disable=R0902,R0913,R0914
+import asyncio
+import io
+import logging
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.utils import formatdate
+from urllib.parse import unquote_to_bytes
+
+logger = logging.getLogger(__name__)
+
+MAX_HEAD_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024  # larger request bodies are refused with a 413, unread
+KEEPALIVE_TIMEOUT = 15.0     # idle seconds before a keep-alive connection is closed
+BODY_BATCH_BYTES = 64 * 1024 # response bytes pulled from the app per executor call
+NO_BODY_STATUSES = ('1', '204', '304')
+# environ flag: a streamed body may yield a concurrent.futures.Future to say it
+# has nothing to send until the future completes; it is awaited on the loop
+AWAIT_FUTURES = 'pets.await_futures'
+
+class BadRequest(ValueError):
+    """The request head could not be parsed."""
+
+def parse_head(head):
+    """(method, target, version, [(lowercased name, value)]) of a request head."""
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ')
+    except ValueError as e:
+        raise BadRequest(f'bad request line {lines[0]!r}') from e
+    if not version.startswith('HTTP/1.'):
+        raise BadRequest(f'unsupported protocol {version!r}')
+    headers = []
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(':')
+        if not sep or not name or name != name.strip():
+            raise BadRequest(f'bad header line {line!r}')
+        headers.append((name.lower(), value.strip()))
+    return method, target, version, headers
+
+def build_environ(head, body, server_address, peer):
+    method, target, version, headers = head
+    path, _, query = target.partition('?')
+    environ = {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': unquote_to_bytes(path).decode('latin-1'),
+        'QUERY_STRING': query,
+        'REQUEST_URI': target,
+        'RAW_URI': target,
+        'SERVER_NAME': str(server_address[0]),
+        'SERVER_PORT': str(server_address[1]),
+        'SERVER_PROTOCOL': version,
+        'REMOTE_ADDR': str(peer[0]),
+        'REMOTE_PORT': str(peer[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        AWAIT_FUTURES: True,
+        'wsgi.run_once': False,
+    }
+    for name, value in headers:
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'content-length':
+            environ['CONTENT_LENGTH'] = value
+        elif '_' not in name:   # X_User would otherwise shadow X-User
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+def _pull(iterator, limit=BODY_BATCH_BYTES):
+    """Up to about limit bytes of body chunks, whether the body is done, and
+    the Future to await before pulling again, if the body yielded one."""
+    chunks, size = [], 0
+    for chunk in iterator:
+        if isinstance(chunk, Future):
+            return chunks, False, chunk
+        if chunk:
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= limit:
+                return chunks, False, None
+    return chunks, True, None
+
+def call_app(app, environ):
+    """Run a WSGI app up to its first body batch (on an executor thread)."""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info and response:
+            raise exc_info[1].with_traceback(exc_info[2])
+        response.update(status=status, headers=headers)
+
+    result = app(environ, start_response)
+    iterator = iter(result)
+    chunks, done, waiter = _pull(iterator)
+    if done and hasattr(result, 'close'):
+        result.close()
+    return (response['status'], response['headers'], chunks,
+            None if done else (iterator, result, waiter))
+
+class AsyncWSGIServer:
+    """HTTP/1.1 server on an asyncio event loop that runs a WSGI app on a thread pool.
+
+    Reading requests, writing responses and idle keep-alive connections
+    cost no thread, so thousands of open connections are cheap; only
+    running the app occupies one of `threads` executor threads, and each
+    request gets the next free one whichever connection it came from.
+    Responses the app streams are pulled BODY_BATCH_BYTES at a time and
+    sent chunked; a streamed body that yields a Future (see AWAIT_FUTURES)
+    is resumed when it completes, without holding a thread meanwhile.
+    A request body is read whole before the app runs, so one declaring
+    more than max_body bytes is answered 413 without reading it.
+    Same interface as serve.PooledWSGIServer: serve_forever(), shutdown()
+    from another thread, drain().
+    """
+
+    def __init__(self, app, sock, threads, max_body=MAX_BODY_BYTES):
+        self.app = app
+        self.max_body = max_body
+        self.sock = sock
+        self.server_address = sock.getsockname()[:2]
+        self._executor = ThreadPoolExecutor(threads, thread_name_prefix='http')
+        self._loop = None
+        self._stop = None
+        self._started = threading.Event()
+        self._stopped = threading.Event()
+        self._connections = {}   # task -> True while a request is being handled
+        self._date = (0, '')
+
+    def serve_forever(self):
+        try:
+            asyncio.run(self._serve())
+        finally:
+            self._stopped.set()
+
+    def shutdown(self):
+        """Stop accepting, close idle connections, finish in-flight requests."""
+        self._started.wait()
+        self._loop.call_soon_threadsafe(self._stop.set)
+        self._stopped.wait()
+
+    def drain(self):
+        self._executor.shutdown(wait=True)
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        server = await asyncio.start_server(self._connection, sock=self.sock,
+                                            limit=MAX_HEAD_BYTES)
+        self._started.set()
+        await self._stop.wait()
+        server.close()
+        for task, busy in list(self._connections.items()):
+            if not busy:
+                task.cancel()
+        if self._connections:
+            await asyncio.wait(list(self._connections))
+        await server.wait_closed()
+
+    def _http_date(self):
+        now = int(self._loop.time())
+        if self._date[0] != now:
+            self._date = (now, formatdate(usegmt=True))
+        return self._date[1]
+
+    async def _connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = False
+        peer = writer.get_extra_info('peername') or ('', 0)
+        try:
+            while not self._stop.is_set():
+                try:
+                    raw = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                        asyncio.TimeoutError, ConnectionError):
+                    break
+                self._connections[task] = True
+                if not await self._request(raw, reader, writer, peer):
+                    break
+                self._connections[task] = False
+        except (asyncio.CancelledError, ConnectionError):
+            pass
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("connection from %s failed", peer[0])
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def _request(self, raw, reader, writer, peer):
+        """Handle one request; False when the connection should close."""
+        try:
+            head = parse_head(raw[:-4])
+            fields = dict(head[3])
+            if 'chunked' in fields.get('transfer-encoding', ''):
+                raise BadRequest('chunked request bodies are not supported')
+            length = int(fields.get('content-length', 0))
+            if length < 0:
+                raise BadRequest(f'negative Content-Length {length}')
+        except ValueError as e:
+            logger.info("bad request from %s: %s", peer[0], e)
+            writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n'
+                         b'Connection: close\r\n\r\n')
+            await writer.drain()
+            return False
+        if length > self.max_body:
+            logger.info("request body of %d bytes from %s refused", length, peer[0])
+            writer.write(b'HTTP/1.1 413 Payload Too Large\r\nContent-Length: 0\r\n'
+                         b'Connection: close\r\n\r\n')
+            await writer.drain()
+            return False
+        method, _, version, _ = head
+        if length and fields.get('expect', '').lower() == '100-continue':
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        body = await reader.readexactly(length) if length else b''
+        environ = build_environ(head, body, self.server_address, peer)
+        keep_alive = (version == 'HTTP/1.1'
+                      and fields.get('connection', '').lower() != 'close')
+        try:
+            response = await self._loop.run_in_executor(
+                self._executor, call_app, self.app, environ)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("error handling %s %s", method, environ['PATH_INFO'])
+            response = ('500 Internal Server Error', [('Content-Length', '0')], [], None)
+        return await self._respond(writer, method, version, keep_alive, response)
+
+    async def _respond(self, writer, method, version, keep_alive, response):
+        """Frame and send call_app()'s response; False when the connection should close."""
+        status, headers, chunks, rest = response
+        names = {name.lower() for name, _ in headers}
+        chunked = False
+        if 'content-length' not in names:
+            if rest is None:
+                if method != 'HEAD' and not status.startswith(NO_BODY_STATUSES):
+                    headers.append(('Content-Length', str(sum(map(len, chunks)))))
+            elif version == 'HTTP/1.1':
+                chunked = True
+                headers.append(('Transfer-Encoding', 'chunked'))
+            else:
+                keep_alive = False   # HTTP/1.0 stream: the close ends the body
+        headers.append(('Date', self._http_date()))
+        if not keep_alive:
+            headers.append(('Connection', 'close'))
+        lines = [f'HTTP/1.1 {status}'] + [f'{name}: {value}' for name, value in headers]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        try:
+            self._write(writer, chunks, chunked)
+            await writer.drain()
+            while rest is not None:
+                if rest[2] is not None:
+                    # the body is waiting for data; no executor thread waits with it
+                    await asyncio.wrap_future(rest[2])
+                chunks, done, waiter = await self._loop.run_in_executor(
+                    self._executor, _pull, rest[0])
+                rest = (rest[0], rest[1], waiter)
+                self._write(writer, chunks, chunked)
+                await writer.drain()
+                if done:
+                    if chunked:
+                        writer.write(b'0\r\n\r\n')
+                    break
+        finally:
+            if rest is not None and hasattr(rest[1], 'close'):
+                await self._loop.run_in_executor(self._executor, rest[1].close)
+        await writer.drain()
+        return keep_alive
+
+    @staticmethod
+    def _write(writer, chunks, chunked):
+        for chunk in chunks:
+            if chunked:
+                writer.write(b'%x\r\n' % len(chunk))
+                writer.write(chunk)
+                writer.write(b'\r\n')
+            else:
+                writer.write(chunk)
@@ -0,0 +1,81 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, g, has_app_context, has_request_context, request
+from init_db import get_pool
+
+DB_THREADS = 4   # SQLite runs one writer at a time; a few readers saturate it
+
+_loops = threading.local()
+
+def _thread_loop():
+    loop = getattr(_loops, 'loop', None)
+    if loop is None:
+        loop = _loops.loop = asyncio.new_event_loop()
+    return loop
+
+class AsyncFlask(Flask):
+    """Flask that runs `async def` views without the asgiref dependency.
+
+    Each request thread keeps one event loop and runs the view coroutine
+    to completion on it, inside the request's context. Flask's pipeline
+    around the view stays synchronous, so a coroutine view pays off where
+    it awaits several independent things at once (see db_executor).
+    """
+
+    def async_to_sync(self, func):
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            return _thread_loop().run_until_complete(func(*args, **kwargs))
+        return run
+
+class DBExecutor:
+    """Bounded thread pool for the blocking SQLite calls of async views.
+
+    run(func, *args) awaits func(conn, *args) on a DB thread with its own
+    pooled connection, so queries gathered by one view run concurrently
+    and the event loop never blocks on SQLite. The pool is sized for the
+    database, not for the number of requests in flight.
+    """
+
+    def __init__(self, max_workers=DB_THREADS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def configure(self, max_workers):
+        with self._lock:
+            if max_workers != self.max_workers and self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            self.max_workers = max_workers
+
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='db')
+        return self._executor
+
+    async def run(self, func, *args):
+        # tag queries with the calling route; DB time is added to the request's
+        tag = request.url_rule.rule if has_request_context() and request.url_rule else None
+        result, seconds = await asyncio.get_running_loop().run_in_executor(
+            self.executor(), self._call, tag, func, args
+        )
+        if has_app_context():
+            g.db_seconds = g.get('db_seconds', 0.0) + seconds
+        return result
+
+    @staticmethod
+    def _call(tag, func, args):
+        pool = get_pool()
+        conn = pool.acquire()
+        conn.begin(tag)
+        try:
+            return func(conn, *args), conn.take_db_time()
+        finally:
+            pool.release(conn)
+
+db_executor = DBExecutor()
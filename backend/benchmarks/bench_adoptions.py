@@ -0,0 +1,112 @@
+# pylint: disable=C0114,C0116,C0413,E0401
+"""Write throughput of adoption request creation: four statements vs one.
+
+A database with --pets generated pets is built per run; then --requests
+submissions for distinct (pet, user) pairs are made on --threads
+threads, each inside a request context on the app's pooled connections:
+
+    old   the previous handler: SELECT the pet's name, INSERT, commit,
+          SELECT the new row back, commit (and the previous indexes)
+    new   create_adoption_request_in_db(): one INSERT ... SELECT ...
+          RETURNING and one commit
+
+The same submissions are then repeated (a double-clicked button, a
+client retry): the old path inserts a second request, the new one
+returns the first. --synchronous FULL makes every commit wait for an
+fsync, as on a database that must not lose acknowledged writes.
+
+Run from the backend directory:
+
+    python benchmarks/bench_adoptions.py --requests 20000 --threads 1 4
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import init_db
+from admin import create_adoption_request_in_db
+from seed_db import generate_data
+
+def old_create(data):
+    conn = init_db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM pets WHERE id = ?", (data['pet_id'],))
+    pet_name = cursor.fetchone()["name"]
+    cursor.execute("INSERT INTO adoptions (pet_id, username, status, pet_name)"
+                   " VALUES (?, ?, 'PENDING', ?)", (data['pet_id'], data['username'], pet_name))
+    conn.commit()
+    cursor.execute("SELECT * FROM adoptions WHERE request_id = ?", (cursor.lastrowid,))
+    row = dict(cursor.fetchone())
+    conn.commit()
+    return row, 201
+
+def new_create(data):
+    return create_adoption_request_in_db(data)
+
+def submit(app, create, submissions, threads):
+    def worker(part):
+        for data in part:
+            with app.test_request_context('/api/admin/adoptions', method='POST'):
+                create(data)
+    workers = [threading.Thread(target=worker, args=(submissions[i::threads],))
+               for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return len(submissions) / (time.perf_counter() - start)
+
+def run(variant, args, threads):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        init_db.init_db(db_path).close()
+        generate_data(db_path, {'pets': args.pets}, seed=1)
+        if variant == 'old':
+            conn = sqlite3.connect(db_path)
+            conn.execute("DROP INDEX idx_adoptions_pending_pet_user")
+            conn.execute("DROP INDEX idx_adoptions_idempotency_key")
+            conn.close()
+        from main import create_app  # pylint: disable=import-outside-toplevel
+        app = create_app({'DATABASE': db_path, 'LOG_LEVEL': 'ERROR', 'ENABLE_SWAGGER': False})
+        pool = init_db.get_pool()
+        pool.pragmas += (('synchronous', args.synchronous),)   # the last setting wins
+        create = {'old': old_create, 'new': new_create}[variant]
+        submissions = [{'pet_id': 1 + i % args.pets, 'username': f'user{i // args.pets}'}
+                       for i in range(args.requests)]
+        unique = submit(app, create, submissions, threads)
+        repeated = submit(app, create, submissions, threads)
+        conn = sqlite3.connect(db_path)
+        rows, = conn.execute("SELECT COUNT(*) FROM adoptions").fetchone()
+        conn.close()
+        return unique, repeated, rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pets', type=int, default=10_000)
+    parser.add_argument('--requests', type=int, default=20_000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--synchronous', choices=('NORMAL', 'FULL'), default='NORMAL')
+    args = parser.parse_args()
+
+    print(f"{args.requests} submissions, then the same again; {args.pets} pets,"
+          f" synchronous={args.synchronous}", file=sys.stderr)
+    for threads in args.threads:
+        baseline = None
+        for variant in ('old', 'new'):
+            unique, repeated, rows = run(variant, args, threads)
+            baseline = baseline or unique
+            print(f"  {threads} thread(s) {variant}: {unique:8.0f} creates/s"
+                  f" ({unique / baseline:4.2f}x)  repeats {repeated:8.0f}/s"
+                  f"  -> {rows} requests stored")
+
+if __name__ == '__main__':
+    main()
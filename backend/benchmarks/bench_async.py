@@ -0,0 +1,180 @@
+# pylint: disable=C0114,C0116,C0413,E0401,R0914
+"""Threaded vs async serving mode with many concurrent keep-alive connections.
+
+For each mode a fresh serve.py is started against a temporary seeded
+database, then --connections keep-alive connections (spread over
+--client-procs asyncio client processes) each send requests back to back
+for --duration seconds. A request that gets no response within
+--timeout seconds counts as a timeout. The threaded server handles a
+connection on one of its threads until it closes, so most of 1,000
+connections wait in the listen backlog while the async server accepts
+all of them at once. Connections the server closes are reopened, as an
+HTTP client's connection pool would; the reopens are reported too.
+
+Run from the backend directory:
+
+    python benchmarks/bench_async.py --connections 1000 --duration 10
+    python benchmarks/bench_async.py --connections 1000 --path /api/users/user2/dashboard \\
+        --token-user user2 --pets 10000 --users 1000 --questionnaires 5000 --adoptions 5000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import init_db
+from seed_db import generate_data, seed_db
+from tokens import token_issuer
+from bench_workers import free_port, wait_ready
+
+SECRET_KEY = 'bench-secret'
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status, headers.get('connection', '').lower() != 'close'
+
+async def connect(port, timeout):
+    return await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+
+async def connection(port, request, deadline, timeout, stats):
+    served = False
+    writer = None
+    try:
+        reader, writer = await connect(port, timeout)
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            writer.write(request)
+            # the connect time of a reopened connection counts towards the request
+            status, keep_alive = await asyncio.wait_for(read_response(reader), timeout)
+            if not keep_alive:
+                writer.close()
+                reader, writer = await connect(port, timeout)
+                stats['reopened'] += 1
+            stats['latencies'].append(time.perf_counter() - start)
+            if status != 200:
+                stats['errors'] += 1
+            served = True
+    except asyncio.TimeoutError:
+        stats['timeouts'] += 1
+    except (OSError, asyncio.IncompleteReadError, ValueError):
+        stats['errors'] += 1
+    finally:
+        if writer is not None:
+            writer.close()
+        stats['served'] += served
+
+def client(port, request, connections, args, results):
+    stats = {'latencies': [], 'errors': 0, 'timeouts': 0, 'served': 0, 'reopened': 0}
+
+    async def run_all():
+        deadline = time.monotonic() + args.duration
+        await asyncio.gather(*(connection(port, request, deadline, args.timeout, stats)
+                               for _ in range(connections)))
+    asyncio.run(run_all())
+    results.put(stats)
+
+def run(args, mode, db_path, request):
+    port = free_port()
+    # no per-request access log in either mode
+    env = dict(os.environ, LOG_LEVEL='WARNING', LOG_LEVELS='werkzeug=WARNING',
+               DATABASE=db_path, SECRET_KEY=SECRET_KEY)
+    with subprocess.Popen(
+        [sys.executable, 'serve.py', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(args.workers), '--threads', str(args.threads), '--mode', mode],
+        cwd=BACKEND_DIR, env=env,
+    ) as server:
+        try:
+            wait_ready(port)
+            results = multiprocessing.Queue()
+            per_proc = [args.connections // args.client_procs] * args.client_procs
+            per_proc[0] += args.connections - sum(per_proc)
+            clients = [
+                multiprocessing.Process(target=client, args=(port, request, n, args, results))
+                for n in per_proc
+            ]
+            started = time.monotonic()
+            for proc in clients:
+                proc.start()
+            totals = [results.get() for _ in clients]
+            elapsed = time.monotonic() - started
+            for proc in clients:
+                proc.join()
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+    latencies = sorted(l for t in totals for l in t['latencies'])
+
+    def pct(q):
+        if not latencies:
+            return float('nan')
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': pct(0.50), 'p95': pct(0.95), 'p99': pct(0.99),
+        'served': sum(t['served'] for t in totals),
+        'timeouts': sum(t['timeouts'] for t in totals),
+        'errors': sum(t['errors'] for t in totals),
+        'reopened': sum(t['reopened'] for t in totals),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=('threaded', 'async'),
+                        default=['threaded', 'async'])
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--client-procs', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--timeout', type=float, default=5.0)
+    parser.add_argument('--path', default='/api/pets/1')
+    parser.add_argument('--token-user', help='send a bearer token for this user')
+    for table in ('pets', 'users', 'questionnaires', 'adoptions'):
+        parser.add_argument(f'--{table}', type=int, default=0,
+                            help='generated rows on top of the sample data')
+    args = parser.parse_args()
+
+    headers = f'GET {args.path} HTTP/1.1\r\nHost: bench\r\n'
+    if args.token_user:
+        token_issuer.configure(SECRET_KEY, 3600)
+        headers += f'Authorization: Bearer {token_issuer.issue(args.token_user)}\r\n'
+    request = (headers + '\r\n').encode('latin-1')
+    print(f"{os.cpu_count()} CPUs, {args.connections} connections, {args.workers} worker(s) x "
+          f"{args.threads} threads, GET {args.path} for {args.duration:.0f}s", file=sys.stderr)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        init_db.init_db(db_path).close()
+        seed_db(db_path)
+        sizes = {t: getattr(args, t) for t in ('pets', 'users', 'questionnaires', 'adoptions')}
+        if any(sizes.values()):
+            generate_data(db_path, sizes, seed=1)
+        for mode in args.modes:
+            r = run(args, mode, db_path, request)
+            print(f"{mode:>9}: {r['rps']:8.0f} req/s  p50 {r['p50']:8.1f}  p95 {r['p95']:8.1f}  "
+                  f"p99 {r['p99']:8.1f} ms  served {r['served']}/{args.connections} connections  "
+                  f"{r['reopened']} reopened  {r['timeouts']} timeouts  {r['errors']} errors")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# pylint: disable=C0114,C0116,C0413,E0401
+"""Clear a backlog of pending questionnaires: per-item routes vs one bulk call.
+
+    python benchmarks/bench_bulk_review.py --pending 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import init_db
+from main import app
+from tokens import token_issuer
+
+# admin routes want an admin token
+ADMIN = {'Authorization': f"Bearer {token_issuer.issue('admin', role='admin')}"}
+
+def build_db(path, n_pending):
+    conn = init_db.init_db(path)
+    conn.executemany(
+        "INSERT INTO pets (name, type, size, activity_level, maintenance_level, budget) "
+        "VALUES (?, 'dog', 'medium', 'high', 'medium', 'high')",
+        ((f'pet{i}',) for i in range(10))
+    )
+    conn.executemany(
+        "INSERT INTO users (username, password) VALUES (?, 'pw')",
+        ((f'user{i}',) for i in range(n_pending))
+    )
+    conn.executemany(
+        "INSERT INTO questionnaire_answers (username, living_space, activity_level, "
+        "maintenance_level, budget, pet_type) VALUES (?, 'any', 'high', 'medium', 'high', 'dog')",
+        ((f'user{i}',) for i in range(n_pending))
+    )
+    conn.commit()
+    conn.close()
+
+def per_item(client, n_pending):
+    for qid in range(1, n_pending + 1):
+        if qid % 4:
+            response = client.post(f'/api/admin/questionnaires/{qid}/approve',
+                                   headers=ADMIN, json={'pet_ids': [1, 2, 3]})
+        else:
+            response = client.post(f'/api/admin/questionnaires/{qid}/reject', headers=ADMIN)
+        assert response.status_code == 200
+
+def bulk(client, n_pending):
+    ids = range(1, n_pending + 1)
+    response = client.post('/api/admin/questionnaires/bulk', headers=ADMIN, json={
+        'approve': [{'questionnaire_id': q, 'pet_ids': [1, 2, 3]} for q in ids if q % 4],
+        'reject': [q for q in ids if not q % 4],
+    })
+    assert response.status_code == 200
+    assert response.get_json()['approved'] + response.get_json()['rejected'] == n_pending
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pending', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        init_db.DATABASE = path
+        client = app.test_client()
+        for label, run in (('per-item routes', per_item), ('bulk endpoint', bulk)):
+            build_db(path, args.pending)
+            start = time.perf_counter()
+            run(client, args.pending)
+            elapsed = time.perf_counter() - start
+            rate = args.pending / elapsed
+            print(f"{label:>16}: {elapsed:8.3f} s  ({rate:9.0f} questionnaires/s)")
+        init_db.close_pool()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# pylint: disable=C0114,C0116,C0413,E0401
+"""Compare req/s for GET /api/pets/<id> with and without connection pooling.
+
+Run from the backend directory:
+
+    python benchmarks/bench_db_pool.py --requests 5000 --threads 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import init_db
+from main import app
+
+def build_db(path, n_pets):
+    conn = init_db.init_db(path)
+    conn.executemany(
+        "INSERT INTO pets (name, type, size, activity_level, maintenance_level, budget) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        ((f'pet{i}', 'dog', 'medium', 'high', 'medium', 'low') for i in range(n_pets))
+    )
+    conn.commit()
+    conn.close()
+
+def run(n_requests, n_threads, n_pets):
+    def worker(count, offset):
+        client = app.test_client()
+        for i in range(count):
+            response = client.get(f'/api/pets/{(offset + i) % n_pets + 1}')
+            assert response.status_code == 200
+    per_thread = n_requests // n_threads
+    start = time.perf_counter()
+    with ThreadPoolExecutor(n_threads) as executor:
+        for t in range(n_threads):
+            executor.submit(worker, per_thread, t * per_thread)
+    elapsed = time.perf_counter() - start
+    return per_thread * n_threads / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--pets', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        build_db(path, args.pets)
+        init_db.DATABASE = path
+        results = {}
+        for label, size in (('per-call connect', 0), ('pooled', max(args.threads, 1))):
+            init_db.POOL_SIZE = size
+            init_db.close_pool()
+            run(200, 1, args.pets)  # warm-up
+            results[label] = run(args.requests, args.threads, args.pets)
+            print(f"{label:>18}: {results[label]:9.0f} req/s")
+        init_db.close_pool()
+        speedup = results['pooled'] / results['per-call connect']
+        print(f"{'speedup':>18}: {speedup:9.2f}x")
+
+if __name__ == '__main__':
+    main()
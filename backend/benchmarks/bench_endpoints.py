@@ -0,0 +1,455 @@
+# pylint: disable=C0114,C0116,C0413,E0401,R0902,R0914
+"""Endpoint benchmark suite: every route at several data scales.
+
+For each scale a deterministic database is built (or reused from
+--db-dir), then every route in main.py is driven through the Flask test
+client, one request at a time, for up to --requests requests or
+--route-seconds seconds (at least 3 requests). With --server the read
+routes are also driven through a real serve.py with --clients concurrent
+client processes. Per route the report records p50/p95/p99 latency,
+throughput and peak RSS.
+
+    scale    pets       users / questionnaires / adoptions
+    small    1,000      10,000
+    medium   100,000    100,000
+    large    1,000,000  1,000,000
+
+Run from the backend directory:
+
+    python benchmarks/bench_endpoints.py --scales small medium --out bench.json
+    python benchmarks/bench_endpoints.py --scales small --server --workers 4 --clients 8
+    python benchmarks/bench_endpoints.py --scales small --baseline bench.json --threshold 0.2
+
+With --baseline, routes whose p95 grew or throughput fell by more than
+--threshold are listed as regressions and the exit status is 1.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import init_db
+from matching import LEVELS
+from seed_db import GENERATED_PASSWORD, PET_NAMES, generate_data
+
+SCALES = {
+    'small': {'pets': 1_000, 'users': 10_000, 'questionnaires': 10_000, 'adoptions': 10_000},
+    'medium': {'pets': 100_000, 'users': 100_000, 'questionnaires': 100_000, 'adoptions': 100_000},
+    'large': {'pets': 1_000_000, 'users': 1_000_000, 'questionnaires': 1_000_000,
+              'adoptions': 1_000_000},
+}
+PASSWORD = GENERATED_PASSWORD
+SECRET_KEY = 'bench-secret'
+MIN_REQUESTS = 3
+TYPES = ('dog', 'cat')
+SIZES = ('small', 'medium', 'large')
+SPACES = ('small', 'medium', 'large', 'any')
+
+# ---------------------------------------------------------------- data
+
+def random_answers(rng):
+    return {
+        'living_space': rng.choice(SPACES),
+        'activity_level': rng.choice(LEVELS),
+        'maintenance_level': rng.choice(LEVELS),
+        'budget': rng.choice(LEVELS),
+        'pet_type': rng.choice(TYPES),
+    }
+
+def build_db(path, sizes, pending_share, seed):
+    """Populate a fresh database with seed_db's deterministic generator."""
+    init_db.init_db(path).close()
+    generate_data(path, sizes, seed, pending_share)
+
+# -------------------------------------------------------------- routes
+
+class Workload:
+    """Request generator state shared by the route builders."""
+
+    def __init__(self, db_path, sizes, seed):
+        self.db_path = db_path
+        self.sizes = sizes
+        self.rng = random.Random(seed)
+        self.counter = 0
+        self.pending = []
+        self.adoption_max = sizes['adoptions']
+        conn = sqlite3.connect(db_path)
+        # generated users are user<id>, after the ones the schema inserts
+        last_user = conn.execute("SELECT max(id) FROM users").fetchone()[0]
+        self.first_user = last_user - sizes['users'] + 1
+        conn.close()
+        from tokens import token_issuer  # pylint: disable=import-outside-toplevel
+        self.tokens = token_issuer
+        self.admin = {'Authorization': f"Bearer {token_issuer.issue('admin', role='admin')}"}
+
+    def user(self):
+        return f'user{self.first_user + self.rng.randrange(self.sizes["users"])}'
+
+    def pet_id(self):
+        return self.rng.randrange(self.sizes['pets']) + 1
+
+    def next_id(self):
+        self.counter += 1
+        return self.counter
+
+    def pending_ids(self, count):
+        """Ids of PENDING questionnaires no earlier request has consumed.
+
+        More are inserted directly (outside the timed section) when needed,
+        so write routes never run out of work.
+        """
+        if len(self.pending) < count:
+            conn = sqlite3.connect(self.db_path)
+            rows = [(self.user(), *random_answers(self.rng).values()) for _ in range(500)]
+            conn.executemany(
+                "INSERT INTO questionnaire_answers (username, living_space, activity_level, "
+                "maintenance_level, budget, pet_type) VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            conn.commit()
+            last = conn.execute("SELECT max(id) FROM questionnaire_answers").fetchone()[0]
+            conn.close()
+            self.pending.extend(range(last - len(rows) + 1, last + 1))
+        taken, self.pending = self.pending[:count], self.pending[count:]
+        return taken
+
+def _pets_filtered(w):
+    return 'GET', (f'/api/pets?type={w.rng.choice(TYPES)}&size={w.rng.choice(SIZES)}'
+                   f'&limit=50&after_id={w.pet_id() // 2}'), {}
+
+def _pets_search(w):
+    # a name plus id prefix, a name and an attribute, or a whole type (id ordered)
+    name = w.rng.choice(PET_NAMES).lower()
+    q = w.rng.choice((f'{name[:3]}+{w.pet_id() // 100}', f'{name}+{w.rng.choice(SIZES)}',
+                      w.rng.choice(TYPES)))
+    return 'GET', f'/api/pets/search?q={q}&offset={w.rng.randrange(100)}', {}
+
+# (name, read_only, builder(workload) -> (method, path, client kwargs))
+ROUTES = (
+    ('GET /api/test', True, lambda w: ('GET', '/api/test', {})),
+    ('GET /api/pets', True, lambda w: ('GET', '/api/pets', {})),
+    ('GET /api/pets?filters', True, _pets_filtered),
+    ('GET /api/pets/search', True, _pets_search),
+    ('GET /api/pets/<id>', True, lambda w: ('GET', f'/api/pets/{w.pet_id()}', {})),
+    ('GET /api/questionnaire/<username>', True,
+     lambda w: ('GET', f'/api/questionnaire/{w.user()}', {'headers': w.admin})),
+    ('GET /api/users/<username>/dashboard', True,
+     lambda w: ('GET', f'/api/users/{w.user()}/dashboard', {'headers': w.admin})),
+    ('GET /api/adoptions/<username>', True,
+     lambda w: ('GET', f'/api/adoptions/{w.user()}', {'headers': w.admin})),
+    ('GET /api/admin/questionnaires', True,
+     lambda w: ('GET', '/api/admin/questionnaires', {'headers': w.admin})),
+    ('GET /api/admin/queue', True,
+     lambda w: ('GET', '/api/admin/queue?limit=50', {'headers': w.admin})),
+    ('GET /api/admin/adoptions', True,
+     lambda w: ('GET', '/api/admin/adoptions', {'headers': w.admin})),
+    ('GET /api/admin/cache', True,
+     lambda w: ('GET', '/api/admin/cache', {'headers': w.admin})),
+    ('GET /api/admin/passwords', True,
+     lambda w: ('GET', '/api/admin/passwords', {'headers': w.admin})),
+    ('GET /apispec_1.json', True, lambda w: ('GET', '/apispec_1.json', {})),
+    ('POST /api/login', False, lambda w: ('POST', '/api/login', {
+        'json': {'username': w.user(), 'password': PASSWORD}})),
+    ('POST /api/admin/login', False, lambda w: ('POST', '/api/admin/login', {
+        'json': {'username': 'admin', 'password': 'admin123'}})),
+    ('POST /api/register', False, lambda w: ('POST', '/api/register', {
+        'json': {'username': f'bench{w.next_id()}', 'password': PASSWORD}})),
+    ('POST /api/logout', False, lambda w: ('POST', '/api/logout', {
+        'headers': {'Authorization': f'Bearer {w.tokens.issue(w.user())}'}})),
+    ('POST /api/questionnaire', False, lambda w: ('POST', '/api/questionnaire', {
+        'headers': w.admin, 'json': {'username': w.user(), 'answers': random_answers(w.rng)}})),
+    ('POST /api/admin/questionnaires/<id>/approve', False, lambda w: (
+        'POST', f'/api/admin/questionnaires/{w.pending_ids(1)[0]}/approve',
+        {'headers': w.admin, 'json': {'pet_ids': [w.pet_id(), w.pet_id()]}})),
+    ('POST /api/admin/questionnaires/<id>/reject', False, lambda w: (
+        'POST', f'/api/admin/questionnaires/{w.pending_ids(1)[0]}/reject', {'headers': w.admin})),
+    ('POST /api/admin/questionnaires/bulk', False, lambda w: (
+        'POST', '/api/admin/questionnaires/bulk', {'headers': w.admin, 'json': {
+            'approve': [{'questionnaire_id': q, 'pet_ids': [w.pet_id()]}
+                        for q in w.pending_ids(10)],
+            'reject': w.pending_ids(10)}})),
+    ('POST /api/admin/adoptions', False, lambda w: ('POST', '/api/admin/adoptions', {
+        'headers': w.admin, 'json': {'pet_id': w.pet_id(), 'username': w.user()}})),
+    ('POST /api/admin/adoptions/<id>/<action>', False, lambda w: (
+        'POST', f"/api/admin/adoptions/{w.rng.randrange(w.adoption_max) + 1}/"
+                f"{w.rng.choice(('approve', 'reject'))}", {'headers': w.admin})),
+)
+
+# --------------------------------------------------------------- stats
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[max(0, min(len(ordered) - 1, int(round(q * len(ordered))) - 1))]
+
+def summarize(latencies_ms, errors, elapsed_s=None):
+    ordered = sorted(latencies_ms)
+    busy = elapsed_s if elapsed_s is not None else sum(ordered) / 1000
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'p50_ms': round(percentile(ordered, 0.50), 3),
+        'p95_ms': round(percentile(ordered, 0.95), 3),
+        'p99_ms': round(percentile(ordered, 0.99), 3),
+        'rps': round(len(ordered) / busy, 1) if busy else 0.0,
+    }
+
+def is_error(status):
+    # a 404 for a user without a questionnaire is a normal answer
+    return status >= 400 and status != 404
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+# ------------------------------------------------------- test client mode
+
+def run_client_mode(app, workload, routes, args):
+    client = app.test_client()
+    results = {}
+    for name, _, build in routes:
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        while len(latencies) < args.requests and (
+                len(latencies) < MIN_REQUESTS
+                or time.perf_counter() - started < args.route_seconds):
+            method, path, kwargs = build(workload)
+            start = time.perf_counter()
+            response = client.open(path, method=method, **kwargs)
+            response.get_data()
+            response.close()   # a streamed body holds its pooled connection until closed
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += is_error(response.status_code)
+        results[name] = {**summarize(latencies, errors), 'peak_rss_mb': peak_rss_mb()}
+        print(f"  {name:<46} p50 {results[name]['p50_ms']:9.2f}  "
+              f"p95 {results[name]['p95_ms']:9.2f}  p99 {results[name]['p99_ms']:9.2f} ms  "
+              f"{results[name]['rps']:9.1f} req/s  {errors} errors", file=sys.stderr)
+    return results
+
+# ------------------------------------------------------------ server mode
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _wait_ready(port, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/test')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not come up')
+
+def _server_client(port, plan, results):
+    """One client process: cycle through the read routes over keep-alive.
+
+    plan holds db_path, sizes, seed, duration and the route names to use.
+    """
+    workload = Workload(plan['db_path'], plan['sizes'], plan['seed'])
+    routes = [(name, build) for name, read_only, build in ROUTES
+              if read_only and name in plan['names']]
+    latencies = {name: [] for name, _ in routes}
+    errors = dict.fromkeys(latencies, 0)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    deadline = time.monotonic() + plan['duration']
+    while time.monotonic() < deadline:
+        name, build = routes[workload.rng.randrange(len(routes))]
+        method, path, kwargs = build(workload)
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, headers=kwargs.get('headers', {}))
+            response = conn.getresponse()
+            response.read()
+            errors[name] += is_error(response.status)
+        except (OSError, http.client.HTTPException):
+            errors[name] += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            continue
+        latencies[name].append((time.perf_counter() - start) * 1000)
+    results.put((latencies, errors))
+
+def _children_peak_rss_mb(pid):
+    """Sum of VmHWM over the server's worker processes (Linux /proc)."""
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children', encoding='ascii') as f:
+            children = f.read().split()
+    except OSError:
+        return None
+    total_kb = 0
+    for child in children:
+        try:
+            with open(f'/proc/{child}/status', encoding='ascii') as f:
+                total_kb += next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))
+        except (OSError, StopIteration):
+            pass
+    return round(total_kb / 1024, 1)
+
+def _merge_clients(collected, elapsed, rss):
+    results = {}
+    for name in collected[0][0]:
+        latencies = [ms for lat, _ in collected for ms in lat[name]]
+        if latencies:
+            errors = sum(err[name] for _, err in collected)
+            results[name] = {**summarize(latencies, errors, elapsed), 'peak_rss_mb': rss}
+    total = sum(r['requests'] for r in results.values())
+    results['ALL'] = {'requests': total, 'rps': round(total / elapsed, 1), 'peak_rss_mb': rss}
+    return results
+
+def run_server_mode(db_path, sizes, names, args):
+    port = _free_port()
+    env = dict(os.environ, LOG_LEVEL='WARNING', DATABASE=db_path, SECRET_KEY=SECRET_KEY)
+    command = [sys.executable, 'serve.py', '--host', '127.0.0.1', '--port', str(port),
+               '--workers', str(args.workers), '--threads', str(args.threads)]
+    with subprocess.Popen(command, cwd=BACKEND_DIR, env=env) as server:
+        try:
+            _wait_ready(port)
+            queue = multiprocessing.Queue()
+            clients = [
+                multiprocessing.Process(target=_server_client, args=(port, {
+                    'db_path': db_path, 'sizes': sizes, 'seed': args.seed + i,
+                    'duration': args.server_seconds, 'names': names}, queue))
+                for i in range(args.clients)
+            ]
+            started = time.perf_counter()
+            for proc in clients:
+                proc.start()
+            collected = [queue.get() for _ in clients]
+            elapsed = time.perf_counter() - started
+            for proc in clients:
+                proc.join()
+            rss = _children_peak_rss_mb(server.pid)
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+    results = _merge_clients(collected, elapsed, rss)
+    print(f"  server: {results['ALL']['rps']:.1f} req/s over {args.clients} clients, "
+          f"{args.workers} workers x {args.threads} threads, worker RSS {rss} MB",
+          file=sys.stderr)
+    return results
+
+# ------------------------------------------------------------- compare
+
+def compare(report, baseline, threshold):
+    """Regression lines for routes that got slower than the baseline."""
+    regressions = []
+    for scale, modes in report['results'].items():
+        for mode in ('client', 'server'):
+            for route, now in modes.get(mode, {}).items():
+                then = baseline.get('results', {}).get(scale, {}).get(mode, {}).get(route)
+                if not then:
+                    continue
+                if then.get('p95_ms') and now['p95_ms'] > then['p95_ms'] * (1 + threshold):
+                    regressions.append(f"{scale}/{mode} {route}: p95 "
+                                       f"{then['p95_ms']} -> {now['p95_ms']} ms")
+                if then.get('rps') and now['rps'] < then['rps'] / (1 + threshold):
+                    regressions.append(f"{scale}/{mode} {route}: throughput "
+                                       f"{then['rps']} -> {now['rps']} req/s")
+    return regressions
+
+# ---------------------------------------------------------------- main
+
+def prepare_db(scale, args, tmp):
+    """Path of a fresh database for the scale, and how long building it took.
+
+    With --db-dir the pristine database is kept there and copied for
+    each run, since the write routes modify it.
+    """
+    name = f'bench-{scale}-{args.seed}.db'
+    pristine = os.path.join(args.db_dir or tmp, name)
+    built = 0.0
+    if not os.path.exists(pristine):
+        start = time.perf_counter()
+        build_db(pristine, SCALES[scale], args.pending_share, args.seed)
+        built = time.perf_counter() - start
+        print(f"built {scale} database in {built:.1f}s", file=sys.stderr)
+    if not args.db_dir:
+        return pristine, built
+    working = os.path.join(tmp, name)
+    shutil.copyfile(pristine, working)
+    return working, built
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', nargs='+', choices=SCALES, default=['small'])
+    parser.add_argument('--routes', help='regex; only routes whose name matches')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--route-seconds', type=float, default=5.0)
+    parser.add_argument('--pending-share', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db-dir', help='keep built databases here and reuse them')
+    parser.add_argument('--bcrypt-cost', type=int, default=4)
+    parser.add_argument('--server', action='store_true', help='also run read routes via serve.py')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--server-seconds', type=float, default=10.0)
+    parser.add_argument('--out', help='write results as JSON')
+    parser.add_argument('--baseline', help='JSON from an earlier --out to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ['SECRET_KEY'] = SECRET_KEY
+    os.environ['BCRYPT_COST'] = str(args.bcrypt_cost)
+    from main import create_app  # pylint: disable=import-outside-toplevel
+    routes = [r for r in ROUTES if not args.routes or re.search(args.routes, r[0])]
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'cpus': os.cpu_count(),
+            'platform': platform.platform(),
+            'args': vars(args),
+        },
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            db_path, build_s = prepare_db(scale, args, tmp)
+            print(f"[{scale}] test client", file=sys.stderr)
+            app = create_app({'DATABASE': db_path, 'SECRET_KEY': SECRET_KEY,
+                              'SWAGGER_CACHE_DIR': os.path.join(tmp, 'spec')})
+            workload = Workload(db_path, SCALES[scale], args.seed)
+            entry = {'sizes': SCALES[scale], 'build_s': round(build_s, 2),
+                     'client': run_client_mode(app, workload, routes, args)}
+            init_db.close_pool()
+            if args.server:
+                print(f"[{scale}] serve.py", file=sys.stderr)
+                names = [r[0] for r in routes]
+                entry['server'] = run_server_mode(db_path, SCALES[scale], names, args)
+            report['results'][scale] = entry
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        print(f"{len(regressions)} regressions (threshold {args.threshold:.0%})")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
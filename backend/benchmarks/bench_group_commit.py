@@ -0,0 +1,177 @@
+# pylint: disable=C0114,C0116,C0413,E0401
+"""Questionnaire submissions per second: one commit each vs group commit.
+
+Each run builds a fresh database with --users generated users and
+posts questionnaires through the Flask test client from a pool of
+--threads client threads:
+
+    direct/NORMAL  the previous save_qanswers(): user lookup, insert and
+                   re-select for unknown users, answer insert, a commit
+                   per submission, on the pool's synchronous=NORMAL
+    direct/FULL    the same with synchronous=FULL, so each commit is on
+                   disk before the response, as with the writer
+    group          the route as it is now: the group-commit writer
+
+Two loads per variant. "open" offers --rate submissions/s for --seconds
+on a fixed schedule and measures latency from the scheduled send time,
+so a backlog shows up as latency instead of a lower offered rate.
+"max" submits --requests as fast as the threads allow.
+
+Run from the backend directory:
+
+    python benchmarks/bench_group_commit.py --rate 1000 --seconds 10
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import init_db
+import questionaire
+from seed_db import generate_data
+from tokens import token_issuer
+
+ANSWERS = {'living_space': 'apartment', 'activity_level': 'low', 'maintenance_level': 'low',
+           'budget': 'medium', 'pet_type': 'cat'}
+
+def direct_save(username, answers):
+    conn = init_db.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+        if not cursor.fetchone():
+            cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)",
+                           (username, 'temp_password'))
+            conn.commit()
+            cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+            cursor.fetchone()
+        cursor.execute("INSERT INTO questionnaire_answers (username, living_space,"
+                       " activity_level, maintenance_level, budget, pet_type, status)"
+                       " VALUES (?, ?, ?, ?, ?, ?, 'PENDING')",
+                       (username, *(answers[field] for field in questionaire.ANSWER_FIELDS)))
+        conn.commit()
+        return True
+    except sqlite3.Error:
+        return False
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else float('nan')
+
+class Load:  # pylint: disable=R0903
+    """Posts submissions and records their latency; shared by the client threads."""
+
+    def __init__(self, app, users):
+        self.app = app
+        self.users = users
+        self.clients = threading.local()
+        self.sent = 0
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+
+    def post(self, scheduled):
+        client = getattr(self.clients, 'client', None)
+        if client is None:
+            client = self.clients.client = self.app.test_client()
+        with self.lock:
+            self.sent += 1
+            n = self.sent
+        username = f'user{1 + n % self.users}'
+        headers = {'Authorization': f'Bearer {token_issuer.issue(username)}'}
+        status = client.post('/api/questionnaire', headers=headers,
+                             json={'username': username, 'answers': ANSWERS}).status_code
+        with self.lock:
+            self.latencies.append(time.perf_counter() - scheduled)
+            self.errors += status != 200
+
+def open_load(load, threads, rate, seconds):
+    with ThreadPoolExecutor(threads) as executor:
+        start = time.perf_counter()
+        for i in range(int(rate * seconds)):
+            scheduled = start + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(load.post, scheduled)
+    return len(load.latencies) / (time.perf_counter() - start)
+
+def max_load(load, threads, requests):
+    def worker(count):
+        for _ in range(count):
+            load.post(time.perf_counter())
+    workers = [threading.Thread(target=worker, args=(requests // threads,))
+               for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return len(load.latencies) / (time.perf_counter() - start)
+
+def run(variant, load_kind, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        init_db.init_db(db_path).close()
+        generate_data(db_path, {'users': args.users}, seed=1)
+        from main import create_app  # pylint: disable=import-outside-toplevel
+        app = create_app({'DATABASE': db_path, 'LOG_LEVEL': 'ERROR', 'ENABLE_SWAGGER': False,
+                          'POOL_SIZE': args.threads, 'SLOW_QUERY_MS': 60_000.0,
+                          'WRITE_BATCH_SIZE': args.batch_size,
+                          'WRITE_BATCH_WAIT_MS': args.max_wait_ms})
+        original = questionaire.save_qanswers
+        if variant.startswith('direct'):
+            pool = init_db.get_pool()
+            pool.pragmas += (('synchronous', variant.split('/')[1]),)   # the last setting wins
+            questionaire.save_qanswers = direct_save
+        try:
+            load = Load(app, args.users)
+            if load_kind == 'open':
+                achieved = open_load(load, args.threads, args.rate, args.seconds)
+            else:
+                achieved = max_load(load, args.threads, args.requests)
+        finally:
+            questionaire.save_qanswers = original
+        stats = questionaire.questionnaire_writer.stats()
+        return achieved, load, stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--rate', type=float, default=1000)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--requests', type=int, default=10_000)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=0.0)
+    parser.add_argument('--variants', nargs='+', default=['direct/NORMAL', 'direct/FULL', 'group'],
+                        choices=('direct/NORMAL', 'direct/FULL', 'group'))
+    parser.add_argument('--loads', nargs='+', default=['open', 'max'], choices=('open', 'max'))
+    args = parser.parse_args()
+
+    print(f"{args.threads} client threads; open load {args.rate:.0f}/s for {args.seconds:.0f} s,"
+          f" max load {args.requests} submissions; batch <= {args.batch_size},"
+          f" wait {args.max_wait_ms} ms", file=sys.stderr)
+    for load_kind in args.loads:
+        for variant in args.variants:
+            before = questionaire.questionnaire_writer.stats()
+            achieved, load, stats = run(variant, load_kind, args)
+            line = (f"  {load_kind:>4} {variant:<13} {achieved:7.0f} submissions/s"
+                    f"  p50 {percentile(load.latencies, 0.5) * 1000:7.1f} ms"
+                    f"  p99 {percentile(load.latencies, 0.99) * 1000:7.1f} ms"
+                    f"  errors {load.errors}")
+            if variant == 'group':
+                batches = stats['batches'] - before['batches']
+                line += f"  mean batch {(stats['items'] - before['items']) / batches:.1f}"
+            print(line)
+
+if __name__ == '__main__':
+    main()
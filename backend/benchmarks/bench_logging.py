@@ -0,0 +1,82 @@
+# pylint: disable=C0114,C0116,C0413,E0401
+"""Logging overhead on GET /api/admin/adoptions with a 10k-row table.
+
+Compares debug logging disabled, enabled through the queue handler, and
+enabled through a synchronous stream handler, plus the cost of the old
+print() of the full result set. Output goes to /dev/null throughout.
+
+    python benchmarks/bench_logging.py --rows 10000 --requests 50
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import init_db
+from app_logging import JsonFormatter, configure_logging, shutdown_logging
+from main import app
+from tokens import token_issuer
+
+# admin routes want an admin token
+ADMIN = {'Authorization': f"Bearer {token_issuer.issue('admin', role='admin')}"}
+
+def build_db(path, n_rows):
+    conn = init_db.init_db(path)
+    conn.execute(
+        "INSERT INTO pets (name, type, size, activity_level, maintenance_level, budget) "
+        "VALUES ('Max', 'dog', 'medium', 'high', 'medium', 'high')"
+    )
+    conn.executemany(
+        "INSERT INTO adoptions (pet_id, username, status, pet_name) "
+        "VALUES (1, ?, 'PENDING', 'Max')",
+        ((f'user{i}',) for i in range(n_rows))
+    )
+    conn.commit()
+    conn.close()
+
+def time_requests(client, n_requests):
+    start = time.perf_counter()
+    for _ in range(n_requests):
+        assert client.get('/api/admin/adoptions', headers=ADMIN).status_code == 200
+    return (time.perf_counter() - start) / n_requests * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w', encoding='utf-8') as devnull:
+        path = os.path.join(tmp, 'bench.db')
+        build_db(path, args.rows)
+        init_db.DATABASE = path
+        client = app.test_client()
+        time_requests(client, 3)  # warm-up
+
+        configure_logging('INFO', stream=devnull)
+        results = {'debug disabled': time_requests(client, args.requests)}
+        configure_logging('DEBUG', stream=devnull)
+        results['debug via queue'] = time_requests(client, args.requests)
+        shutdown_logging()
+        sync = logging.StreamHandler(devnull)
+        sync.setFormatter(JsonFormatter())
+        root = logging.getLogger()
+        root.handlers[:] = [sync]
+        results['debug synchronous'] = time_requests(client, args.requests)
+
+        rows = client.get('/api/admin/adoptions', headers=ADMIN).get_json()
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            print("DEBUG: Retrieved adoption requests:", rows, file=devnull)
+        results['old print() of rows'] = (time.perf_counter() - start) / args.requests * 1000
+        init_db.close_pool()
+
+    for label, ms in results.items():
+        print(f"{label:>20}: {ms:8.2f} ms/request")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# pylint: disable=C0114,C0116,C0413,E0401
+"""Time batch pet-questionnaire scoring on synthetic data.
+
+    python benchmarks/bench_matching.py --pets 100000 --questionnaires 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matching import ATTRIBUTES, MatchingEngine
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pets', type=int, default=100000)
+    parser.add_argument('--questionnaires', type=int, default=10000)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pets = [(i + 1, *(rng.choice(vocab) for _, _, vocab, _ in ATTRIBUTES))
+            for i in range(args.pets)]
+    answer_vocab = [(key, vocab + ('any',) if key == 'living_space' else vocab)
+                    for _, key, vocab, _ in ATTRIBUTES]
+    answers = [{key: rng.choice(vocab) for key, vocab in answer_vocab}
+               for _ in range(args.questionnaires)]
+
+    engine = MatchingEngine()
+    start = time.perf_counter()
+    engine.load_rows(pets)
+    encode_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine.score(answers[0])
+    single_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    results = engine.top_k(answers, args.top_k)
+    batch_s = time.perf_counter() - start
+    assert len(results) == len(answers)
+
+    print(f"encode {args.pets} pets:            {encode_s:8.3f} s")
+    print(f"score 1 questionnaire:          {single_ms:8.3f} ms")
+    print(f"top-{args.top_k} for {args.questionnaires} questionnaires: {batch_s:8.3f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# pylint: disable=C0114,C0116,C0413,E0401
+"""Login throughput and latency across bcrypt cost factors and concurrency.
+
+Every user is stored with a hash at the cost under test, so each login
+is one bcrypt verification on the shared hashing pool. Logins shed with
+503 (hashing queue full) are counted separately.
+
+Run from the backend directory:
+
+    python benchmarks/bench_passwords.py --costs 8 10 12 --threads 1 4 16 --logins 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import init_db
+from main import app
+from passwords import password_hasher
+
+PASSWORD = 'correct horse battery staple'
+
+def build_db(path, n_users, cost):
+    hashed = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(cost)).decode('ascii')
+    conn = init_db.init_db(path)
+    conn.executemany(
+        "INSERT INTO users (username, password) VALUES (?, ?)",
+        ((f'user{i}', hashed) for i in range(n_users))
+    )
+    conn.commit()
+    conn.close()
+
+def run(n_logins, n_threads, n_users):
+    def worker(count, offset):
+        client = app.test_client()
+        latencies, shed = [], 0
+        for i in range(count):
+            start = time.perf_counter()
+            response = client.post('/api/login', json={
+                'username': f'user{(offset + i) % n_users}', 'password': PASSWORD
+            })
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code == 503:
+                shed += 1
+            else:
+                assert response.status_code == 200, response.status_code
+        return latencies, shed
+    per_thread = max(n_logins // n_threads, 1)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(n_threads) as executor:
+        results = list(executor.map(worker, [per_thread] * n_threads,
+                                    [t * per_thread for t in range(n_threads)]))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(ms for lat, _ in results for ms in lat)
+    shed = sum(s for _, s in results)
+    return {
+        'logins_per_s': (len(latencies) - shed) / elapsed,
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1],
+        'shed': shed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--costs', type=int, nargs='+', default=[8, 10, 12])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--users', type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"calibrated cost for {password_hasher.target_ms:.0f} ms target: "
+          f"{password_hasher.calibrate()}", file=sys.stderr)
+    print(f"hashing workers: {password_hasher.workers}, "
+          f"max pending: {password_hasher.max_pending}", file=sys.stderr)
+    print(f"{'cost':>4} {'threads':>7} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'shed':>5}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        init_db.POOL_SIZE = max(args.threads)
+        for cost in args.costs:
+            # stored hashes already at the current cost, so no rehash writes
+            password_hasher.cost = cost
+            build_db(path, args.users, cost)
+            init_db.DATABASE = path
+            for threads in args.threads:
+                r = run(args.logins, threads, args.users)
+                print(f"{cost:>4} {threads:>7} {r['logins_per_s']:>9.1f} "
+                      f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['shed']:>5}")
+        init_db.close_pool()
+    print(password_hasher.stats(), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# pylint: disable=C0114,C0116,C0413,E0401
+"""Bytes and CPU per GET /api/pets body: today's jsonify() path vs the row serializer.
+
+Builds a database with --pets generated pets and times whole requests
+through the Flask test client (the catalog cache is invalidated before
+each one), in CPU time:
+
+    jsonify            the old handler: sqlite3.Row -> dict -> jsonify()
+    objects/<encoder>  the route, array of objects, per JSON encoder
+    columns/<encoder>  the route with format=columns
+
+Run from the backend directory:
+
+    python benchmarks/bench_serializers.py --pets 10000 --repeat 20
+"""
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import init_db
+from seed_db import generate_data
+from pet_cache import catalog_cache
+from serializers import ENCODERS, row_serializer
+
+def old_handler(app):
+    from flask import jsonify  # pylint: disable=import-outside-toplevel
+    with app.test_request_context('/api/pets'):
+        cursor = init_db.get_db_connection().cursor()
+        cursor.execute("SELECT id, name, type, size, activity_level, maintenance_level, budget"
+                       " FROM pets WHERE id > 0 ORDER BY id")
+        return jsonify([dict(pet) for pet in cursor.fetchall()]).get_data()
+
+def route(client, path):
+    response = client.get(path)
+    body = response.get_data()
+    response.close()
+    return body
+
+def measure(build, repeat):
+    body = build()   # warm up
+    start = time.process_time()
+    for _ in range(repeat):
+        catalog_cache.invalidate()
+        body = build()
+    return (time.process_time() - start) / repeat, body
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pets', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        init_db.init_db(db_path).close()
+        generate_data(db_path, {'pets': args.pets}, seed=1)
+        from main import create_app  # pylint: disable=import-outside-toplevel
+        app = create_app({'DATABASE': db_path, 'LOG_LEVEL': 'WARNING', 'ENABLE_SWAGGER': False})
+        client = app.test_client()
+        variants = [('jsonify', None, lambda: old_handler(app))]
+        for encoder in sorted(ENCODERS):
+            variants.append((f'objects/{encoder}', encoder, lambda: route(client, '/api/pets')))
+            variants.append((f'columns/{encoder}', encoder,
+                             lambda: route(client, '/api/pets?format=columns')))
+        print(f"{args.pets} pets, {args.repeat} requests each; per 10k pets:", file=sys.stderr)
+        baseline = None
+        for name, encoder, build in variants:
+            row_serializer.configure(encoder or 'auto')
+            seconds, body = measure(build, args.repeat)
+            scale = 10_000 / args.pets
+            baseline = baseline or seconds
+            print(f"  {name:<16} {seconds * scale * 1000:7.2f} ms CPU ({baseline / seconds:4.1f}x)"
+                  f"  {len(body) * scale / 1024:8.1f} KiB"
+                  f"  {len(gzip.compress(body, 6)) * scale / 1024:7.1f} KiB gzipped")
+        row_serializer.configure('auto')
+
+if __name__ == '__main__':
+    main()
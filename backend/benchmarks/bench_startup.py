@@ -0,0 +1,124 @@
+# pylint: disable=C0114,C0116,C0413,E0401
+"""Startup cost report: `python -X importtime` for main plus first-request timings.
+
+Each measurement runs in a fresh interpreter and the best of --runs is
+kept. The report lists the total import time of main, the slowest
+modules it pulls in, whether flasgger was imported at startup, and the
+first /apispec_1.json request cold (spec generated) and warm (served
+from the on-disk spec cache by a new process).
+
+Run from the backend directory:
+
+    python benchmarks/bench_startup.py --runs 5 --top 10 --save startup.json
+    python benchmarks/bench_startup.py --compare startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+flasgger_at_startup = 'flasgger' in sys.modules
+app = main.create_app({'SWAGGER_CACHE_DIR': sys.argv[1]})
+created = time.perf_counter()
+response = app.test_client().get('/apispec_1.json')
+assert response.status_code == 200
+done = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_spec_ms': (done - created) * 1000,
+    'flasgger_at_startup': flasgger_at_startup,
+}))
+"""
+
+def run_python(args, code_args=()):
+    env = dict(os.environ, LOG_LEVEL='WARNING')
+    return subprocess.run(
+        [sys.executable, *args, *code_args], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    )
+
+def parse_importtime(stderr):
+    """{module: (depth, self_us, cumulative_us)} from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, raw = line.split(':', 1)[1].split('|')
+        depth = (len(raw) - len(raw.lstrip()) - 1) // 2
+        modules[raw.strip()] = (depth, int(self_us), int(cumulative_us))
+    return modules
+
+def measure_imports(runs):
+    samples = [
+        parse_importtime(run_python(['-X', 'importtime', '-c', 'import main']).stderr)
+        for _ in range(runs)
+    ]
+    return min(samples, key=lambda modules: modules['main'][2])
+
+def measure_requests(runs):
+    cold, warm = [], []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold.append(json.loads(run_python(['-c', PROBE], [cache_dir]).stdout))
+            warm.append(json.loads(run_python(['-c', PROBE], [cache_dir]).stdout))
+    return {
+        'create_app_ms': min(r['create_app_ms'] for r in cold),
+        'first_spec_cold_ms': min(r['first_spec_ms'] for r in cold),
+        'first_spec_cached_ms': min(r['first_spec_ms'] for r in warm),
+        'flasgger_at_startup': any(r['flasgger_at_startup'] for r in cold),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--save', help='write the report as JSON')
+    parser.add_argument('--compare', help='JSON report from an earlier --save')
+    args = parser.parse_args()
+
+    modules = measure_imports(args.runs)
+    report = {
+        'import_main_ms': modules['main'][2] / 1000,
+        'top_imports_ms': {
+            name: cumulative / 1000
+            for name, (depth, _, cumulative) in sorted(
+                modules.items(), key=lambda item: -item[1][2]
+            ) if depth == 1
+        },
+        **measure_requests(args.runs),
+    }
+    report['top_imports_ms'] = dict(list(report['top_imports_ms'].items())[:args.top])
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    for key, value in report.items():
+        if key == 'top_imports_ms':
+            continue
+        old = baseline.get(key)
+        delta = f"  (was {old:.1f})" if isinstance(old, float) else ''
+        shown = f"{value:9.1f}" if isinstance(value, float) else f"{value!s:>9}"
+        print(f"{key:>22}: {shown}{delta}")
+    print("slowest imports under main (cumulative ms):")
+    for name, ms in report['top_imports_ms'].items():
+        old = baseline.get('top_imports_ms', {}).get(name)
+        delta = f"  (was {old:.1f})" if old is not None else ''
+        print(f"{name:>22}: {ms:9.1f}{delta}")
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# pylint: disable=C0114,C0116,C0413,E0401
+"""Peak memory and time to first byte of GET /api/admin/adoptions, buffered vs streamed.
+
+A database with --adoptions generated adoption requests is built once;
+then each mode runs in a fresh process that records its peak RSS before
+and after one full response:
+
+    buffered   the pre-streaming handler: fetchall(), a dict per row,
+               jsonify() of the whole list
+    streamed   the route as it is now, read chunk by chunk
+
+Run from the backend directory:
+
+    python benchmarks/bench_streaming.py --adoptions 1000000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import init_db
+from seed_db import generate_data
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def buffered(app):
+    from flask import jsonify  # pylint: disable=import-outside-toplevel
+    start = time.perf_counter()
+    with app.test_request_context('/api/admin/adoptions'):
+        cursor = init_db.get_db_connection().cursor()
+        cursor.execute("SELECT * FROM adoptions")
+        body = jsonify([dict(row) for row in cursor.fetchall()]).get_data()
+    # the whole body exists before its first byte can be sent
+    first_byte = time.perf_counter() - start
+    return first_byte, len(body)
+
+def streamed(app):
+    from tokens import token_issuer  # pylint: disable=import-outside-toplevel
+    admin = {'Authorization': f"Bearer {token_issuer.issue('admin', role='admin')}"}
+    start = time.perf_counter()
+    response = app.test_client().get('/api/admin/adoptions', headers=admin, buffered=False)
+    first_byte, size = None, 0
+    for chunk in response.response:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+    response.close()
+    return first_byte, size
+
+def child(mode, db_path):
+    from main import create_app  # pylint: disable=import-outside-toplevel
+    app = create_app({'DATABASE': db_path, 'LOG_LEVEL': 'WARNING', 'ENABLE_SWAGGER': False})
+    # warm up imports and the pool on a tiny request
+    app.test_client().get('/api/pets?limit=1')
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    first_byte, size = {'buffered': buffered, 'streamed': streamed}[mode](app)
+    print(json.dumps({
+        'total_s': time.perf_counter() - start,
+        'first_byte_ms': first_byte * 1000,
+        'bytes': size,
+        'baseline_mb': before,
+        'peak_mb': peak_rss_mb(),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--adoptions', type=int, default=1_000_000)
+    parser.add_argument('--modes', nargs='+', choices=('buffered', 'streamed'),
+                        default=['buffered', 'streamed'])
+    parser.add_argument('--child', choices=('buffered', 'streamed'), help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.db)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        init_db.init_db(db_path).close()
+        generate_data(db_path, {'pets': 10_000, 'users': 10_000, 'adoptions': args.adoptions},
+                      seed=1)
+        print(f"{args.adoptions} adoption requests", file=sys.stderr)
+        for mode in args.modes:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', mode, '--db', db_path],
+                cwd=BACKEND_DIR, check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>9}: {r['bytes'] / 1e6:7.1f} MB body"
+                  f"  first byte {r['first_byte_ms']:8.1f} ms  total {r['total_s']:6.2f} s"
+                  f"  peak RSS {r['peak_mb']:7.1f} MB"
+                  f" (+{r['peak_mb'] - r['baseline_mb']:.1f} MB over baseline)")
+
+if __name__ == '__main__':
+    main()
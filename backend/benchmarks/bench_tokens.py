@@ -0,0 +1,70 @@
+# pylint: disable=C0114,C0116,C0413,E0401
+"""Per-request cost of access token verification vs a users table lookup.
+
+Reports microseconds per call for verifying a valid token (HMAC plus a
+lookup in the in-memory map of --revoked revoked tokens), rejecting a
+forged one, and, for comparison, the indexed users lookup that
+DB-backed session checks would need. Timed verify calls fail if they
+check a connection out of the pool.
+
+Run from the backend directory:
+
+    python benchmarks/bench_tokens.py --iterations 100000 --revoked 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import init_db
+from tokens import token_issuer as issuer
+
+def refuse_checkout():
+    raise AssertionError('verify() checked out a database connection')
+
+def per_call_us(func, iterations):
+    return min(timeit.repeat(func, number=iterations, repeat=3)) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=100000)
+    parser.add_argument('--revoked', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        init_db.DATABASE = os.path.join(tmp, 'bench.db')
+        conn = init_db.init_db(init_db.DATABASE)
+        issuer.configure('bench')
+        for i in range(args.revoked):
+            issuer.revoke(issuer.verify(issuer.issue(f'gone{i}')))
+        token = issuer.issue('user1')
+        forged = token[:-2] + ('AA' if not token.endswith('AA') else 'BB')
+        assert issuer.verify(token) and issuer.verify(forged) is None
+        assert issuer.verify(issuer.issue('gone')) and issuer.stats()['revoked'] == args.revoked
+
+        init_db.get_pool().acquire = refuse_checkout
+        results = {
+            'issue': per_call_us(lambda: issuer.issue('user1'), args.iterations),
+            'verify (valid)': per_call_us(lambda: issuer.verify(token), args.iterations),
+            'verify (forged)': per_call_us(lambda: issuer.verify(forged), args.iterations),
+        }
+        conn.executemany(
+            "INSERT INTO users (username, password) VALUES (?, ?)",
+            ((f'user{i}', 'x') for i in range(args.users))
+        )
+        conn.commit()
+        query = "SELECT * FROM users WHERE username = ?"
+        results['users lookup'] = per_call_us(
+            lambda: conn.execute(query, ('user1',)).fetchone(), args.iterations
+        )
+        conn.close()
+        init_db.close_pool()
+    for label, micros in results.items():
+        print(f"{label:>16}: {micros:8.2f} us/call")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# pylint: disable=C0114,C0116,C0413,E0401
+"""Load test serve.py: throughput as the number of worker processes grows.
+
+For each worker count a fresh serve.py is started on a free port against
+a temporary database, then --clients client processes hammer one path
+over keep-alive connections for --duration seconds. Scaling is only
+visible on a machine with at least as many cores as workers + clients.
+
+Run from the backend directory:
+
+    python benchmarks/bench_workers.py --workers 1 2 4 8 --clients 8 --duration 10
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import init_db
+from seed_db import seed_db
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_ready(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/test')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not come up')
+
+def client(port, path, duration, results):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    count = errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                count += 1
+            else:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    results.put((count, errors))
+
+def run(args, workers, db_path):
+    port = free_port()
+    env = dict(os.environ, LOG_LEVEL='WARNING', DATABASE=db_path)
+    with subprocess.Popen(
+        [sys.executable, 'serve.py', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--threads', str(args.threads)],
+        cwd=BACKEND_DIR, env=env,
+    ) as server:
+        try:
+            wait_ready(port)
+            results = multiprocessing.Queue()
+            clients = [
+                multiprocessing.Process(target=client,
+                                        args=(port, args.path, args.duration, results))
+                for _ in range(args.clients)
+            ]
+            for proc in clients:
+                proc.start()
+            totals = [results.get() for _ in clients]
+            for proc in clients:
+                proc.join()
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+    count = sum(c for c, _ in totals)
+    errors = sum(e for _, e in totals)
+    return count / args.duration, errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--path', default='/api/pets?limit=50')
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} clients, {args.threads} threads/worker, "
+          f"GET {args.path}", file=sys.stderr)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        init_db.init_db(db_path).close()
+        seed_db(db_path)
+        baseline = None
+        for workers in args.workers:
+            rate, errors = run(args, workers, db_path)
+            baseline = baseline or rate
+            print(f"{workers:>3} workers: {rate:9.0f} req/s  "
+                  f"({rate / baseline:4.2f}x, {errors} errors)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import os
+import init_db
+
+# Every setting create_app() and serve.py understand, with its default.
+# Each can be overridden by an environment variable of the same name.
+DEFAULTS = {
+    'DATABASE': init_db.DATABASE,
+    'POOL_SIZE': 8,
+    'LOG_LEVEL': 'INFO',
+    'LOG_LEVELS': '',          # per-module levels, "admin=DEBUG,pets=WARNING"
+    'SECRET_KEY': None,        # token signing key; serve.py makes one up for its workers if unset
+    'TOKEN_TTL': 3600,
+    'MAX_CONTENT_LENGTH': 1024 * 1024,  # request body bytes; larger bodies get a 413
+    'DEBUG': False,
+    # feature toggles
+    'ENABLE_SWAGGER': True,    # served lazily; set 0 to drop the docs routes entirely
+    'SWAGGER_CACHE_DIR': os.path.join(init_db.BACKEND_DIR, '.apispec_cache'),  # '' = no disk cache
+    'ENABLE_CORS': True,
+    'ENABLE_COMPRESSION': True,
+    'COMPRESS_MIN_SIZE': 1024, # bytes; smaller buffered bodies are sent as they are
+    'COMPRESS_LEVELS': '',     # per encoding over the defaults, "gzip=6,br=4,zstd=3"
+    'SLOW_QUERY_MS': 100.0,    # statements slower than this go to the 'slow_query' logger
+    'QUERY_REPEAT_WARN': 10,   # warn when one request runs the same statement this often
+    'DB_THREADS': 4,           # executor for the SQLite calls of async views
+    'JSON_ENCODER': 'auto',    # list bodies: 'orjson' if installed, else 'json'
+    'WRITE_BATCH_SIZE': 64,    # questionnaire submissions committed per transaction, at most
+    'WRITE_BATCH_WAIT_MS': 0.0,  # extra wait for a batch to fill; 0 = whatever queued meanwhile
+    'WRITE_QUEUE_SIZE': 4096,  # submissions waiting for the writer beyond this get a 503
+    'EVENTS_BUFFER': 256,      # recent events kept per worker for Last-Event-ID resume
+    'EVENTS_SUBSCRIBER_BUFFER': 64,  # events a slow /api/events client may lag before it is cut
+    'EVENTS_POLL_MS': 200.0,   # how often a worker picks up events committed by other workers
+    'EVENTS_KEEPALIVE': 15.0,  # seconds between keep-alive comments on idle streams
+    'EVENTS_MAX_STREAMS': 1000,  # per worker; threaded mode also caps them at THREADS // 2
+    'METRICS_DIR': '',         # per-process totals for /metrics; serve.py sets one for its workers
+    # serve.py
+    'SERVER_MODE': 'threaded', # or 'async': asyncio connections, the app on the thread pool
+    'HOST': '0.0.0.0',
+    'PORT': 5000,
+    'WORKERS': os.cpu_count() or 1,
+    'THREADS': 8,
+    'BACKLOG': 1024,
+    'GRACEFUL_TIMEOUT': 30.0,
+}
+
+def _coerce(value, default):
+    """Convert an environment string to the type of the default."""
+    if isinstance(default, bool):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, float):
+        return float(value)
+    return value
+
+def load_config(overrides=None, environ=None):
+    """DEFAULTS, then environment variables, then explicit overrides."""
+    environ = os.environ if environ is None else environ
+    config = {
+        key: _coerce(environ[key], default) if key in environ else default
+        for key, default in DEFAULTS.items()
+    }
+    config.update(overrides or {})
+    return config
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import sqlite3
+from flask import jsonify
+from async_support import db_executor
+from pets import PET_COLUMNS
+from questionaire import load_user_recommendations
+
+logger = logging.getLogger(__name__)
+
+ADOPTION_COLUMNS = ('request_id', 'pet_id', 'username', 'status', 'pet_name')
+
+async def get_user_dashboard(username):
+    """Everything the user dashboard renders, in one response.
+    ---
+    tags:
+      - users
+    parameters:
+      - name: username
+        in: path
+        type: string
+        required: true
+        description: Username whose dashboard to load
+    responses:
+        200:
+            description: Latest questionnaire state and adoption requests with pet details
+            schema:
+                type: object
+                properties:
+                    questionnaire:
+                        type: object
+                        description: Same body as GET /api/questionnaire/<username>, or null
+                    adoptions:
+                        type: array
+                        items:
+                            type: object
+                            properties:
+                                request_id:
+                                    type: integer
+                                pet_id:
+                                    type: integer
+                                status:
+                                    type: string
+                                pet:
+                                    $ref: '#/definitions/Pet'
+        500:
+            description: Internal Server Error
+    """
+    try:
+        # independent lookups, each on its own connection, run concurrently
+        questionnaire, adoptions = await asyncio.gather(
+            db_executor.run(lambda conn: load_user_recommendations(conn.cursor(), username)),
+            db_executor.run(load_adoptions, username),
+        )
+        return jsonify({
+            'username': username,
+            'questionnaire': questionnaire,
+            'adoptions': adoptions
+        }), 200
+    except sqlite3.Error as e:
+        logger.exception("get_user_dashboard failed: %s", e)
+        return jsonify({'error': 'Internal Server Error'}), 500
+
+def load_adoptions(conn, username):
+    """A user's adoption requests with their pets."""
+    cursor = conn.cursor()
+    # Adoption requests and their pets in one join instead of a
+    # /api/pets/<id> call per request.
+    cursor.execute(f"""
+        SELECT {', '.join('a.' + c for c in ADOPTION_COLUMNS)},
+               {', '.join(f'p.{c} AS pet_{c}' for c in PET_COLUMNS)}
+        FROM adoptions a
+        LEFT JOIN pets p ON p.id = a.pet_id
+        WHERE a.username = ?
+        ORDER BY a.request_id
+    """, (username,))
+    adoptions = []
+    for row in cursor.fetchall():
+        adoption = {c: row[c] for c in ADOPTION_COLUMNS}
+        pet = {c: row['pet_' + c] for c in PET_COLUMNS}
+        adoption['pet'] = pet if pet['id'] is not None else None
+        adoptions.append(adoption)
+    return adoptions
@@ -0,0 +1,228 @@
+# pylint: disable=R0902,R0903,R1732
+import queue
+import sqlite3
+import threading
+from time import perf_counter
+
+# Applied once when a connection is opened, never per request.
+DEFAULT_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),
+    ('cache_size', -16000),      # negative = KiB, so ~16 MB of page cache
+    ('mmap_size', 268435456),    # 256 MB
+    ('temp_store', 'MEMORY'),
+)
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection frees up within the timeout."""
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that times every statement, rows fetched included.
+
+    SQLite does most of a query's work while rows are stepped, so the
+    fetch methods are timed as well as execute and their time is added
+    to the statement that produced the rows. Each call adds to the
+    connection's db_seconds and is reported to its observer, if any, as
+    observer(conn, sql, seconds, statement_seconds, executed).
+    """
+
+    statement = None
+    statement_seconds = 0.0
+
+    def _done(self, seconds, sql=None):
+        conn = self.connection
+        conn.db_seconds += seconds
+        if sql is not None:
+            self.statement, self.statement_seconds = sql, seconds
+        else:
+            self.statement_seconds += seconds
+        if conn.observer is not None and self.statement is not None:
+            conn.observer(conn, self.statement, seconds, self.statement_seconds, sql is not None)
+
+    # Spelled out per method: this sits under every query, so no extra call layer.
+    def execute(self, sql, parameters=()):
+        start = perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._done(perf_counter() - start, sql)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._done(perf_counter() - start, sql)
+
+    def executescript(self, sql_script):
+        start = perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._done(perf_counter() - start, sql_script)
+
+    def fetchone(self):
+        start = perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._done(perf_counter() - start)
+
+    def fetchmany(self, size=None):
+        start = perf_counter()
+        try:
+            return super().fetchmany(size or self.arraysize)
+        finally:
+            self._done(perf_counter() - start)
+
+    def fetchall(self):
+        start = perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._done(perf_counter() - start)
+
+    def __next__(self):
+        start = perf_counter()
+        try:
+            return super().__next__()
+        finally:
+            self._done(perf_counter() - start)
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors (including execute() shortcuts) are TimedCursors.
+
+    tag names whoever is using the connection (the route, for requests)
+    and request_counts is scratch space for the observer; begin() resets
+    both along with db_seconds when the connection changes hands.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.observer = None
+        self.begin()
+
+    def begin(self, tag=None):
+        self.db_seconds = 0.0
+        self.tag = tag
+        self.request_counts = {}
+
+    def cursor(self, factory=TimedCursor):  # pylint: disable=useless-parent-delegation
+        # not useless: the default factory differs
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def take_db_time(self):
+        """Seconds spent in SQLite since the last call, then reset."""
+        seconds, self.db_seconds = self.db_seconds, 0.0
+        return seconds
+
+class ConnectionPool:
+    """Bounded pool of pragma-tuned SQLite connections.
+
+    Connections are reused across requests so the statement cache stays
+    warm and the pragmas are paid for once per connection. A max_size of
+    0 disables pooling: every acquire opens a fresh connection and every
+    release closes it (the old get_db_connection() behaviour).
+    """
+
+    def __init__(self, database, max_size=8, timeout=10.0,
+                 pragmas=DEFAULT_PRAGMAS, cached_statements=256):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = pragmas
+        self.cached_statements = cached_statements
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size) if max_size > 0 else None
+        self._lock = threading.Lock()
+        self._all = set()
+        self.opened = 0
+        self.observer = None   # passed on to every TimedConnection opened from now on
+
+    def connect(self):
+        """Open a new configured connection (not tracked by the pool)."""
+        conn = sqlite3.connect(
+            self.database,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=TimedConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name} = {value}")
+        conn.observer = self.observer
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def acquire(self):
+        """Check a connection out of the pool, opening one if none is idle."""
+        if self._slots is None:
+            return self.connect()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"no free connection after {self.timeout}s")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            conn = self.connect()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._all.add(conn)
+        return conn
+
+    def release(self, conn, discard=False):
+        """Return a connection; any open transaction is rolled back."""
+        if self._slots is None:
+            conn.close()
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            discard = True
+        if discard:
+            with self._lock:
+                self._all.discard(conn)
+            conn.close()
+        else:
+            self._idle.put(conn)
+        self._slots.release()
+
+    def close(self):
+        """Close every connection the pool has opened."""
+        with self._lock:
+            conns, self._all = self._all, set()
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        """Snapshot of pool usage for diagnostics."""
+        return {
+            'database': self.database,
+            'max_size': self.max_size,
+            'open': len(self._all),
+            'idle': self._idle.qsize(),
+            'opened_total': self.opened,
+        }
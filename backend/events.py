@@ -0,0 +1,392 @@
+# pylint: disable=R0902,R0913,R0917
+import collections
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from flask import Response, request
+from async_server import AWAIT_FUTURES
+from init_db import get_pool
+
+logger = logging.getLogger(__name__)
+
+EVENT_BUFFER = 256        # recent events each worker keeps for Last-Event-ID resume
+SUBSCRIBER_BUFFER = 64    # undelivered events one stream may hold before it is dropped
+POLL_INTERVAL = 0.2       # seconds between reads of events committed by other workers
+POLL_BATCH = 500
+KEEPALIVE = 15.0          # seconds between comment lines on an idle stream
+MAX_STREAMS = 1000        # open streams per worker
+EVENT_RETAIN = 10_000     # rows kept in the events table
+RETRY_MS = 3000           # client reconnect delay, sent in the stream's first line
+EVENT_STREAM_MIMETYPE = 'text/event-stream'
+
+class StreamLimit(RuntimeError):
+    """Raised when a worker already serves as many event streams as it may."""
+
+def record_events(conn, events):
+    """Add (type, username, data) status changes to the caller's open transaction.
+
+    They are published when the caller commits; call
+    event_broadcaster.notify() after the commit so this worker's
+    subscribers hear at once instead of at the next poll.
+    """
+    conn.executemany(
+        "INSERT INTO events (type, username, data) VALUES (?, ?, ?)",
+        [(kind, username, json.dumps({'type': kind, 'username': username, **data},
+                                     separators=(',', ':')))
+         for kind, username, data in events]
+    )
+    conn.execute("DELETE FROM events WHERE id <= (SELECT MAX(id) FROM events) - ?",
+                 (EVENT_RETAIN,))
+
+def format_event(event):
+    event_id, kind, _, data = event
+    return f'id: {event_id}\nevent: {kind}\ndata: {data}\n\n'.encode('utf-8')
+
+class Subscription:
+    """One stream's bounded buffer of undelivered events.
+
+    username None receives every event. A subscriber that falls
+    size events behind is ended rather than allowed to grow: its stream
+    sends what it holds and closes, and the client resumes from its
+    Last-Event-ID on reconnect.
+    """
+
+    def __init__(self, username, size, blocking):
+        self.username = username
+        self.size = size
+        self.blocking = blocking
+        self.ended = False
+        self._events = []
+        self._keepalive = False
+        self._waiter = None
+        self._cond = threading.Condition()
+
+    def _ready(self):
+        return self._events or self._keepalive or self.ended
+
+    def _signal(self, event=None, keepalive=False, end=False):
+        with self._cond:
+            if event is not None:
+                if len(self._events) >= self.size:
+                    end = True
+                else:
+                    self._events.append(event)
+            self._keepalive = self._keepalive or keepalive
+            self.ended = self.ended or end
+            self._cond.notify_all()
+            waiter, self._waiter = self._waiter, None
+        if waiter is not None:
+            waiter.set_result(None)
+        return not self.ended
+
+    def push(self, event):
+        """Queue an event; False once the subscriber has fallen too far behind."""
+        return self._signal(event=event)
+
+    def keepalive(self):
+        self._signal(keepalive=True)
+
+    def end(self):
+        self._signal(end=True)
+
+    def take(self):
+        """(events, keepalive due, ended) since the last call."""
+        with self._cond:
+            events, self._events = self._events, []
+            keepalive, self._keepalive = self._keepalive, False
+            return events, keepalive, self.ended
+
+    def wait(self):
+        with self._cond:
+            while not self._ready():
+                self._cond.wait()
+
+    def waiter(self):
+        """Future that completes when take() has something."""
+        future = Future()
+        with self._cond:
+            if self._ready():
+                future.set_result(None)
+            else:
+                self._waiter = future
+        return future
+
+class EventStream:
+    """text/event-stream response body for one subscription.
+
+    Under a server that awaits Future chunks (see AWAIT_FUTURES) an idle
+    stream yields a Future and holds no thread while it waits; otherwise
+    it blocks its request thread.
+    """
+
+    def __init__(self, broadcaster, subscription, backlog):
+        self._broadcaster = broadcaster
+        self._subscription = subscription
+        self._backlog = backlog
+
+    def __iter__(self):
+        head = f'retry: {RETRY_MS}\n\n'.encode('ascii')
+        if self._backlog is None:
+            # too far behind to resume: the client reloads its state instead
+            head += b'event: reset\ndata: {}\n\n'
+        else:
+            head += b''.join(map(format_event, self._backlog))
+        self._backlog = None
+        yield head
+        subscription = self._subscription
+        while True:
+            events, keepalive, ended = subscription.take()
+            if events:
+                yield b''.join(map(format_event, events))
+            elif ended:
+                return
+            elif keepalive:
+                yield b': keepalive\n\n'
+            elif subscription.blocking:
+                subscription.wait()
+            else:
+                yield subscription.waiter()
+
+    def close(self):
+        self._broadcaster.unsubscribe(self._subscription)
+
+class EventBroadcaster:
+    """Fans committed status changes out to this worker's event streams.
+
+    The events table is the channel between processes: whichever worker
+    makes a change writes its event in the same transaction, and every
+    worker's poller thread reads new rows in id order, every
+    poll_interval or at once when notify() says this worker committed
+    one. The ids are the SSE event ids. The last buffer_size events are
+    kept in memory, so a client that reconnects with Last-Event-ID to
+    any worker gets what it missed, or a reset event if it is further
+    behind than that. The poller starts with the first subscriber, or the
+    first sync(), after serve.py has forked.
+
+    Event types registered with listen() carry worker state rather than
+    status changes: they go to their handler and never to a stream.
+    """
+
+    def __init__(self):
+        self.buffer_size = EVENT_BUFFER
+        self.subscriber_buffer = SUBSCRIBER_BUFFER
+        self.poll_interval = POLL_INTERVAL
+        self.keepalive = KEEPALIVE
+        self.max_streams = MAX_STREAMS
+        self.max_blocking_streams = MAX_STREAMS
+        self._ring = collections.deque()
+        self._floor = 0        # events after this id are all in the ring or still to come
+        self._last_id = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pool = None
+        self._conn = None
+        self._failing = False
+        self._handlers = {}    # event type -> (on_event, load)
+        self.delivered = 0
+        self.dropped = 0
+
+    def configure(self, buffer_size=EVENT_BUFFER, subscriber_buffer=SUBSCRIBER_BUFFER,
+                  poll_interval=POLL_INTERVAL, keepalive=KEEPALIVE, max_streams=MAX_STREAMS,
+                  max_blocking_streams=MAX_STREAMS):
+        """max_blocking_streams caps streams that each hold a request thread."""
+        with self._lock:
+            self.buffer_size = buffer_size
+            self.subscriber_buffer = subscriber_buffer
+            self.poll_interval = poll_interval
+            self.keepalive = keepalive
+            self.max_streams = max_streams
+            self.max_blocking_streams = max_blocking_streams
+            while len(self._ring) > buffer_size:
+                self._floor = self._ring.popleft()[0]
+
+    def notify(self):
+        """This worker just committed events: poll now."""
+        self._wake.set()
+
+    def listen(self, kind, on_event, load):
+        """Hand events of type kind to on_event(username, data) in every worker.
+
+        load(conn) rebuilds the handler's state from the database whenever
+        the poller connects to one, in the same read transaction as the
+        point it starts polling from, so no event is missed or seen twice.
+        """
+        self._handlers[kind] = (on_event, load)
+
+    def sync(self):
+        """Start the poller and bring listeners up to date before returning."""
+        self._ensure_thread()
+        self._poll()
+
+    def subscribe(self, username, last_id=None, blocking=True):
+        """(Subscription, backlog) for a new stream.
+
+        backlog holds the buffered events after last_id, or is None when
+        events the client missed are no longer buffered.
+        """
+        self._ensure_thread()
+        self._poll()
+        with self._lock:
+            blocking_streams = sum(1 for s in self._subscribers if s.blocking)
+            if (len(self._subscribers) >= self.max_streams
+                    or blocking and blocking_streams >= self.max_blocking_streams):
+                raise StreamLimit('too many open event streams')
+            subscription = Subscription(username, self.subscriber_buffer, blocking)
+            if last_id is None:
+                backlog = []
+            elif last_id < self._floor:
+                backlog = None
+            else:
+                backlog = [event for event in self._ring if event[0] > last_id
+                           and (username is None or event[2] == username)]
+            self._subscribers.add(subscription)
+        return subscription, backlog
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def close(self):
+        """End every open stream (worker shutdown); clients reconnect elsewhere."""
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, set()
+        for subscription in subscribers:
+            subscription.end()
+
+    def response(self, username):
+        """Streaming response of the events for username (None: all of them)."""
+        header = request.headers.get('Last-Event-ID', '')
+        last_id = int(header) if header.isdigit() else None
+        blocking = not request.environ.get(AWAIT_FUTURES)
+        subscription, backlog = self.subscribe(username, last_id, blocking)
+        response = Response(EventStream(self, subscription, backlog),
+                            mimetype=EVENT_STREAM_MIMETYPE)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'   # proxies must not hold events back
+        return response
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='events-poller',
+                                                    daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        next_keepalive = time.monotonic() + self.keepalive
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            self._poll()
+            if time.monotonic() >= next_keepalive:
+                next_keepalive = time.monotonic() + self.keepalive
+                with self._lock:
+                    subscribers = list(self._subscribers)
+                for subscription in subscribers:
+                    subscription.keepalive()
+
+    def _connection(self):
+        pool = get_pool()
+        if pool is self._pool:
+            if self._conn is None:   # lost after an error
+                self._conn = pool.connect()
+                self._conn.observer = None
+            return self._conn
+        # a new pool means a new database file: event ids start over
+        self._disconnect()
+        conn = pool.connect()
+        conn.observer = None   # a poll every 200 ms would crowd the query report
+        conn.execute("BEGIN")
+        try:
+            tail = conn.execute("SELECT id, type, username, data FROM events"
+                                " ORDER BY id DESC LIMIT ?", (self.buffer_size,)).fetchall()
+            for _, load in self._handlers.values():
+                load(conn)
+        finally:
+            conn.commit()
+        with self._lock:
+            self._ring = collections.deque(tuple(row) for row in reversed(tail)
+                                           if row[1] not in self._handlers)
+            self._last_id = tail[0][0] if tail else 0
+            self._floor = tail[-1][0] - 1 if len(tail) == self.buffer_size else 0
+            subscribers, self._subscribers = self._subscribers, set()
+        for subscription in subscribers:
+            subscription.end()
+        self._pool, self._conn = pool, conn
+        return conn
+
+    def _disconnect(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
+
+    def _poll(self):
+        with self._poll_lock:
+            try:
+                conn = self._connection()
+                while True:
+                    rows = conn.execute("SELECT id, type, username, data FROM events"
+                                        " WHERE id > ? ORDER BY id LIMIT ?",
+                                        (self._last_id, POLL_BATCH)).fetchall()
+                    self._dispatch([tuple(row) for row in rows])
+                    if len(rows) < POLL_BATCH:
+                        break
+            except sqlite3.Error as e:
+                if not self._failing:
+                    logger.warning("Reading events failed: %s", e)
+                self._failing = True
+                self._disconnect()
+                return
+            if self._failing:
+                logger.info("Reading events works again")
+                self._failing = False
+
+    def _dispatch(self, events):
+        for event in events:
+            handler = self._handlers.get(event[1])
+            if handler is not None:
+                handler[0](event[2], json.loads(event[3]))
+        with self._lock:
+            for event in events:
+                if event[1] in self._handlers:
+                    self._last_id = event[0]
+                    continue
+                if len(self._ring) >= self.buffer_size:
+                    self._floor = self._ring.popleft()[0]
+                self._ring.append(event)
+                self._last_id = event[0]
+                for subscription in list(self._subscribers):
+                    if subscription.username not in (None, event[2]):
+                        continue
+                    if subscription.push(event):
+                        self.delivered += 1
+                    else:
+                        self._subscribers.discard(subscription)
+                        self.dropped += 1
+                        logger.info("Event stream for %s fell %d events behind; dropped",
+                                    subscription.username or 'admin', subscription.size)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'streams': len(self._subscribers),
+                'blocking_streams': sum(1 for s in self._subscribers if s.blocking),
+                'max_streams': self.max_streams,
+                'max_blocking_streams': self.max_blocking_streams,
+                'last_event_id': self._last_id,
+                'buffered': len(self._ring),
+                'delivered': self.delivered,
+                'dropped_streams': self.dropped,
+            }
+
+event_broadcaster = EventBroadcaster()
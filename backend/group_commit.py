@@ -0,0 +1,177 @@
+# pylint: disable=R0902,R1732
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from init_db import get_pool
+from metrics import request_metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 64        # most submissions one transaction carries
+MAX_WAIT_MS = 0.0      # extra wait for company; 0 = take what queued during the last commit
+MAX_PENDING = 4096     # queued submissions beyond this are refused
+
+class WriteQueueFull(RuntimeError):
+    """Raised when too many submissions are already waiting for the writer."""
+
+class GroupCommitWriter:
+    """One writer thread that commits queued submissions in batches.
+
+    submit(item) puts the item on an in-process queue and blocks until
+    the transaction carrying it has committed, then returns True, or
+    raises what the write raised. The writer takes the first waiting
+    item plus everything queued behind it (up to batch_size), waits up
+    to max_wait_ms for more if there is room, and hands them all to
+    write_batch(conn, items) inside one transaction: one commit and one
+    fsync for the lot instead of one each, and no contention for
+    SQLite's write lock between requests. Under load, submissions queue
+    up while a commit is in flight, so batches form without any wait.
+
+    The writer's connection runs with synchronous=FULL, so a caller's
+    submission is on disk when submit() returns. If a batch fails it is
+    rolled back and its items are retried one transaction each, so one
+    bad item fails alone. At most max_pending items may wait; beyond
+    that callers get WriteQueueFull (a 503) instead of piling up. The
+    thread starts on first use, so it never exists at fork time.
+    """
+
+    def __init__(self, name, write_batch, batch_size=BATCH_SIZE, max_wait_ms=MAX_WAIT_MS,
+                 max_pending=MAX_PENDING):
+        self.name = name
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_pending = max_pending
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pool = None
+        self._conn = None
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.commit_seconds = 0.0
+
+    def configure(self, batch_size, max_wait_ms, max_pending=MAX_PENDING):
+        with self._lock:
+            self.batch_size = batch_size
+            self.max_wait_ms = max_wait_ms
+            if max_pending != self.max_pending:
+                # only submissions made after this call use the new bound
+                self.max_pending = max_pending
+                self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, item):
+        """Queue item for the next batch and wait until it is committed."""
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise WriteQueueFull(f'{self.name} write queue is full')
+        try:
+            future = Future()
+            self._ensure_thread()
+            self._queue.put((item, future))
+            return future.result()
+        finally:
+            slots.release()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name=f'{self.name}-writer', daemon=True)
+                    self._thread.start()
+
+    def _take_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.batch_size:
+            try:
+                # whatever is already queued joins at once; then wait out the deadline
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _connection(self):
+        pool = get_pool()
+        if pool is not self._pool:
+            # a new pool means a new database file (or a reset one)
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except sqlite3.Error:
+                    pass
+            self._pool = pool
+            self._conn = pool.connect()
+            self._conn.execute("PRAGMA synchronous = FULL")
+        return self._conn
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                self._commit(batch)
+            except Exception as e:  # pylint: disable=broad-except
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                    continue
+                logger.warning("%s batch of %d failed (%s); retrying its items one by one",
+                               self.name, len(batch), e)
+                for job in batch:
+                    try:
+                        self._commit([job])
+                    except Exception as error:  # pylint: disable=broad-except
+                        job[1].set_exception(error)
+
+    def _commit(self, batch):
+        """Write and commit one batch, then release its callers."""
+        start = time.perf_counter()
+        conn = self._connection()
+        conn.begin(f'{self.name} writer')   # a batch counts as one request in query stats
+        try:
+            self.write_batch(conn, [item for item, _ in batch])
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                self._pool = None   # unusable; the next batch opens a fresh connection
+            raise
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.commit_seconds += elapsed
+        labels = (('writer', self.name),)
+        request_metrics.observe('db_write_batch_size', labels, len(batch))
+        request_metrics.observe('db_write_batch_seconds', labels, elapsed)
+        for _, future in batch:
+            future.set_result(True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batch_size': self.batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'queue_depth': self._queue.qsize(),
+                'batches': self.batches,
+                'items': self.items,
+                'mean_batch': round(self.items / self.batches, 2) if self.batches else 0.0,
+                'largest_batch': self.largest_batch,
+                'mean_commit_ms': (round(self.commit_seconds / self.batches * 1000, 3)
+                                   if self.batches else 0.0),
+            }
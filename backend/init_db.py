@@ -1,14 +1,64 @@
+import logging
 import sqlite3
 import os
+import threading
+from flask import g, has_app_context, has_request_context, request
+from db_pool import ConnectionPool
+from pet_cache import catalog_cache
+from query_stats import query_stats
 
-DATABASE = 'backend/pets.db'   # Now using pets.db for both reads and writes.
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DATABASE = os.path.join(BACKEND_DIR, 'pets.db')   # Now using pets.db for both reads and writes.
+POOL_SIZE = 8   # 0 disables pooling (a fresh connection per request)
+
+logger = logging.getLogger(__name__)
+_pool = None  # pylint: disable=invalid-name
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool  # pylint: disable=global-statement
+    with _pool_lock:
+        if _pool is None or _pool.database != DATABASE or _pool.max_size != POOL_SIZE:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DATABASE, max_size=POOL_SIZE)
+            _pool.observer = query_stats.record
+            logger.info("Connection pool created for database file %s", DATABASE)
+        return _pool
+
+def close_pool():
+    """Close all pooled connections; the next request builds a new pool."""
+    global _pool  # pylint: disable=global-statement
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = None
 
 def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    print("DEBUG: Connection open with database file:", DATABASE)
-    return conn
+    """Get a database connection.
+
+    Inside a Flask app context the connection is checked out of the pool
+    on first use and shared for the rest of the request; close_db_connection()
+    hands it back at teardown, so callers must not close it. Outside an app
+    context the caller gets a standalone connection and owns it.
+    """
+    if not has_app_context():
+        return get_pool().connect()
+    if 'db_conn' not in g:
+        g.db_pool = get_pool()
+        g.db_conn = g.db_pool.acquire()
+        # only this request's queries count, tagged with its route
+        rule = request.url_rule if has_request_context() else None
+        g.db_conn.begin(rule.rule if rule is not None else None)
+    return g.db_conn
+
+def close_db_connection(_exc=None):
+    """Return the app context's connection to the pool (teardown hook)."""
+    conn = g.pop('db_conn', None)
+    pool = g.pop('db_pool', None)
+    if conn is not None:
+        pool.release(conn)
 
 def init_db(db_path=None):
     """Initialize the database with schema.
@@ -19,13 +69,15 @@ def init_db(db_path=None):
     Returns:
         sqlite3.Connection: The database connection
     """
-    backend_dir = os.path.dirname(os.path.abspath(__file__))
     if db_path is None:
-        # Use the same filename as DATABASE
-        db_path = os.path.join(backend_dir, DATABASE)
-    if os.path.exists(db_path):
-        os.remove(db_path)
-    with open(os.path.join(backend_dir, 'schema.sql'), 'r', encoding='utf-8') as f:
+        db_path = DATABASE
+    # Pooled connections would otherwise keep pointing at the removed file.
+    close_pool()
+    catalog_cache.invalidate()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    with open(os.path.join(BACKEND_DIR, 'schema.sql'), 'r', encoding='utf-8') as f:
         schema = f.read()
     db_conn = sqlite3.connect(db_path)
     db_conn.executescript(schema)
@@ -1,12 +1,16 @@
 import sqlite3
 from flask import jsonify
 from init_db import get_db_connection
+from passwords import check_password
+from tokens import token_issuer
 
 def login_user(username, password):
     """Authenticate a user by username and password."""
     # 1) basic validation
     if not username or not password:
         return jsonify({'error': 'Username and password are required'}), 400
+    if not isinstance(username, str) or not isinstance(password, str):
+        return jsonify({'error': 'Username and password must be strings'}), 400
 
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -17,18 +21,16 @@ def login_user(username, password):
         if user is None:
             return jsonify({'error': 'User not found'}), 404
 
-        # 3) verify password
-        if user['password'] != password:
+        # 3) verify password (legacy plaintext/low-cost hashes are upgraded)
+        if not check_password(conn, 'users', user, password):
             return jsonify({'error': 'Invalid password'}), 401
 
         # 4) success
         return jsonify({
             'message': 'Login successful',
-            'user': {'username': username}
+            'user': {'username': username},
+            'token': token_issuer.issue(username)
         }), 200
 
     except sqlite3.Error:
         return jsonify({'error': 'Internal Server Error'}), 500
-
-    finally:
-        conn.close()
@@ -1,26 +1,106 @@
+import logging
 import sqlite3  # Add this line
-from flask import Flask, request, jsonify
-from flasgger import Swagger
+from flask import Blueprint, Response, current_app, g, request, jsonify
 from flask_cors import CORS
 from login import login_user
 from register import register_user
-from pets import get_pets, get_pet
-from questionaire import get_pet_recommendations, get_user_recommendations
+from pets import get_pets, get_pet, search_pets
+from questionaire import get_pet_recommendations, get_user_recommendations, questionnaire_writer
+from dashboard import get_user_dashboard
 from admin import (
     admin_login,
     get_pending_questionnaires,
     approve_questionnaire,
     reject_questionnaire,
+    bulk_review_questionnaires,
+    get_admin_queue,
     get_all_adoption_requests_from_db,
     create_adoption_request_in_db
 )
-from init_db import get_db_connection
+import init_db
+from init_db import get_db_connection, close_db_connection
+from matching import DEFAULT_TOP_K
+from pet_cache import catalog_cache
+from passwords import PasswordQueueFull, password_hasher
+from tokens import require_token, token_issuer
+from app_logging import configure_logging, parse_module_levels
+from config import load_config
+from api_docs import SWAGGER_TEMPLATE, LazyApiDocs
+from metrics import request_metrics
+from query_stats import query_stats
+from async_support import AsyncFlask, db_executor
+from streaming import json_rows
+from serializers import UnknownFormat, row_serializer
+from response_compression import response_compressor
+from group_commit import WriteQueueFull
+from events import StreamLimit, event_broadcaster, record_events
 
-app = Flask(__name__)
-swagger = Swagger(app)
-CORS(app)
+logger = logging.getLogger(__name__)
+api = Blueprint('api', __name__)
 
-@app.route('/api/login', methods=['POST'])
+def create_app(config=None):
+    """Build the Flask app from load_config() settings plus `config` overrides.
+
+    The database path, pool size and token settings are module globals
+    shared by the whole process, so every app in one process uses the
+    last configured values.
+    """
+    config = load_config(config)
+    configure_logging(config['LOG_LEVEL'], parse_module_levels(config['LOG_LEVELS']))
+    init_db.DATABASE = config['DATABASE']
+    init_db.POOL_SIZE = config['POOL_SIZE']
+    token_issuer.configure(config['SECRET_KEY'], config['TOKEN_TTL'])
+    request_metrics.configure(config['METRICS_DIR'])
+    query_stats.configure(config['SLOW_QUERY_MS'], config['QUERY_REPEAT_WARN'])
+    db_executor.configure(config['DB_THREADS'])
+    row_serializer.configure(config['JSON_ENCODER'])
+    questionnaire_writer.configure(config['WRITE_BATCH_SIZE'], config['WRITE_BATCH_WAIT_MS'],
+                                   config['WRITE_QUEUE_SIZE'])
+    event_broadcaster.configure(
+        config['EVENTS_BUFFER'], config['EVENTS_SUBSCRIBER_BUFFER'],
+        config['EVENTS_POLL_MS'] / 1000, config['EVENTS_KEEPALIVE'], config['EVENTS_MAX_STREAMS'],
+        # a stream on the threaded server holds a request thread; leave the rest for requests
+        max_blocking_streams=max(1, config['THREADS'] // 2),
+    )
+    response_compressor.configure(config['COMPRESS_MIN_SIZE'], {
+        encoding: int(level)
+        for encoding, level in parse_module_levels(config['COMPRESS_LEVELS']).items()
+    })
+
+    flask_app = AsyncFlask(__name__)
+    flask_app.config.update(config)
+    request_metrics.instrument(flask_app)
+    if config['ENABLE_COMPRESSION']:
+        # registered later, so it runs first: the metrics see the compressed size
+        response_compressor.instrument(flask_app)
+    flask_app.register_blueprint(api)
+    if config['ENABLE_CORS']:
+        CORS(flask_app, expose_headers=['X-Next-After-Id', 'X-Next-Offset', 'X-Search-Order',
+                                               'Idempotent-Replayed'])
+    flask_app.teardown_appcontext(close_db_connection)
+    if config['ENABLE_SWAGGER']:
+        flask_app.wsgi_app = LazyApiDocs(
+            flask_app, lambda: create_docs_app(config), config['SWAGGER_CACHE_DIR']
+        )
+    return flask_app
+
+def create_docs_app(config):
+    """The api routes plus flasgger's UI and spec views; built on first docs request."""
+    from flasgger import Swagger  # pylint: disable=import-outside-toplevel
+    docs_app = AsyncFlask(__name__)
+    docs_app.config.update(config)
+    docs_app.register_blueprint(api)
+    Swagger(docs_app, template=SWAGGER_TEMPLATE)
+    if config['ENABLE_CORS']:
+        CORS(docs_app)
+    return docs_app
+
+def _json_object():
+    """The request's JSON body if it is an object, else {} (missing fields get a 400)."""
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
+
+@api.route('/api/login', methods=['POST'])
 def login():
     """Login endpoint.
     ---
@@ -44,7 +124,7 @@ def login():
               description: Password
     responses:
         200:
-            description: Login successful
+            description: Login successful, with a bearer access token
         401:
             description: Invalid credentials
         404:
@@ -52,10 +132,10 @@ def login():
         500:
             description: Internal Server Error
     """
-    data = request.get_json()
-    return login_user(data['username'], data['password'])
+    data = _json_object()
+    return login_user(data.get('username'), data.get('password'))
 
-@app.route('/api/register', methods=['POST'])
+@api.route('/api/register', methods=['POST'])
 def register():
     """Register endpoint.
     ---
@@ -85,10 +165,26 @@ def register():
         500:
             description: Internal Server Error
     """
-    data = request.get_json()
-    return register_user(data['username'], data['password'])
+    data = _json_object()
+    return register_user(data.get('username'), data.get('password'))
 
-@app.route('/api/admin/login', methods=['POST'])
+@api.route('/api/logout', methods=['POST'])
+@require_token()
+def logout():
+    """Revoke the bearer token used for this request.
+    ---
+    tags:
+      - auth
+    responses:
+        200:
+            description: Token revoked
+        401:
+            description: Invalid or missing token
+    """
+    token_issuer.revoke(g.token)
+    return jsonify({'message': 'Logged out'}), 200
+
+@api.route('/api/admin/login', methods=['POST'])
 def admin_login_route():
     """Admin login endpoint.
     ---
@@ -118,77 +214,308 @@ def admin_login_route():
         500:
             description: Server error
     """
-    data = request.get_json()
-    user = data['username']
-    password = data['password']
-    return admin_login(user, password)
+    data = _json_object()
+    return admin_login(data.get('username'), data.get('password'))
 
-@app.route('/api/admin/questionnaires', methods=['GET'])
+@api.route('/api/admin/questionnaires', methods=['GET'])
+@require_token(role='admin')
 def get_pending_questionnaires_route():
     """Get all pending questionnaires.
     ---
     tags:
       - admin
+    parameters:
+      - name: suggest
+        in: query
+        type: integer
+        required: false
+        description: Number of suggested pets per questionnaire
     responses:
         200:
-            description: List of pending questionnaires
+            description: List of pending questionnaires with suggested pets
         500:
             description: Internal Server Error
+        401:
+            description: Invalid or missing token
+        403:
+            description: Not an admin token
     """
-    return get_pending_questionnaires()
+    return get_pending_questionnaires(request.args.get('suggest', DEFAULT_TOP_K, type=int))
 
-@app.route(
+@api.route(
     '/api/admin/questionnaires/<int:questionnaire_id>/approve',
     methods=['POST']
 )
+@require_token(role='admin')
 def approve_questionnaire_route(questionnaire_id):
-    data = request.get_json()
-    pet_ids = data.get('pet_ids', [])
-    if not pet_ids:
-        return jsonify({'error': 'Pet IDs are required for approval'}), 400
-    return approve_questionnaire(questionnaire_id, pet_ids)
+    return approve_questionnaire(questionnaire_id, _json_object().get('pet_ids'))
 
-@app.route(
+@api.route(
     '/api/admin/questionnaires/<int:questionnaire_id>/reject',
     methods=['POST']
 )
+@require_token(role='admin')
 def reject_questionnaire_route(questionnaire_id):
     return reject_questionnaire(questionnaire_id)
 
-@app.route('/api/pets', methods=['GET'])
+@api.route('/api/admin/questionnaires/bulk', methods=['POST'])
+@require_token(role='admin')
+def bulk_review_questionnaires_route():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'No data provided'}), 400
+    approvals = data.get('approve', [])
+    rejections = data.get('reject', [])
+    if not isinstance(approvals, list) or not isinstance(rejections, list):
+        return jsonify({'error': 'approve and reject must be lists'}), 400
+    return bulk_review_questionnaires(approvals, rejections)
+
+@api.route('/api/admin/queue', methods=['GET'])
+@require_token(role='admin')
+def admin_queue():
+    return get_admin_queue(request.args)
+
+@api.route('/api/pets', methods=['GET'])
 def pets():
-    return get_pets()
+    return get_pets(request.args)
+
+@api.route('/api/pets/search', methods=['GET'])
+def pet_search():
+    return search_pets(request.args)
 
-@app.route('/api/pets/<int:pet_id>', methods=['GET'])
+@api.route('/api/pets/<int:pet_id>', methods=['GET'])
 def pet_detail(pet_id):
     return get_pet(pet_id)
 
-@app.route('/api/questionnaire', methods=['POST'])
+@api.route('/api/admin/cache', methods=['GET'])
+@require_token(role='admin')
+def cache_stats():
+    """Pet catalog cache counters.
+    ---
+    tags:
+      - admin
+    responses:
+        200:
+            description: Hit, miss and eviction counts of the pet catalog cache
+        401:
+            description: Invalid or missing token
+        403:
+            description: Not an admin token
+    """
+    return jsonify(catalog_cache.stats()), 200
+
+@api.route('/api/admin/passwords', methods=['GET'])
+@require_token(role='admin')
+def password_stats():
+    """Password hashing pool counters.
+    ---
+    tags:
+      - admin
+    responses:
+        200:
+            description: bcrypt cost, queue depth and hash latency of the password pool
+        401:
+            description: Invalid or missing token
+        403:
+            description: Not an admin token
+    """
+    return jsonify(password_hasher.stats()), 200
+
+@api.route('/api/admin/compression', methods=['GET'])
+@require_token(role='admin')
+def compression_stats():
+    """Response compression counters.
+    ---
+    tags:
+      - admin
+    responses:
+        200:
+            description: Encodings on offer; responses, bytes in/out, ratio and CPU per encoding
+        401:
+            description: Invalid or missing token
+        403:
+            description: Not an admin token
+    """
+    return jsonify(response_compressor.stats()), 200
+
+@api.route('/api/admin/writes', methods=['GET'])
+@require_token(role='admin')
+def write_stats():
+    """Group-commit writer counters.
+    ---
+    tags:
+      - admin
+    responses:
+        200:
+            description: Batch settings, queue depth, batches and submissions committed, commit time
+        401:
+            description: Invalid or missing token
+        403:
+            description: Not an admin token
+    """
+    return jsonify({'questionnaire': questionnaire_writer.stats()}), 200
+
+@api.route('/api/admin/streams', methods=['GET'])
+@require_token(role='admin')
+def stream_stats():
+    """Event stream counters.
+    ---
+    tags:
+      - admin
+    responses:
+        200:
+            description: Open /api/events streams, last event id, events delivered, streams dropped
+        401:
+            description: Invalid or missing token
+        403:
+            description: Not an admin token
+    """
+    return jsonify(event_broadcaster.stats()), 200
+
+@api.route('/api/events', methods=['GET'])
+@require_token()
+def event_stream():
+    """Server-Sent Events stream of questionnaire and adoption status changes.
+    ---
+    tags:
+      - users
+    parameters:
+      - name: username
+        in: query
+        type: string
+        description: Whose changes to send; users get their own, admins everyone's by default
+      - name: Last-Event-ID
+        in: header
+        type: integer
+        description: Resume after this event id
+    responses:
+        200:
+            description: >
+                text/event-stream of questionnaire and adoption events; a reset event
+                means the missed events are gone and the client should reload its state
+        401:
+            description: Invalid or missing token
+        403:
+            description: A user asked for someone else's events
+        503:
+            description: This worker has too many open streams
+    """
+    username = request.args.get('username')
+    if g.token['role'] != 'admin':
+        if username not in (None, g.token['sub']):
+            return jsonify({'error': 'Forbidden'}), 403
+        username = g.token['sub']
+    return event_broadcaster.response(username)
+
+@api.route('/api/admin/queries', methods=['GET'])
+@require_token(role='admin')
+def query_report():
+    """Top SQL statement fingerprints of this worker.
+    ---
+    tags:
+      - admin
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        default: 20
+      - name: order_by
+        in: query
+        type: string
+        enum: [total, count, max]
+        default: total
+    responses:
+        200:
+            description: Count and total/mean/max time per fingerprint and route, and slow queries
+        401:
+            description: Invalid or missing token
+        403:
+            description: Not an admin token
+        400:
+            description: Invalid order_by or limit
+    """
+    order_by = request.args.get('order_by', 'total')
+    limit = request.args.get('limit', 20, type=int)
+    if order_by not in ('total', 'count', 'max') or limit < 1:
+        return jsonify({'error': 'order_by must be total, count or max and limit positive'}), 400
+    return jsonify({
+        **query_stats.stats(),
+        'top': query_stats.top(limit, order_by),
+        'slow': query_stats.slow_queries(),
+    }), 200
+
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics.
+    ---
+    tags:
+      - admin
+    produces:
+      - text/plain
+    responses:
+        200:
+            description: Per-route latency, DB time, size and in-flight requests of all workers
+    """
+    return Response(request_metrics.render(),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@api.before_app_request
+def limit_request_body():
+    # Flask applies MAX_CONTENT_LENGTH to form data only; JSON bodies are checked here
+    limit = current_app.config.get('MAX_CONTENT_LENGTH')
+    if limit is not None and (request.content_length or 0) > limit:
+        return jsonify({'error': 'Request body too large'}), 413
+    return None
+
+@api.app_errorhandler(UnknownFormat)
+def unknown_format(error):
+    return jsonify({'error': str(error)}), 400
+
+@api.app_errorhandler(PasswordQueueFull)
+def password_queue_full(_error):
+    # shed load instead of queueing bcrypt work without bound
+    return jsonify({'error': 'Server busy, try again'}), 503, {'Retry-After': '1'}
+
+@api.app_errorhandler(WriteQueueFull)
+def write_queue_full(_error):
+    return jsonify({'error': 'Server busy, try again'}), 503, {'Retry-After': '1'}
+
+@api.app_errorhandler(StreamLimit)
+def stream_limit(_error):
+    return jsonify({'error': 'Too many event streams, try again'}), 503, {'Retry-After': '5'}
+
+@api.route('/api/questionnaire', methods=['POST'])
+@require_token()
 def questionnaire():
-    print("\n=== QUESTIONNAIRE ENDPOINT ===")
-    print(f"Request method: {request.method}")
-    print(f"Request headers: {dict(request.headers)}")
     # Get and validate request data
-    data = request.get_json()
-    print(f"Request data: {data}")
+    data = _json_object()
     if not data:
-        print("ERROR: No JSON data received")
+        logger.info("Questionnaire request without JSON data")
         return jsonify({'error': 'No data provided'}), 400
     if 'username' not in data:
-        print("ERROR: Missing username in request data")
+        logger.info("Questionnaire request missing username")
         return jsonify({'error': 'Username is required'}), 400
+    # users answer for themselves, admins on anyone's behalf
+    if g.token['role'] != 'admin' and data['username'] != g.token['sub']:
+        return jsonify({'error': 'Forbidden'}), 403
     if 'answers' not in data:
-        print("ERROR: Missing answers in request data")
-        return jsonify({'error': 'Questionnaire answers are required'}), 40
+        logger.info("Questionnaire request missing answers")
+        return jsonify({'error': 'Questionnaire answers are required'}), 400
     # Process the questionnaire
-    print(f"Processing questionnaire for user: {data['username']}")
+    logger.debug("Processing questionnaire for user %s", data['username'])
     return get_pet_recommendations(data['username'], data['answers'])
 
-@app.route('/api/questionnaire/<username>', methods=['GET'])
+@api.route('/api/questionnaire/<username>', methods=['GET'])
+@require_token(owner_arg='username')
 def get_user_questionnaire(username):
     return get_user_recommendations(username)
 
-@app.route('/api/test', methods=['GET'])
+@api.route('/api/users/<username>/dashboard', methods=['GET'])
+@require_token(owner_arg='username')
+async def user_dashboard(username):
+    return await get_user_dashboard(username)
+
+@api.route('/api/test', methods=['GET'])
 def test_endpoint():
     """Test endpoint to check if the API is running.
     ---
@@ -203,68 +530,72 @@ def test_endpoint():
         'status': 'OK'
     })
 
-@app.route('/api/admin/adoptions', methods=['POST'])
+@api.route('/api/admin/adoptions', methods=['POST'])
+@require_token()
 def create_adoption_request():
-    data = request.get_json()
-    print("DEBUG: Received adoption request data:", data)
-    if not data:
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data, dict):
         return jsonify({'error': 'No data provided'}), 400
-    new_request, error_message = create_adoption_request_in_db(data)
-    if new_request is None:
-        return jsonify({'error': error_message or 'Failed to create adoption request'}), 500
-    print("DEBUG: Created adoption request:", new_request)
-    return jsonify(new_request), 201
+    # users ask for themselves, admins on anyone's behalf
+    if g.token['role'] != 'admin' and data.get('username') != g.token['sub']:
+        return jsonify({'error': 'Forbidden'}), 403
+    body, status = create_adoption_request_in_db(data, request.headers.get('Idempotency-Key'))
+    if status == 201:
+        logger.info("Created adoption request %s", body['request_id'])
+    elif status == 200:
+        # a repeat submission: the request it duplicates, as created
+        return jsonify(body), 200, {'Idempotent-Replayed': 'true'}
+    return jsonify(body), status
 
-@app.route('/api/adoptions/<username>', methods=['GET'])
+@api.route('/api/adoptions/<username>', methods=['GET'])
+@require_token(owner_arg='username')
 def get_adoptions_for_user(username):
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM adoptions WHERE username = ?", (username,))
-        rows = cursor.fetchall()
-        adoption_requests = [dict(row) for row in rows]
-        print("DEBUG: Returning adoption requests for user", username, adoption_requests)
-        return jsonify(adoption_requests), 200
+        return json_rows("SELECT * FROM adoptions WHERE request_id > ? AND username = ?"
+                         " ORDER BY request_id", (0, username), 'request_id')
     except sqlite3.Error as e:
-        print("DEBUG: SQLite error in get_adoptions_for_user:", e)
+        logger.exception("get_adoptions_for_user failed: %s", e)
         return jsonify({'error': str(e)}), 500
-    finally:
-        conn.close()
 
-@app.route('/api/admin/adoptions', methods=['GET'])
+@api.route('/api/admin/adoptions', methods=['GET'])
+@require_token(role='admin')
 def get_all_adoption_requests():
-    print("DEBUG: Received GET request for /api/admin/adoptions")
-    adoption_requests = get_all_adoption_requests_from_db()
-    if adoption_requests is None:
-        print("DEBUG: get_all_adoption_requests_from_db returned None")
+    response = get_all_adoption_requests_from_db()
+    if response is None:
         return jsonify({'error': 'Internal Server Error'}), 500
-    print("DEBUG: Returning adoption requests to client:", adoption_requests)
-    return jsonify(adoption_requests), 200
+    return response
 
 
-@app.route('/api/admin/adoptions/<int:request_id>/<action>', methods=['OPTIONS', 'POST'])
+@api.route('/api/admin/adoptions/<int:request_id>/<action>', methods=['POST'])
+@require_token(role='admin')
 def update_adoption_request(request_id, action):
-    print("DEBUG: update_adoption_request called with request_id:", request_id, "action:", action)
+    logger.debug("update_adoption_request %s action %s", request_id, action)
     action = action.upper()
     if action not in ['APPROVE', 'REJECT']:
-        print("DEBUG: Invalid action provided:", action)
+        logger.info("Invalid adoption action %s", action)
         return jsonify({'error': 'Invalid action'}), 400
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("UPDATE adoptions SET status = ? WHERE request_id = ?", (action, request_id))
-        conn.commit()
-        print("DEBUG: Adoption request", request_id, "updated to", action)
-        # Optionally, retrieve updated row:
-        cursor.execute("SELECT * FROM adoptions WHERE request_id = ?", (request_id,))
+        cursor.execute("UPDATE adoptions SET status = ? WHERE request_id = ? RETURNING *",
+                       (action, request_id))
         updated = cursor.fetchone()
+        if updated is None:
+            return jsonify({'error': 'Adoption request not found'}), 404
+        record_events(conn, [('adoption', updated['username'], {
+            'request_id': request_id, 'pet_id': updated['pet_id'],
+            'pet_name': updated['pet_name'], 'status': action})])
+        conn.commit()
+        event_broadcaster.notify()
+        logger.info("Adoption request %s updated to %s", request_id, action)
         return jsonify(dict(updated)), 200
     except sqlite3.Error as e:
-        print("DEBUG: SQLite error in update_adoption_request:", e)
+        logger.exception("update_adoption_request failed: %s", e)
         return jsonify({'error': str(e)}), 500
-    finally:
-        conn.close()
+
+app = create_app()
 
 if __name__ == '__main__':
-    print("DEBUG: Starting Flask server ...")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Development server; use serve.py for multi-worker production serving.
+    logger.info("Starting Flask server ...")
+    app.run(host=app.config['HOST'], port=app.config['PORT'], debug=app.config['DEBUG'])
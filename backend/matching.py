@@ -0,0 +1,192 @@
+import threading
+import numpy as np
+from pet_cache import catalog_cache
+
+# Encoded pet attributes, in matrix column order, and the questionnaire
+# answer each one is scored against.
+LEVELS = ('low', 'medium', 'high')
+ATTRIBUTES = (
+    # (pet column, answer key, vocabulary, weight)
+    ('type', 'pet_type', ('dog', 'cat'), 4.0),
+    ('size', 'living_space', ('small', 'medium', 'large'), 1.0),
+    ('activity_level', 'activity_level', LEVELS, 2.0),
+    ('maintenance_level', 'maintenance_level', LEVELS, 1.5),
+    ('budget', 'budget', LEVELS, 1.5),
+)
+PET_COLUMNS = tuple(a[0] for a in ATTRIBUTES)
+MAX_SCORE = sum(a[3] for a in ATTRIBUTES)
+DEFAULT_TOP_K = 3
+CHUNK_CELLS = 1 << 24   # bound one scoring chunk to ~16M cells (64 MB of float32)
+
+def _encode(value, vocabulary):
+    """Index of value in vocabulary; len(vocabulary) for unknown/'any'."""
+    try:
+        return vocabulary.index(str(value).lower())
+    except ValueError:
+        return len(vocabulary)
+
+def _weight_table(column, vocabulary, weight):
+    """Score contribution table indexed [answer code, pet code].
+
+    The last row/column is the 'unknown' code: an unknown pet value scores
+    half, an unknown answer (including 'any') accepts every pet.
+    """
+    n = len(vocabulary)
+    table = np.full((n + 1, n + 1), 0.5, dtype=np.float32)
+    table[n, :] = 1.0
+    for q in range(n):
+        for p in range(n):
+            if column == 'type':
+                table[q, p] = 1.0 if p == q else 0.0
+            elif column == 'budget':
+                # within budget is a full match; every step over costs half
+                table[q, p] = 1.0 if p <= q else max(0.0, 1.0 - 0.5 * (p - q))
+            else:
+                table[q, p] = 1.0 - abs(p - q) / max(n - 1, 1)
+    return table * weight
+
+TABLES = tuple(_weight_table(col, vocab, w) for col, _, vocab, w in ATTRIBUTES)
+
+def encode_answers(answers):
+    """Questionnaire answers (dict or Row) -> int8 code vector."""
+    return np.array(
+        [_encode(answers[key], vocab) for _, key, vocab, _ in ATTRIBUTES],
+        dtype=np.int8,
+    )
+
+def encode_pet(row):
+    return np.array(
+        [_encode(row[col], vocab) for col, _, vocab, _ in ATTRIBUTES],
+        dtype=np.int8,
+    )
+
+class MatchingEngine:
+    """Pets encoded as an (n_pets, n_attributes) int8 matrix for batch scoring.
+
+    Scores are sums of per-attribute lookup tables, so a batch of
+    questionnaires is scored against every pet with one gather per
+    attribute. Identical answer sets are scored once. The matrix is
+    refreshed lazily: new pets are appended by id, rows named in a
+    catalog_cache invalidation are re-read, and an invalidation without a
+    pet id (e.g. the database was rebuilt) triggers a full reload.
+    """
+
+    def __init__(self):
+        # (ids, features) swapped as one tuple so readers never see a torn pair
+        self.matrix = (
+            np.empty(0, dtype=np.int64),
+            np.empty((0, len(ATTRIBUTES)), dtype=np.int8),
+        )
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._dirty = set()
+        self._reload = True
+        catalog_cache.on_invalidate(self._on_invalidate)
+
+    def _on_invalidate(self, pet_id):
+        with self._lock:
+            if pet_id is None:
+                self._reload = True
+            else:
+                self._dirty.add(int(pet_id))
+
+    def load_rows(self, rows):
+        """Replace the matrix from (id, type, size, activity, maintenance, budget) rows."""
+        rows = list(rows)
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        features = np.array(
+            [[_encode(v, a[2]) for v, a in zip(r[1:], ATTRIBUTES)] for r in rows],
+            dtype=np.int8,
+        ).reshape(len(rows), len(ATTRIBUTES))
+        order = np.argsort(ids, kind='stable')
+        self.matrix = (ids[order], features[order])
+
+    def refresh(self, conn):
+        """Bring the matrix up to date with the pets table."""
+        with self._refresh_lock:
+            with self._lock:
+                reload_all, dirty = self._reload, self._dirty
+                self._reload, self._dirty = False, set()
+            self._refresh(conn, reload_all, dirty)
+
+    def _refresh(self, conn, reload_all, dirty):
+        select = f"SELECT id, {', '.join(PET_COLUMNS)} FROM pets"
+        if reload_all:
+            self.load_rows(conn.execute(select + " ORDER BY id"))
+            return
+        ids, features = self.matrix
+        last_id = int(ids[-1]) if len(ids) else 0
+        if dirty:
+            wanted = sorted(dirty)
+            placeholders = ', '.join('?' * len(wanted))
+            rows = conn.execute(f"{select} WHERE id IN ({placeholders})", wanted)
+            found = {r[0]: r for r in rows}
+            keep = ~np.isin(ids, wanted)
+            ids, features = ids[keep], features[keep]
+            changed = [found[i] for i in wanted if i in found]
+            ids, features = self._merge(ids, features, changed)
+        new_rows = [
+            r for r in conn.execute(f"{select} WHERE id > ? ORDER BY id", (last_id,))
+            if r[0] not in dirty
+        ]
+        self.matrix = self._merge(ids, features, new_rows)
+
+    @staticmethod
+    def _merge(ids, features, rows):
+        if not rows:
+            return ids, features
+        new_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        new_features = np.array([encode_pet(r) for r in rows], dtype=np.int8)
+        ids = np.concatenate([ids, new_ids])
+        features = np.concatenate([features, new_features])
+        order = np.argsort(ids, kind='stable')
+        return ids[order], features[order]
+
+    def score_matrix(self, codes, features=None):
+        """Scores of shape (len(codes), n_pets) for int8 answer codes."""
+        features = self.matrix[1] if features is None else features
+        codes = np.atleast_2d(codes)
+        scores = np.zeros((len(codes), len(features)), dtype=np.float32)
+        for k, table in enumerate(TABLES):
+            scores += table[codes[:, k][:, None], features[:, k][None, :]]
+        return scores
+
+    def score(self, answers):
+        """Score one questionnaire against every pet (aligned with matrix ids)."""
+        return self.score_matrix(encode_answers(answers))[0]
+
+    def top_k(self, answers_list, k=DEFAULT_TOP_K):
+        """Best k (pet_id, score) pairs for each questionnaire in the batch.
+
+        Ties are broken by lower pet id so results are stable.
+        """
+        ids, features = self.matrix
+        if not answers_list:
+            return []
+        if k <= 0 or ids.size == 0:
+            return [[] for _ in answers_list]
+        k = min(k, ids.size)
+        codes = np.array([encode_answers(a) for a in answers_list], dtype=np.int8)
+        unique, inverse = np.unique(codes, axis=0, return_inverse=True)
+        best = []
+        chunk = max(1, CHUNK_CELLS // ids.size)
+        for start in range(0, len(unique), chunk):
+            scores = self.score_matrix(unique[start:start + chunk], features)
+            best.extend(_best_rows(scores, ids, k))
+        return [best[i] for i in np.ravel(inverse)]
+
+def _best_rows(scores, ids, k):
+    """Top-k (pet_id, normalised score) per row of a score matrix."""
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    cutoffs = np.take_along_axis(scores, part, axis=1).min(axis=1)
+    for row, cutoff in zip(scores, cutoffs):
+        # fewer than k pets beat the cutoff; fill up with the lowest-id
+        # pets that tie it (ids are sorted ascending)
+        above = np.flatnonzero(row > cutoff)
+        tied = np.flatnonzero(row == cutoff)[:k - len(above)]
+        candidates = np.concatenate([above, tied])
+        picked = candidates[np.argsort(-row[candidates], kind='stable')]
+        yield [(int(ids[i]), round(float(row[i]) / MAX_SCORE, 3)) for i in picked]
+
+# Shared engine; refreshed from the request's connection before scoring
+matching_engine = MatchingEngine()
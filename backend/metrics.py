@@ -0,0 +1,249 @@
+# pylint: disable=R0902
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+CPU_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+FLUSH_INTERVAL = 1.0   # seconds between writes of a process's totals to the shared directory
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'http_request_duration_seconds': (
+        'histogram', 'Time to build the response, by route and status.', LATENCY_BUCKETS),
+    'http_request_db_seconds': (
+        'histogram', 'Time spent inside SQLite per request, by route.', LATENCY_BUCKETS),
+    'http_response_size_bytes': (
+        'histogram', 'Response body size, by route.', SIZE_BUCKETS),
+    'http_requests_in_flight': (
+        'gauge', 'Requests currently being handled, by route.', None),
+    'http_compression_cpu_seconds': (
+        'histogram', 'CPU time spent compressing a response body, by encoding and route.',
+        CPU_BUCKETS),
+    'http_compression_input_bytes_total': (
+        'counter', 'Response bytes before compression, by encoding and route.', None),
+    'http_compression_output_bytes_total': (
+        'counter', 'Response bytes after compression, by encoding and route.', None),
+    'db_write_batch_size': (
+        'histogram', 'Submissions committed per group-commit transaction, by writer.',
+        BATCH_BUCKETS),
+    'db_write_batch_seconds': (
+        'histogram', 'Time to write and commit one group-commit batch, by writer.',
+        LATENCY_BUCKETS),
+}
+
+def _merge(into, series):
+    """Add a {(name, labels): value} mapping into another."""
+    for key, value in series.items():
+        current = into.get(key)
+        if current is None:
+            into[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            into[key] = [a + b for a, b in zip(current, value)]
+        else:
+            into[key] = current + value
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+class RequestMetrics:
+    """Per-route request histograms, counters and gauges in the Prometheus text format.
+
+    Each thread records into its own shard, a dict no other thread writes,
+    so recording takes no lock; render() sums the shards. Shards of exited
+    threads are folded into one retired shard when they are noticed.
+
+    With a directory configured, each process also writes its totals to
+    <directory>/<pid>.json every FLUSH_INTERVAL seconds and on every
+    scrape, and render() merges the files of all processes: a scrape that
+    lands on any serve.py worker reports the whole deployment. Counts of
+    exited workers are kept; their in-flight gauges are dropped.
+    """
+
+    def __init__(self, directory=''):
+        self.directory = directory
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # A forked child starts from zero; the parent's numbers are not its own.
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []     # (thread, series) per recording thread
+        self._retired = {}
+        self._flusher = None
+
+    def configure(self, directory):
+        self.directory = directory or ''
+
+    def _series(self):
+        try:
+            return self._local.series
+        except AttributeError:
+            pass
+        series = self._local.series = {}
+        with self._lock:
+            self._shards.append((threading.current_thread(), series))
+            if self.directory and self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop,
+                                                 name='metrics-flush', daemon=True)
+                self._flusher.start()
+        return series
+
+    def observe(self, name, labels, value):
+        """Add one observation to a histogram; labels is a tuple of (key, value) pairs."""
+        series = self._series()
+        key = (name, labels)
+        buckets = METRICS[name][2]
+        values = series.get(key)
+        if values is None:
+            values = series[key] = [0] * (len(buckets) + 1) + [0.0]
+        values[bisect.bisect_left(buckets, value)] += 1
+        values[-1] += value
+
+    def add(self, name, labels, amount):
+        """Move a gauge up or down, or add to a counter."""
+        series = self._series()
+        key = (name, labels)
+        series[key] = series.get(key, 0) + amount
+
+    def snapshot(self):
+        """{(name, labels): value} summed over this process's threads."""
+        total = {}
+        with self._lock:
+            alive = []
+            for thread, series in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, series))
+                else:
+                    _merge(self._retired, series)
+            self._shards = alive
+            _merge(total, self._retired)
+            for _, series in alive:
+                # copied first: the owning thread may be adding keys right now
+                _merge(total, dict(series))
+        return total
+
+    def flush(self):
+        """Write this process's totals to the shared directory, atomically."""
+        if not self.directory:
+            return
+        payload = {
+            'pid': os.getpid(),
+            'series': [[name, labels, value] for (name, labels), value in self.snapshot().items()],
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+                json.dump(payload, tmp)
+            os.replace(tmp_path, os.path.join(self.directory, f'{os.getpid()}.json'))
+        except OSError as e:
+            logger.warning("could not write metrics to %s: %s", self.directory, e)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def collect(self):
+        """Totals of every process sharing the directory, or of this one."""
+        if not self.directory:
+            return self.snapshot()
+        self.flush()
+        total = {}
+        for entry in os.listdir(self.directory):
+            if not entry.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, entry), encoding='utf-8') as f:
+                    payload = json.load(f)
+            except (OSError, ValueError):
+                continue
+            live = _alive(payload['pid'])
+            _merge(total, {
+                (name, tuple(tuple(pair) for pair in labels)): value
+                for name, labels, value in payload['series']
+                if name in METRICS and (live or METRICS[name][0] != 'gauge')
+            })
+        return total
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        collected = sorted(self.collect().items(), key=lambda item: item[0])
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (metric, labels), value in collected:
+                if metric != name:
+                    continue
+                if kind != 'histogram':
+                    lines.append(f'{name}{_labels(labels)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), value):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", bound),))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {value[-1]}')
+                lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+    def instrument(self, app):
+        """Record every request a Flask app handles."""
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def _before_request(self):
+        # the rule, not the path, so /api/pets/1 and /api/pets/2 share a series
+        g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.metrics_start = time.perf_counter()
+        self.add('http_requests_in_flight', (('route', g.metrics_route),), 1)
+
+    def _after_request(self, response):
+        if 'metrics_start' not in g:
+            return response
+        labels = (('method', request.method), ('route', g.metrics_route))
+        self.observe('http_request_duration_seconds',
+                      labels + (('status', str(response.status_code)),),
+                      time.perf_counter() - g.metrics_start)
+        conn = g.get('db_conn')
+        # plus time async views spent on db_executor connections
+        db_seconds = g.pop('db_seconds', 0.0)
+        self.observe('http_request_db_seconds', labels,
+                     db_seconds + (conn.take_db_time() if conn is not None else 0.0))
+        # werkzeug would buffer a streamed body to measure it
+        size = None if response.is_streamed else response.calculate_content_length()
+        if size is not None:
+            self.observe('http_response_size_bytes', labels, size)
+        return response
+
+    def _teardown_request(self, _exc=None):
+        route = g.pop('metrics_route', None)
+        if route is not None:
+            g.pop('metrics_start', None)
+            self.add('http_requests_in_flight', (('route', route),), -1)
+
+request_metrics = RequestMetrics()
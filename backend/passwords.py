@@ -0,0 +1,142 @@
+# pylint: disable=R0902,R1732
+import hmac
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+MIN_COST = 10
+MAX_COST = 15
+TARGET_MS = float(os.environ.get('BCRYPT_TARGET_MS', 250))
+
+class PasswordQueueFull(RuntimeError):
+    """Raised when too many hash jobs are already waiting for a worker."""
+
+def hash_cost(stored):
+    """Cost factor of a bcrypt hash string, or None for a legacy plaintext value."""
+    if not stored.startswith(('$2a$', '$2b$', '$2y$')):
+        return None
+    return int(stored[4:6])
+
+class PasswordHasher:
+    """bcrypt hashing and verification on a bounded worker pool.
+
+    bcrypt releases the GIL, so a small pool gives real parallelism without
+    tying up request threads in Python. At most max_pending jobs may wait;
+    beyond that callers get PasswordQueueFull (a 503) instead of piling up.
+    The cost factor is calibrated once, on first use, to the largest value
+    whose hash time stays under target_ms, unless BCRYPT_COST pins it.
+    """
+
+    def __init__(self, workers=None, max_pending=None, target_ms=TARGET_MS, cost=None):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending or self.workers * 8
+        self.target_ms = target_ms
+        env_cost = os.environ.get('BCRYPT_COST')
+        self._cost = cost or (int(env_cost) if env_cost else None)
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.jobs = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    @property
+    def cost(self):
+        if self._cost is None:
+            with self._lock:
+                if self._cost is None:
+                    self._cost = self.calibrate()
+        return self._cost
+
+    @cost.setter
+    def cost(self, value):
+        self._cost = value
+
+    def calibrate(self):
+        """Largest cost in [MIN_COST, MAX_COST] that hashes within target_ms.
+
+        Each cost step doubles the work, so one timed hash at a cheap cost
+        is enough to extrapolate.
+        """
+        probe = 8
+        start = time.perf_counter()
+        bcrypt.hashpw(b'calibration', bcrypt.gensalt(probe))
+        probe_ms = (time.perf_counter() - start) * 1000
+        cost = MIN_COST
+        while cost < MAX_COST and probe_ms * 2 ** (cost + 1 - probe) <= self.target_ms:
+            cost += 1
+        logger.info("bcrypt cost calibrated to %d (%.1f ms at cost %d, target %.0f ms)",
+                    cost, probe_ms, probe, self.target_ms)
+        return cost
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordQueueFull('password hashing queue is full')
+        with self._lock:
+            self.pending += 1
+        try:
+            start = time.perf_counter()
+            result = self._executor.submit(func, *args).result()
+            elapsed = (time.perf_counter() - start) * 1000
+        finally:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+        with self._lock:
+            self.jobs += 1
+            self.total_ms += elapsed
+            self.max_ms = max(self.max_ms, elapsed)
+        return result
+
+    def hash(self, password):
+        """bcrypt hash of password at the current cost, as a str."""
+        salt = bcrypt.gensalt(self.cost)
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('ascii')
+
+    def verify(self, password, stored):
+        """Return (matches, needs_rehash) for a password against a stored value.
+
+        Stored values that are not bcrypt hashes are legacy plaintext and
+        always need rehashing, as do hashes below the current cost.
+        """
+        cost = hash_cost(stored)
+        if cost is None:
+            return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8')), True
+        ok = self._run(bcrypt.checkpw, password.encode('utf-8'), stored.encode('ascii'))
+        return ok, ok and cost < self.cost
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cost': self._cost,
+                'workers': self.workers,
+                'queue_depth': self.pending,
+                'max_pending': self.max_pending,
+                'jobs': self.jobs,
+                'mean_ms': round(self.total_ms / self.jobs, 2) if self.jobs else 0.0,
+                'max_ms': round(self.max_ms, 2),
+            }
+
+# Shared by login, register and admin login
+password_hasher = PasswordHasher()
+
+def check_password(conn, table, row, password):
+    """Verify password against a users/admins row, upgrading its hash on success.
+
+    The UPDATE only applies if the stored value is unchanged, so a
+    concurrent password change is never overwritten by a stale rehash.
+    """
+    ok, rehash = password_hasher.verify(password, row['password'])
+    if ok and rehash:
+        conn.execute(
+            f"UPDATE {table} SET password = ? WHERE id = ? AND password = ?",
+            (password_hasher.hash(password), row['id'], row['password'])
+        )
+        conn.commit()
+    return ok
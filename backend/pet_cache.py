@@ -0,0 +1,117 @@
+# pylint: disable=R0902
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+MAX_BODY = 8 * 2**20   # bytes; a streamed list larger than this is not kept
+
+class LRUCache:
+    """Thread-safe bounded mapping that evicts the least recently used key."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class PetCatalogCache:
+    """Serialized /api/pets responses, keyed by request, tagged by catalog version.
+
+    Every write to the pets table must call invalidate(), which bumps the
+    version and drops all entries. ETags are derived from the version (plus
+    a per-process epoch, so two workers never mint the same tag for
+    different data), which lets a handler answer If-None-Match without a
+    cached body or a database round trip.
+    """
+
+    def __init__(self, max_pets=1024, max_lists=64, max_body=MAX_BODY):
+        self.epoch = os.urandom(4).hex()
+        self.max_body = max_body
+        self.version = 0
+        self.pets = LRUCache(max_pets)
+        self.lists = LRUCache(max_lists)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._listeners = []
+
+    def etag(self, kind, key, version=None):
+        """Strong (unquoted) ETag for an entry at the given or current version."""
+        version = self.version if version is None else version
+        # full width: two keys must never share a tag, or one replays the other's 304
+        digest = hashlib.blake2b(repr((kind, key)).encode('utf-8'), digest_size=16)
+        return f'{self.epoch}-{version}-{digest.hexdigest()}'
+
+    def _store(self, kind):
+        return self.pets if kind == 'pet' else self.lists
+
+    def get(self, kind, key):
+        """Return the cached (body, headers) for key, or None."""
+        entry = self._store(kind).get(key)
+        if entry is not None and entry[0] != self.version:
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if entry is None else entry[1:]
+
+    def put(self, kind, key, version, body, headers):
+        """Cache a body read at `version`; dropped if a write happened since."""
+        if version == self.version:
+            self._store(kind).put(key, (version, body, headers))
+
+    def invalidate(self, pet_id=None):
+        """Forget everything; call after any INSERT/UPDATE/DELETE on pets.
+
+        pet_id names the single row that changed, when known, so listeners
+        such as the matching engine can refresh just that row.
+        """
+        with self._lock:
+            self.version += 1
+            self.pets.clear()
+            self.lists.clear()
+        for listener in list(self._listeners):
+            listener(pet_id)
+
+    def on_invalidate(self, listener):
+        """Call listener(pet_id) after every invalidation."""
+        self._listeners.append(listener)
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.pets.evictions + self.lists.evictions,
+            'pet_entries': len(self.pets),
+            'list_entries': len(self.lists),
+        }
+
+# Single instance shared by the pets handlers and every writer of the pets table
+catalog_cache = PetCatalogCache()
@@ -1,28 +1,275 @@
+import re
 import sqlite3
-from flask import jsonify
+from flask import Response, jsonify, make_response, request
 from init_db import get_db_connection
+from pet_cache import catalog_cache
+from serializers import response_format
+from streaming import RowStream, json_rows, rows_response
 
-def get_pets():
-    """Get all pets.
+PET_COLUMNS = ('id', 'name', 'type', 'size', 'activity_level', 'maintenance_level', 'budget')
+PET_FILTERS = ('type', 'size', 'activity_level', 'maintenance_level', 'budget')
+MAX_PAGE_SIZE = 500
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_TERMS = 8
+# Up to this many matches are ordered by bm25. A broader query (a bare
+# "dog" matches half the catalog) comes back in id order, which FTS5 reads
+# straight off its index instead of scoring every match.
+SEARCH_RANK_LIMIT = 1000
+# bm25 weights in pets_fts column order: a hit in the name counts most
+SEARCH_WEIGHTS = (10.0, 4.0, 2.0, 1.0, 1.0, 1.0)
+_SEARCH_TERM = re.compile(r'[^\W_]+')
+
+def parse_pet_query(args):
+    """Validate list query args into (columns, filters, after_id, limit).
+
+    Raises ValueError with a client-facing message on bad input.
+    """
+    columns = PET_COLUMNS
+    if args.get('fields'):
+        requested = [c.strip() for c in args['fields'].split(',') if c.strip()]
+        unknown = [c for c in requested if c not in PET_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        # id is always returned: it is the pagination cursor
+        columns = tuple(c for c in PET_COLUMNS if c == 'id' or c in requested)
+    filters = {f: args[f] for f in PET_FILTERS if args.get(f)}
+    try:
+        after_id = int(args.get('after_id', 0))
+        limit = int(args['limit']) if 'limit' in args else None
+    except ValueError as e:
+        raise ValueError('after_id and limit must be integers') from e
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return columns, filters, after_id, limit
+
+def cached_json(kind, key, build):
+    """Serve a pets response through the catalog cache.
+
+    A matching If-None-Match is answered with 304 before the cache or the
+    database is consulted; otherwise a cached body is replayed, or build()
+    runs and its 200 response is stored under the version it was read at.
+    A streamed body is stored once it has been sent in full, if it fits
+    catalog_cache.max_body.
+    """
+    version = catalog_cache.version
+    etag = catalog_cache.etag(kind, key, version)
+    # weak comparison: compressed responses carry the ETag as W/"..."
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    cached = catalog_cache.get(kind, key)
+    if cached is not None:
+        body, headers = cached
+        response = Response(body, headers=headers)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+        headers = {k: v for k, v in response.headers.items()
+                   if k.startswith('X-') or k == 'Content-Type'}
+        if isinstance(response.response, RowStream):
+            response.response.tee(
+                lambda body: catalog_cache.put(kind, key, version, body, headers),
+                catalog_cache.max_body)
+        elif not response.is_streamed:
+            catalog_cache.put(kind, key, version, response.get_data(), headers)
+    response.set_etag(etag)
+    return response
+
+def get_pets(args=None):
+    """Get pets, optionally filtered, projected and keyset-paginated.
     ---
     tags:
       - pets
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Page size (1-500). Omit to return every matching pet
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+        description: Return pets with id greater than this cursor
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Comma-separated columns to return (id is always included)
+      - name: type
+        in: query
+        type: string
+        required: false
+      - name: size
+        in: query
+        type: string
+        required: false
+      - name: activity_level
+        in: query
+        type: string
+        required: false
+      - name: maintenance_level
+        in: query
+        type: string
+        required: false
+      - name: budget
+        in: query
+        type: string
+        required: false
+      - name: format
+        in: query
+        type: string
+        enum: [objects, columns]
+        required: false
+        description: columns returns {columns, rows} with one array per pet; also chosen by
+                     Accept application/vnd.pets.columns+json
     responses:
         200:
-            description: List of pets
+            description: List of pets. X-Next-After-Id is set when more pages remain
+        400:
+            description: Invalid query parameters
         500:
             description: Internal Server Error
     """
+    try:
+        columns, filters, after_id, limit = parse_pet_query(args or {})
+        fmt = response_format()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    key = (columns, tuple(sorted(filters.items())), after_id, limit, fmt)
+    response = cached_json('list', key,
+                           lambda: query_pets(columns, filters, after_id, limit, fmt))
+    response.vary.add('Accept')
+    return response
+
+def query_pets(columns, filters, after_id, limit, fmt):
+    """Run one keyset page of the pets listing."""
+    # Seek on the primary key (or a filter index, which carries the rowid),
+    # so a deep page costs the same as the first one.
+    where = ['id > ?'] + [f'{f} = ?' for f in filters]
+    params = [after_id] + list(filters.values())
+    query = f"SELECT {', '.join(columns)} FROM pets WHERE {' AND '.join(where)} ORDER BY id"
+    try:
+        if limit is None:
+            return json_rows(query, params, 'id', fmt=fmt)
+        query += ' LIMIT ?'
+        params.append(limit + 1)
+        cursor = get_db_connection().cursor()
+        cursor.execute(query, params)
+        cursor.row_factory = None
+        pets = cursor.fetchall()
+        headers = {}
+        if len(pets) > limit:
+            pets = pets[:limit]
+            headers['X-Next-After-Id'] = str(pets[-1][columns.index('id')])
+        return rows_response(cursor, pets, fmt), 200, headers
+    except sqlite3.Error:
+        return jsonify({'error': 'Internal Server Error'}), 500
+
+def parse_search_query(args):
+    """Validate search query args into (FTS5 match expression, limit, offset).
+
+    Raises ValueError with a client-facing message on bad input.
+    """
+    terms = _SEARCH_TERM.findall(args.get('q', '').lower())
+    if not terms:
+        raise ValueError('q must contain at least one word')
+    if len(terms) > MAX_SEARCH_TERMS:
+        raise ValueError(f'q may contain at most {MAX_SEARCH_TERMS} words')
+    try:
+        limit = int(args.get('limit', SEARCH_PAGE_SIZE))
+        offset = int(args.get('offset', 0))
+    except ValueError as e:
+        raise ValueError('limit and offset must be integers') from e
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    if offset < 0:
+        raise ValueError('offset must not be negative')
+    # Each word becomes a quoted prefix term, ANDed together, so user input
+    # never reaches FTS5 query syntax.
+    return ' '.join(f'"{term}"*' for term in terms), limit, offset
+
+def search_pets(args=None):
+    """Full-text search over pet name, type, size and attributes.
+    ---
+    tags:
+      - pets
+    parameters:
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: Words to look for; every word must match the start of a word of the pet
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Page size (1-500, default 20)
+      - name: offset
+        in: query
+        type: integer
+        required: false
+        description: Number of results to skip
+      - name: format
+        in: query
+        type: string
+        enum: [objects, columns]
+        required: false
+        description: columns returns {columns, rows} with one array per pet; also chosen by
+                     Accept application/vnd.pets.columns+json
+    responses:
+        200:
+            description: Matching pets, best match first (X-Search-Order is rank), or in id order
+                         when the query matches too many pets to rank (X-Search-Order is id).
+                         X-Next-Offset is set when more pages remain
+        400:
+            description: Invalid query parameters
+        500:
+            description: Internal Server Error
+    """
+    try:
+        match, limit, offset = parse_search_query(args or {})
+        fmt = response_format()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    response = cached_json('search', (match, limit, offset, fmt),
+                           lambda: query_search(match, limit, offset, fmt))
+    response.vary.add('Accept')
+    return response
+
+def query_search(match, limit, offset, fmt):
+    """Run one page of a pets_fts match, ranked when the match set is small enough."""
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM pets")
+        # Counting stops at the cap: reading rowids is cheap, scoring them is not.
+        cursor.execute(
+            "SELECT count(*) FROM (SELECT 1 FROM pets_fts WHERE pets_fts MATCH ? LIMIT ?)",
+            (match, SEARCH_RANK_LIMIT + 1),
+        )
+        ranked = cursor.fetchone()[0] <= SEARCH_RANK_LIMIT
+        if ranked:
+            weights = ', '.join(map(str, SEARCH_WEIGHTS))
+            order = f'bm25(pets_fts, {weights}), pets.id'
+        else:
+            order = 'pets_fts.rowid'
+        cursor.execute(
+            f"SELECT {', '.join('pets.' + c for c in PET_COLUMNS)}"
+            " FROM pets_fts JOIN pets ON pets.id = pets_fts.rowid"
+            f" WHERE pets_fts MATCH ? ORDER BY {order} LIMIT ? OFFSET ?",
+            (match, limit + 1, offset),
+        )
+        cursor.row_factory = None
         pets = cursor.fetchall()
-        return jsonify([dict(pet) for pet in pets]), 200
+        headers = {'X-Search-Order': 'rank' if ranked else 'id'}
+        if len(pets) > limit:
+            pets = pets[:limit]
+            headers['X-Next-Offset'] = str(offset + limit)
+        return rows_response(cursor, pets, fmt), 200, headers
     except sqlite3.Error:
         return jsonify({'error': 'Internal Server Error'}), 500
-    finally:
-        conn.close()
 
 def get_pet(pet_id):
     """Get a specific pet by ID.
@@ -43,6 +290,10 @@ def get_pet(pet_id):
         500:
             description: Internal Server Error
     """
+    return cached_json('pet', pet_id, lambda: query_pet(pet_id))
+
+def query_pet(pet_id):
+    """Load a single pet row."""
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -53,5 +304,3 @@ def get_pet(pet_id):
         return jsonify(dict(pet)), 200
     except sqlite3.Error:
         return jsonify({'error': 'Internal Server Error'}), 500
-    finally:
-        conn.close()
@@ -0,0 +1,147 @@
+# pylint: disable=R0902
+import logging
+import re
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+# Its own logger so slow statements can be routed or silenced on their own.
+slow_logger = logging.getLogger('slow_query')
+
+_COMMENT = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_REPEATED_GROUP = re.compile(r'(\([^()]*\))(?:\s*,\s*\1)+')
+FINGERPRINT_CACHE_SIZE = 4096
+
+def fingerprint(sql):
+    """Normalize a statement so calls differing only in literals group together.
+
+    Comments go, literals become ?, whitespace collapses, placeholder
+    lists of any length become (?, ...) and repeated VALUES groups fold
+    into one.
+    """
+    sql = _COMMENT.sub(' ', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _SPACE.sub(' ', sql).strip()
+    sql = _PLACEHOLDER_LIST.sub('(?, ...)', sql)
+    return _REPEATED_GROUP.sub(r'\1, ...', sql)
+
+class QueryStats:
+    """Per-process statement statistics fed by pooled connections.
+
+    Every statement is counted under its fingerprint and the route that
+    ran it (the connection's tag), with total and max time; time spent
+    fetching rows counts towards the statement that produced them.
+    Statements slower than slow_ms are logged to the 'slow_query' logger
+    and kept in a short ring for the admin endpoint, and a warning fires
+    when one request runs the same fingerprint repeat_threshold times,
+    the usual sign of a query issued in a loop.
+    """
+
+    def __init__(self, slow_ms=100.0, repeat_threshold=10, max_entries=2000, slow_history=100):
+        self.slow_seconds = slow_ms / 1000
+        self.repeat_threshold = repeat_threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._fingerprints = {}   # raw sql -> fingerprint
+        self._stats = {}          # (fingerprint, route) -> [count, total_s, max_s]
+        self._slow = deque(maxlen=slow_history)
+        self.dropped = 0
+        self.repeat_warnings = 0
+
+    def configure(self, slow_ms, repeat_threshold):
+        self.slow_seconds = slow_ms / 1000
+        self.repeat_threshold = repeat_threshold
+
+    def fingerprint(self, sql):
+        try:
+            return self._fingerprints[sql]
+        except KeyError:
+            pass
+        if len(self._fingerprints) >= FINGERPRINT_CACHE_SIZE:
+            self._fingerprints.clear()   # statements with inlined literals; start over
+        result = self._fingerprints[sql] = fingerprint(sql)
+        return result
+
+    def record(self, conn, sql, seconds, statement_seconds, executed):
+        """Observer for TimedConnection: one execute or fetch call just finished.
+
+        statement_seconds is the statement's time so far, including this call.
+        """
+        key = (self.fingerprint(sql), conn.tag)
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= self.max_entries:
+                    self.dropped += 1
+                    return
+                entry = self._stats[key] = [0, 0.0, 0.0]
+            if executed:
+                entry[0] += 1
+            entry[1] += seconds
+            if statement_seconds > entry[2]:
+                entry[2] = statement_seconds
+        # logged once, by the call that takes the statement past the threshold
+        if statement_seconds >= self.slow_seconds and (
+                executed or statement_seconds - seconds < self.slow_seconds):
+            self._log_slow(key, sql, statement_seconds)
+        if executed and conn.tag is not None:
+            counts = conn.request_counts
+            count = counts[key[0]] = counts.get(key[0], 0) + 1
+            if count == self.repeat_threshold:
+                self.repeat_warnings += 1
+                logger.warning("N+1 query: %s ran %d times in one %s request; "
+                               "batch it or use a join", key[0], count, conn.tag)
+
+    def _log_slow(self, key, sql, seconds):
+        fingerprint_, route = key
+        self._slow.append({
+            'fingerprint': fingerprint_,
+            'route': route,
+            'ms': round(seconds * 1000, 3),
+            'sql': sql[:1000],
+        })
+        slow_logger.warning("slow query (%.1f ms) in %s: %s", seconds * 1000, route, sql[:1000])
+
+    def top(self, limit=20, order_by='total'):
+        """Fingerprints with the largest total time (or count, or max time)."""
+        index = {'count': 0, 'total': 1, 'max': 2}[order_by]
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._stats.items()]
+        items.sort(key=lambda item: item[1][index], reverse=True)
+        return [
+            {
+                'fingerprint': fingerprint_,
+                'route': route,
+                'count': count,
+                'total_ms': round(total * 1000, 3),
+                'mean_ms': round(total * 1000 / count, 3) if count else None,
+                'max_ms': round(longest * 1000, 3),
+            }
+            for (fingerprint_, route), (count, total, longest) in items[:limit]
+        ]
+
+    def slow_queries(self):
+        return list(self._slow)
+
+    def stats(self):
+        return {
+            'slow_ms': self.slow_seconds * 1000,
+            'repeat_threshold': self.repeat_threshold,
+            'fingerprints': len(self._stats),
+            'dropped': self.dropped,
+            'repeat_warnings': self.repeat_warnings,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self.dropped = 0
+            self.repeat_warnings = 0
+
+query_stats = QueryStats()
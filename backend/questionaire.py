@@ -1,8 +1,45 @@
 import sqlite3
 import json
 from flask import jsonify
+from group_commit import GroupCommitWriter
 from init_db import get_db_connection
 
+ANSWER_FIELDS = ('living_space', 'activity_level', 'maintenance_level', 'budget', 'pet_type')
+
+def _write_answers(conn, submissions):
+    """Insert a batch of (username, answers) submissions; the writer commits.
+
+    The users must exist: get_pet_recommendations() checks before submitting.
+    """
+    conn.executemany(
+        """
+        INSERT INTO questionnaire_answers
+        (username, living_space, activity_level, maintenance_level, budget, pet_type, status)
+        VALUES (?, ?, ?, ?, ?, ?, 'PENDING')
+        """,
+        [(username, *(answers[field] for field in ANSWER_FIELDS))
+         for username, answers in submissions]
+    )
+
+# Submissions from every request thread are committed together in batches.
+questionnaire_writer = GroupCommitWriter('questionnaire', _write_answers)
+
+def _submission_error(username, answers):
+    if not username:
+        return 'Username is required'
+    if not isinstance(username, str):
+        return 'Username must be a string'
+    if not answers:
+        return 'Questionnaire answers are required'
+    if not isinstance(answers, dict):
+        return 'Questionnaire answers must be an object'
+    missing_fields = [field for field in ANSWER_FIELDS if field not in answers]
+    if missing_fields:
+        return f"Missing questionnaire answers: {', '.join(missing_fields)}"
+    if not all(isinstance(answers[field], str) for field in ANSWER_FIELDS):
+        return 'Questionnaire answers must be strings'
+    return None
+
 def save_qanswers(username, answers):
     """Save questionnaire answers for a user.
     ---
@@ -41,46 +78,15 @@ def save_qanswers(username, answers):
         500:
             description: Internal Server Error
     """
-    # Check if all required fields are present
-    required_fields = ['living_space', 'activity_level', 'maintenance_level', 'budget', 'pet_type']
-    missing_fields = [field for field in required_fields if field not in answers]
-    if missing_fields:
+    # Check the username, and that every field is present and a string
+    if _submission_error(username, answers):
         return False
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        # Check if user exists
-        cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-        user = cursor.fetchone()
-        if not user:
-            cursor.execute(
-                "INSERT INTO users (username, password) VALUES (?, ?)",
-                (username, 'temp_password')
-            )
-            conn.commit()
-            cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-            user = cursor.fetchone()
-            if not user:
-                return False
-        cursor.execute("""
-            INSERT INTO questionnaire_answers 
-            (username, living_space, activity_level, maintenance_level, budget, pet_type, status)
-            VALUES (?, ?, ?, ?, ?, ?, 'PENDING')
-        """, (
-            username,
-            answers['living_space'],
-            answers['activity_level'],
-            answers['maintenance_level'],
-            answers['budget'],
-            answers['pet_type']
-        ))
-        conn.commit()
-        return True
+        # returns once the batch carrying this submission has committed
+        return questionnaire_writer.submit((username, answers))
     except sqlite3.Error:
         return False
-    finally:
-        conn.close()
 
 def get_pet_recommendations(username, answers):
     """Get pet recommendations based on questionnaire answers.
@@ -125,13 +131,24 @@ def get_pet_recommendations(username, answers):
                     status:
                         type: string
                         enum: [PENDING]
+        400:
+            description: Missing username, or answers that are not a string per field
+        404:
+            description: User not found
         500:
             description: Internal Server Error
     """
-    if not username:
-        return jsonify({'error': 'Username is required'}), 400
-    if not answers:
-        return jsonify({'error': 'Questionnaire answers are required'}), 400
+    error = _submission_error(username, answers)
+    if error:
+        return jsonify({'error': error}), 400
+    try:
+        user = get_db_connection().execute(
+            "SELECT 1 FROM users WHERE username = ?", (username,)).fetchone()
+    except sqlite3.Error:
+        return jsonify({'error': 'Internal Server Error'}), 500
+    if user is None:
+        # register first: answers are never filed under an account nobody can log in to
+        return jsonify({'error': 'User not found'}), 404
     if not save_qanswers(username, answers):
         return jsonify({'error': 'Failed to save questionnaire answers'}), 500
 
@@ -190,48 +207,57 @@ def get_user_recommendations(username):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("""
-            SELECT q.*, u.id as user_id
-            FROM questionnaire_answers q
-            JOIN users u ON q.username = u.username
-            WHERE q.username = ? 
-            ORDER BY q.id DESC 
-            LIMIT 1
-        """, (username,))
-        questionnaire = cursor.fetchone()
-        if not questionnaire:
+        result = load_user_recommendations(cursor, username)
+        if result is None:
             return jsonify({'error': 'No questionnaire answers found for user'}), 404
-        answers = {
-            'living_space': questionnaire['living_space'],
-            'activity_level': questionnaire['activity_level'],
-            'maintenance_level': questionnaire['maintenance_level'],
-            'budget': questionnaire['budget'],
-            'pet_type': questionnaire['pet_type']
-        }
-        if questionnaire['status'] == 'PENDING':
-            return jsonify({
-                'message': 'Questionnaire is pending admin approval',
-                'status': 'PENDING',
-                'answers': answers
-            }), 200
-        if questionnaire['status'] == 'REJECTED':
-            return jsonify({
-                'message': 'Questionnaire was rejected by admin',
-                'status': 'REJECTED'
-            }), 200
-        cursor.execute("""
-            SELECT p.* 
-            FROM pets p
-            JOIN approved_pets ap ON p.id = ap.pet_id
-            WHERE ap.user_id = ?
-        """, (questionnaire['user_id'],))
-        approved_pets = [dict(row) for row in cursor.fetchall()]
-        return jsonify({
-            'recommendations': approved_pets,
-            'count': len(approved_pets),
-            'status': 'APPROVED'
-        }), 200
+        return jsonify(result), 200
     except sqlite3.Error as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        conn.close()
+
+def load_user_recommendations(cursor, username):
+    """Latest questionnaire state for a user, or None if they have none.
+
+    Shared by get_user_recommendations and the dashboard aggregate so both
+    return the same shape from the caller's connection.
+    """
+    cursor.execute("""
+        SELECT q.*, u.id as user_id
+        FROM questionnaire_answers q
+        JOIN users u ON q.username = u.username
+        WHERE q.username = ? 
+        ORDER BY q.id DESC 
+        LIMIT 1
+    """, (username,))
+    questionnaire = cursor.fetchone()
+    if not questionnaire:
+        return None
+    answers = {
+        'living_space': questionnaire['living_space'],
+        'activity_level': questionnaire['activity_level'],
+        'maintenance_level': questionnaire['maintenance_level'],
+        'budget': questionnaire['budget'],
+        'pet_type': questionnaire['pet_type']
+    }
+    if questionnaire['status'] == 'PENDING':
+        return {
+            'message': 'Questionnaire is pending admin approval',
+            'status': 'PENDING',
+            'answers': answers
+        }
+    if questionnaire['status'] == 'REJECTED':
+        return {
+            'message': 'Questionnaire was rejected by admin',
+            'status': 'REJECTED'
+        }
+    cursor.execute("""
+        SELECT p.* 
+        FROM pets p
+        JOIN approved_pets ap ON p.id = ap.pet_id
+        WHERE ap.user_id = ?
+    """, (questionnaire['user_id'],))
+    approved_pets = [dict(row) for row in cursor.fetchall()]
+    return {
+        'recommendations': approved_pets,
+        'count': len(approved_pets),
+        'status': 'APPROVED'
+    }
@@ -2,6 +2,7 @@
 import sqlite3
 from flask import jsonify
 from init_db import get_db_connection
+from passwords import password_hasher
 
 def register_user(username, password):
     """Register a new user.
@@ -37,11 +38,17 @@ def register_user(username, password):
                         properties:
                             username:
                                 type: string
+        400:
+            description: Missing username or password, or not strings
         409:
             description: Username already exists
         500:
             description: Internal Server Error
     """
+    if not username or not password:
+        return jsonify({'error': 'Username and password are required'}), 400
+    if not isinstance(username, str) or not isinstance(password, str):
+        return jsonify({'error': 'Username and password must be strings'}), 400
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -50,14 +57,15 @@ def register_user(username, password):
             return jsonify({'error': 'Username already exists'}), 409
         cursor.execute(
             "INSERT INTO users (username, password) VALUES (?, ?)",
-            (username, password)
+            (username, password_hasher.hash(password))
         )
         conn.commit()
         return jsonify({
             'message': 'User registered successfully',
             'user': {'username': username}
         }), 201
+    except sqlite3.IntegrityError:
+        # lost a race with a concurrent registration (unique username index)
+        return jsonify({'error': 'Username already exists'}), 409
     except sqlite3.Error:
         return jsonify({'error': 'Internal Server Error'}), 500
-    finally:
-        conn.close()
@@ -0,0 +1,235 @@
+# pylint: disable=R0902
+import threading
+import time
+import zlib
+from flask import request
+from metrics import request_metrics
+from pet_cache import LRUCache
+
+try:
+    import brotli
+except ImportError:   # optional: br is offered only when it is installed
+    brotli = None
+try:
+    import zstandard
+except ImportError:   # optional: likewise zstd
+    zstandard = None
+
+MIN_SIZE = 1024   # smaller bodies gain too little to pay for compressing them
+DEFAULT_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6, 'deflate': 6}
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'application/xml')
+
+class _ZlibStream:
+    """zlib.compressobj; sync() ends the output on a byte boundary the client can decode."""
+
+    def __init__(self, level, wbits):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def sync(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def flush(self):
+        return self._compressor.flush()
+
+class _ZstdStream:
+    """zstandard compressobj; sync() closes the current block."""
+
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def sync(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def flush(self):
+        return self._compressor.flush()
+
+class _BrotliStream:
+    """brotli.Compressor behind the same interface."""
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def sync(self):
+        return self._compressor.flush()
+
+    def flush(self):
+        return self._compressor.finish()
+
+# encoding -> factory(level) of an object with compress(bytes), sync() and
+# flush(), in server preference order
+CODECS = {}
+if zstandard is not None:
+    CODECS['zstd'] = _ZstdStream
+if brotli is not None:
+    CODECS['br'] = _BrotliStream
+CODECS['gzip'] = lambda level: _ZlibStream(level, 31)
+CODECS['deflate'] = lambda level: _ZlibStream(level, 15)   # zlib format
+
+def compressible(mimetype):
+    if mimetype == 'text/event-stream':
+        return False   # events are small and sent one at a time: syncing each would undo the gain
+    return (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+            or mimetype.endswith('+json'))
+
+class _CompressedStream:
+    """Compresses a streamed body chunk by chunk as the server sends it.
+
+    The codec is synced after every upstream chunk, so each one reaches
+    the client as soon as it is produced instead of waiting in the
+    compressor's window; that costs a few bytes per chunk.
+    """
+
+    def __init__(self, body, codec, done):
+        self._body = body
+        self._codec = codec
+        self._done = done
+
+    def __iter__(self):
+        size_in = size_out = 0
+        cpu = 0.0
+        for chunk in self._body:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if not chunk:
+                continue
+            start = time.thread_time()
+            out = self._codec.compress(chunk) + self._codec.sync()
+            cpu += time.thread_time() - start
+            size_in += len(chunk)
+            size_out += len(out)
+            if out:
+                yield out
+        start = time.thread_time()
+        out = self._codec.flush()
+        cpu += time.thread_time() - start
+        self._done(size_in, size_out + len(out), cpu)
+        yield out
+
+    def close(self):
+        if hasattr(self._body, 'close'):
+            self._body.close()
+
+class ResponseCompressor:
+    """Compresses responses with the best encoding the client accepts.
+
+    gzip and deflate are always offered; zstd and br when their modules
+    are installed. Text and JSON bodies of at least min_size bytes are
+    compressed at the per-encoding level; streamed bodies are compressed
+    chunk by chunk as they are sent, whatever their size. A compressed
+    response gets a weak ETag, as it is a different encoding of the same
+    representation.
+
+    Buffered bodies with a strong ETag are compressed once: the result
+    is kept per (path and query, ETag, encoding) and replayed while the
+    ETag stays the same, so two resources that mint equal tags never
+    share a body. CPU time, bytes in and bytes out per encoding are reported by
+    stats() and to request_metrics.
+    """
+
+    def __init__(self, min_size=MIN_SIZE, levels=None, cache_size=256):
+        self.min_size = min_size
+        self.levels = dict(DEFAULT_LEVELS, **(levels or {}))
+        self.cache = LRUCache(cache_size)
+        self._lock = threading.Lock()
+        self._totals = {}   # encoding -> [responses, bytes in, bytes out, cpu seconds]
+        self.cache_hits = 0
+
+    def configure(self, min_size, levels=None):
+        unknown = set(levels or {}) - set(DEFAULT_LEVELS)
+        if unknown:
+            raise ValueError(f"unknown encodings in compression levels: {', '.join(unknown)}")
+        self.min_size = min_size
+        self.levels = dict(DEFAULT_LEVELS, **(levels or {}))
+        self.cache.clear()
+
+    def instrument(self, app):
+        """Compress the responses of a Flask app."""
+        app.after_request(self._after_request)
+
+    def _after_request(self, response):
+        if (response.status_code != 200 or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or not compressible(response.mimetype)
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(tuple(CODECS))
+        if encoding is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        etag, weak = response.get_etag()
+        if response.is_streamed:
+            response.response = _CompressedStream(
+                response.response, CODECS[encoding](self.levels[encoding]),
+                lambda size_in, size_out, cpu: self._record(encoding, route, size_in,
+                                                            size_out, cpu))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            key = (request.full_path, etag, encoding) if etag and not weak else None
+            body = self.cache.get(key) if key else None
+            if body is None:
+                body = self._compress(encoding, route, data)
+                if key:
+                    self.cache.put(key, body)
+            else:
+                with self._lock:
+                    self.cache_hits += 1
+            response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _compress(self, encoding, route, data):
+        start = time.thread_time()
+        codec = CODECS[encoding](self.levels[encoding])
+        body = codec.compress(data) + codec.flush()
+        self._record(encoding, route, len(data), len(body), time.thread_time() - start)
+        return body
+
+    def _record(self, encoding, route, size_in, size_out, cpu):
+        with self._lock:
+            totals = self._totals.setdefault(encoding, [0, 0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += size_in
+            totals[2] += size_out
+            totals[3] += cpu
+        labels = (('encoding', encoding), ('route', route))
+        request_metrics.observe('http_compression_cpu_seconds', labels, cpu)
+        request_metrics.add('http_compression_input_bytes_total', labels, size_in)
+        request_metrics.add('http_compression_output_bytes_total', labels, size_out)
+
+    def stats(self):
+        with self._lock:
+            totals = {encoding: list(values) for encoding, values in self._totals.items()}
+        return {
+            'encodings': list(CODECS),
+            'min_size': self.min_size,
+            'levels': self.levels,
+            'cache_hits': self.cache_hits,
+            'cache_entries': len(self.cache),
+            'compressed': {
+                encoding: {
+                    'responses': responses,
+                    'bytes_in': size_in,
+                    'bytes_out': size_out,
+                    'ratio': round(size_in / size_out, 2) if size_out else None,
+                    'cpu_ms': round(cpu * 1000, 3),
+                }
+                for encoding, (responses, size_in, size_out, cpu) in totals.items()
+            },
+        }
+
+response_compressor = ResponseCompressor()
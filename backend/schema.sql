@@ -58,8 +58,120 @@ CREATE TABLE adoptions (
     username TEXT NOT NULL,
     status TEXT NOT NULL DEFAULT 'PENDING',
     pet_name TEXT NOT NULL,
+    idempotency_key TEXT,   -- the client's Idempotency-Key header, if it sent one
     FOREIGN KEY (pet_id) REFERENCES pets(id)
 );
 
+-- TABLE: events (status changes for /api/events, written in the same
+-- transaction as the change; every worker reads new rows in id order)
+DROP TABLE IF EXISTS events;
+CREATE TABLE events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,        -- questionnaire or adoption
+    username TEXT NOT NULL,    -- whose request changed
+    data TEXT NOT NULL         -- the JSON sent to subscribers
+);
+
+-- TABLE: status_counts (rows per status of the admin queue tables, kept
+-- by the triggers below so queue counts never read the whole history)
+DROP TABLE IF EXISTS status_counts;
+CREATE TABLE status_counts (
+    table_name TEXT NOT NULL,  -- questionnaire_answers or adoptions
+    status TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (table_name, status)
+) WITHOUT ROWID;
+
+-- TABLE: revoked_tokens (access tokens logged out before they expire; each
+-- worker loads it when its event poller starts and then follows the
+-- token_revoked events; rows are pruned once the token has expired)
+DROP TABLE IF EXISTS revoked_tokens;
+CREATE TABLE revoked_tokens (
+    jti TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL   -- unix time after which the token is expired anyway
+) WITHOUT ROWID;
+
+-- INDEXES: one per hot lookup so none of the request paths scan a table
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users(username);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_admins_username ON admins(username);
+-- latest questionnaire for a user (ORDER BY id DESC LIMIT 1)
+CREATE INDEX IF NOT EXISTS idx_qanswers_username_id ON questionnaire_answers(username, id);
+-- status-filtered admin listings oldest first, the pending queue included
+CREATE INDEX IF NOT EXISTS idx_qanswers_status_id ON questionnaire_answers(status, id);
+-- /api/pets attribute filters; each index also carries the rowid keyset cursor
+CREATE INDEX IF NOT EXISTS idx_pets_type ON pets(type);
+CREATE INDEX IF NOT EXISTS idx_pets_size ON pets(size);
+CREATE INDEX IF NOT EXISTS idx_pets_activity_level ON pets(activity_level);
+CREATE INDEX IF NOT EXISTS idx_pets_maintenance_level ON pets(maintenance_level);
+CREATE INDEX IF NOT EXISTS idx_pets_budget ON pets(budget);
+CREATE INDEX IF NOT EXISTS idx_approved_pets_user_pet ON approved_pets(user_id, pet_id);
+CREATE INDEX IF NOT EXISTS idx_adoptions_username_id ON adoptions(username, request_id);
+CREATE INDEX IF NOT EXISTS idx_adoptions_status_id ON adoptions(status, request_id);
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON revoked_tokens(expires_at);
+-- one open request per user and pet; a repeat submission gets the existing one back
+CREATE UNIQUE INDEX IF NOT EXISTS idx_adoptions_pending_pet_user ON adoptions(pet_id, username)
+    WHERE status = 'PENDING';
+CREATE UNIQUE INDEX IF NOT EXISTS idx_adoptions_idempotency_key
+    ON adoptions(username, idempotency_key) WHERE idempotency_key IS NOT NULL;
+
+-- STATUS COUNTS: status_counts follows every insert, delete and status
+-- change of the two queue tables.
+CREATE TRIGGER qanswers_count_insert AFTER INSERT ON questionnaire_answers BEGIN
+    INSERT INTO status_counts (table_name, status, n) VALUES ('questionnaire_answers', new.status, 1)
+        ON CONFLICT (table_name, status) DO UPDATE SET n = n + 1;
+END;
+CREATE TRIGGER qanswers_count_delete AFTER DELETE ON questionnaire_answers BEGIN
+    UPDATE status_counts SET n = n - 1 WHERE table_name = 'questionnaire_answers' AND status = old.status;
+END;
+CREATE TRIGGER qanswers_count_update AFTER UPDATE OF status ON questionnaire_answers
+WHEN new.status IS NOT old.status BEGIN
+    UPDATE status_counts SET n = n - 1 WHERE table_name = 'questionnaire_answers' AND status = old.status;
+    INSERT INTO status_counts (table_name, status, n) VALUES ('questionnaire_answers', new.status, 1)
+        ON CONFLICT (table_name, status) DO UPDATE SET n = n + 1;
+END;
+CREATE TRIGGER adoptions_count_insert AFTER INSERT ON adoptions BEGIN
+    INSERT INTO status_counts (table_name, status, n) VALUES ('adoptions', new.status, 1)
+        ON CONFLICT (table_name, status) DO UPDATE SET n = n + 1;
+END;
+CREATE TRIGGER adoptions_count_delete AFTER DELETE ON adoptions BEGIN
+    UPDATE status_counts SET n = n - 1 WHERE table_name = 'adoptions' AND status = old.status;
+END;
+CREATE TRIGGER adoptions_count_update AFTER UPDATE OF status ON adoptions
+WHEN new.status IS NOT old.status BEGIN
+    UPDATE status_counts SET n = n - 1 WHERE table_name = 'adoptions' AND status = old.status;
+    INSERT INTO status_counts (table_name, status, n) VALUES ('adoptions', new.status, 1)
+        ON CONFLICT (table_name, status) DO UPDATE SET n = n + 1;
+END;
+
+-- FULL-TEXT SEARCH: /api/pets/search over name, type, size and attributes.
+-- External content (rows are read from pets), kept in sync by the triggers
+-- below. Prefix indexes cover the type, size and level words (up to 6
+-- characters), whose doclists are too long to merge on every query.
+DROP TABLE IF EXISTS pets_fts;
+CREATE VIRTUAL TABLE pets_fts USING fts5(
+    name, type, size, activity_level, maintenance_level, budget,
+    content='pets', content_rowid='id', prefix='2 3 4 5 6'
+);
+CREATE TRIGGER pets_fts_insert AFTER INSERT ON pets BEGIN
+    INSERT INTO pets_fts (rowid, name, type, size, activity_level, maintenance_level, budget)
+    VALUES (new.id, new.name, new.type, new.size, new.activity_level, new.maintenance_level,
+            new.budget);
+END;
+CREATE TRIGGER pets_fts_delete AFTER DELETE ON pets BEGIN
+    INSERT INTO pets_fts (pets_fts, rowid, name, type, size, activity_level, maintenance_level,
+                          budget)
+    VALUES ('delete', old.id, old.name, old.type, old.size, old.activity_level,
+            old.maintenance_level, old.budget);
+END;
+CREATE TRIGGER pets_fts_update AFTER UPDATE ON pets BEGIN
+    INSERT INTO pets_fts (pets_fts, rowid, name, type, size, activity_level, maintenance_level,
+                          budget)
+    VALUES ('delete', old.id, old.name, old.type, old.size, old.activity_level,
+            old.maintenance_level, old.budget);
+    INSERT INTO pets_fts (rowid, name, type, size, activity_level, maintenance_level, budget)
+    VALUES (new.id, new.name, new.type, new.size, new.activity_level, new.maintenance_level,
+            new.budget);
+END;
+
 INSERT INTO admins (username, password) VALUES ('admin', 'admin123');
 INSERT INTO users (username, password) VALUES ('testuser', 'password123');
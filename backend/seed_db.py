@@ -1,8 +1,41 @@
-# pylint: disable=C0114,C0116
+# pylint: disable=C0114,C0116,R0914
+import argparse
+import functools
 import os
+import random
 import sqlite3
+import time
+import bcrypt
+from passwords import MIN_COST
+from pet_cache import catalog_cache
 
-def seed_db():
+SAMPLE_PETS = (
+    ('Max', 'dog', 'medium', 'high', 'medium', 'high'),
+    ('Bella', 'cat', 'small', 'low', 'low', 'medium'),
+    ('Charlie', 'dog', 'large', 'medium', 'high', 'high'),
+    ('Lucy', 'dog', 'small', 'medium', 'medium', 'low'),
+    ('Milo', 'cat', 'medium', 'low', 'low', 'medium'),
+)
+
+# Distributions for generate_data(): (values, weights)
+LEVELS = ('low', 'medium', 'high')
+PET_TYPES = (('dog', 'cat'), (55, 45))
+PET_SIZES = {'dog': (('small', 'medium', 'large'), (30, 40, 30)),
+             'cat': (('small', 'medium', 'large'), (55, 40, 5))}
+PET_ACTIVITY = {'dog': (LEVELS, (20, 40, 40)), 'cat': (LEVELS, (45, 40, 15))}
+PET_MAINTENANCE = (LEVELS, (35, 45, 20))
+PET_BUDGET = (LEVELS, (30, 45, 25))
+PET_NAMES = ('Max', 'Bella', 'Charlie', 'Lucy', 'Milo', 'Luna', 'Cooper', 'Daisy',
+             'Rocky', 'Molly', 'Buddy', 'Sadie', 'Oliver', 'Chloe', 'Bear', 'Nala')
+ANSWER_TYPES = (('dog', 'cat'), (60, 40))
+ANSWER_SPACE = (('small', 'medium', 'large', 'any'), (30, 35, 15, 20))
+# approved vs rejected among reviewed questionnaires; the pending share is a parameter
+REVIEWED_STATUS = {'APPROVED': 0.63, 'REJECTED': 0.37}
+ADOPTION_STATUS = (('PENDING', 'APPROVE', 'REJECT'), (20, 50, 30))
+GENERATED_PASSWORD = 'password123'
+CHUNK_SIZE = 50_000
+
+def seed_db(db_path=None):
     """Seed the database with initial data.
     ---
     tags:
@@ -14,45 +47,280 @@ def seed_db():
         500:
             description: Error seeding database
     """
-    backend_dir = os.path.dirname(os.path.abspath(__file__))
-    db_path = os.path.join(backend_dir, 'pets.db')
+    if db_path is None:
+        backend_dir = os.path.dirname(os.path.abspath(__file__))
+        db_path = os.path.join(backend_dir, 'pets.db')
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
-    # Insert sample users
+    # Insert sample users (schema.sql may already have created them)
     cursor.execute("""
-        INSERT INTO users (username, password)
+        INSERT OR IGNORE INTO users (username, password)
         VALUES ('testuser', 'password123')
     """)
     # Insert sample admins
     cursor.execute("""
-        INSERT INTO admins (username, password)
+        INSERT OR IGNORE INTO admins (username, password)
         VALUES ('admin', 'admin123')
     """)
     # Insert sample pets
-    cursor.execute("""
+    cursor.executemany("""
     INSERT INTO pets (name, type, size, activity_level, maintenance_level, budget)
-    VALUES ('Max', 'dog', 'medium', 'high', 'medium', 'high')
-    """)
-    cursor.execute("""
-    INSERT INTO pets (name, type, size, activity_level, maintenance_level, budget)
-    VALUES ('Bella', 'cat', 'small', 'low', 'low', 'medium')
-""")
-    cursor.execute("""
-    INSERT INTO pets (name, type, size, activity_level, maintenance_level, budget)
-    VALUES ('Charlie', 'dog', 'large', 'medium', 'high', 'high')
-""")
-    cursor.execute("""
-    INSERT INTO pets (name, type, size, activity_level, maintenance_level, budget)
-    VALUES ('Lucy', 'dog', 'small', 'medium', 'medium', 'low')
-""")
-    cursor.execute("""
-    INSERT INTO pets (name, type, size, activity_level, maintenance_level, budget)
-    VALUES ('Milo', 'cat', 'medium', 'low', 'low', 'medium')
-""")
+    VALUES (?, ?, ?, ?, ?, ?)
+    """, SAMPLE_PETS)
     conn.commit()
     conn.close()
+    catalog_cache.invalidate()
     print("Database seeded successfully!")
 
+def _pick(rng, distribution, k):
+    values, weights = distribution
+    return rng.choices(values, weights, k=k)
+
+def _pick_by(rng, distributions, keys):
+    """One value per key, drawn from the distribution for that key."""
+    drawn = {key: iter(_pick(rng, dist, len(keys))) for key, dist in distributions.items()}
+    return [next(drawn[key]) for key in keys]
+
+def _chunks(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+def _pet_rows(rng, first_id, count, chunk):
+    for start, n in _chunks(count, chunk):
+        types = _pick(rng, PET_TYPES, n)
+        sizes = _pick_by(rng, PET_SIZES, types)
+        activity = _pick_by(rng, PET_ACTIVITY, types)
+        maintenance = _pick(rng, PET_MAINTENANCE, n)
+        budget = _pick(rng, PET_BUDGET, n)
+        ids = range(first_id + start, first_id + start + n)
+        yield [(pid, pet_name(pid), *row) for pid, row in
+               zip(ids, zip(types, sizes, activity, maintenance, budget))]
+
+def pet_name(pet_id):
+    """Deterministic display name, so adoptions can copy it without a lookup."""
+    return f'{PET_NAMES[pet_id % len(PET_NAMES)]} {pet_id}'
+
+def _user_rows(first_id, count, password, chunk):
+    for start, n in _chunks(count, chunk):
+        yield [(uid, f'user{uid}', password)
+               for uid in range(first_id + start, first_id + start + n)]
+
+def _questionnaire_rows(rng, user_ids, chunking, statuses_mix, approved):
+    """Answers skewed towards long-standing (low id) users; approved ones recorded."""
+    first_user, n_users = user_ids.start, len(user_ids)
+    for _, n in _chunks(*chunking):
+        users = [first_user + int(n_users * r * r) for r in (rng.random() for _ in range(n))]
+        types = _pick(rng, ANSWER_TYPES, n)
+        spaces = _pick(rng, ANSWER_SPACE, n)
+        activity = _pick(rng, (LEVELS, (30, 40, 30)), n)
+        maintenance = _pick(rng, (LEVELS, (40, 40, 20)), n)
+        budget = _pick(rng, (LEVELS, (35, 40, 25)), n)
+        statuses = _pick(rng, statuses_mix, n)
+        for user, pet_type, status in zip(users, types, statuses):
+            if status == 'APPROVED':
+                approved.append((user, pet_type))
+        yield [(f'user{u}', *row) for u, row in
+               zip(users, zip(spaces, activity, maintenance, budget, types, statuses))]
+
+def _approved_rows(rng, approved, pets_by_type, chunk):
+    """One to three pets of the requested type per approved questionnaire."""
+    rows = []
+    for user, pet_type in approved:
+        candidates = pets_by_type[pet_type]
+        for _ in range(rng.choice((1, 2, 2, 3))):
+            rows.append((user, candidates[int(rng.random() * len(candidates))]))
+        if len(rows) >= chunk:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+def _adoption_rows(rng, approved_pairs, pet_ids, user_ids, chunking):
+    """Mostly approved users adopting one of their approved pets."""
+    pending = set()
+    for _, n in _chunks(*chunking):
+        statuses = _pick(rng, ADOPTION_STATUS, n)
+        rows = []
+        random_ = rng.random
+        for status in statuses:
+            if approved_pairs and random_() < 0.8:
+                user, pet = approved_pairs[int(random_() * len(approved_pairs))]
+            else:
+                user = user_ids[int(random_() * len(user_ids))]
+                pet = pet_ids[int(random_() * len(pet_ids))]
+            if status == 'PENDING':
+                # at most one open request per user and pet; a repeat was turned down
+                if (user, pet) in pending:
+                    status = 'REJECT'
+                pending.add((user, pet))
+            rows.append((pet, f'user{user}', status, pet_name(pet)))
+        yield rows
+
+def _load(conn, sql, chunks):
+    total = 0
+    conn.execute("BEGIN")
+    for rows in chunks:
+        conn.executemany(sql, rows)
+        total += len(rows)
+    conn.execute("COMMIT")
+    return total
+
+def generate_data(db_path, sizes, seed=0, pending_share=0.05, chunk_size=CHUNK_SIZE):
+    """Append synthetic rows for load testing; returns {table: rows inserted}.
+
+    sizes maps 'pets', 'users', 'questionnaires' and 'adoptions' to row
+    counts (missing keys mean none). pending_share of the questionnaires
+    are left PENDING, the rest are reviewed. Generated users are named
+    user<id> and log in with 'password123'; their ids start past any
+    registered user<n> name.
+
+    The same seed and sizes always produce the same rows. Rows are
+    streamed in chunk_size executemany batches, one transaction per
+    table, with fsyncs switched off for the load (a power loss mid-load
+    can corrupt the file, so only use this on a disposable database).
+    The database stays in WAL mode: leaving it would need every other
+    connection to the file closed, and a failed load can roll back.
+    """
+    rng = random.Random(seed)
+    statuses_mix = (('PENDING', *REVIEWED_STATUS),
+                    (pending_share, *(share * (1 - pending_share)
+                                      for share in REVIEWED_STATUS.values())))
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")   # 256 MB while indexes are built
+    # Building an index once over the loaded table is much cheaper than
+    # updating it row by row, so secondary indexes and the triggers that
+    # feed the pets_fts search index and status_counts are dropped for the
+    # load; both are rebuilt from the tables afterwards. UNIQUE indexes
+    # stay: they are constraints, and recreating one over rows that break
+    # it would fail.
+    dropped = conn.execute(
+        "SELECT type, name, sql FROM sqlite_master"
+        " WHERE type IN ('index', 'trigger') AND sql IS NOT NULL"
+        " AND NOT (type = 'index' AND sql LIKE 'CREATE UNIQUE INDEX%')"
+        " AND tbl_name IN ('pets', 'users', 'questionnaire_answers', 'approved_pets', 'adoptions')"
+    ).fetchall()
+    has_fts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'pets_fts'").fetchone() is not None
+    has_counts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'status_counts'").fetchone() is not None
+    try:
+        for kind, name, _ in dropped:
+            conn.execute(f"DROP {kind.upper()} {name}")
+        counts = _generate(conn, rng, sizes, statuses_mix, chunk_size)
+    finally:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")   # a load that failed part way
+        # one at a time, so a failure cannot leave the objects after it missing
+        restores = [(name, functools.partial(conn.execute, sql)) for _, name, sql in dropped]
+        if has_fts and sizes.get('pets'):
+            restores.append(('pets_fts', functools.partial(
+                conn.execute, "INSERT INTO pets_fts (pets_fts) VALUES ('rebuild')")))
+        if has_counts:
+            restores.append(('status_counts', functools.partial(_recount_statuses, conn)))
+        failed = []
+        for name, restore in restores:
+            try:
+                restore()
+            except sqlite3.Error as e:
+                failed.append(f'{name} ({e})')
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.close()
+        catalog_cache.invalidate()
+    if failed:
+        raise sqlite3.DatabaseError(f"could not restore after the load: {', '.join(failed)}")
+    return counts
+
+def _recount_statuses(conn):
+    """Rebuild status_counts from the queue tables (after a load without its triggers)."""
+    conn.execute("BEGIN")
+    try:
+        conn.execute("DELETE FROM status_counts")
+        for table in ('questionnaire_answers', 'adoptions'):
+            conn.execute(f"INSERT INTO status_counts (table_name, status, n)"
+                         f" SELECT '{table}', status, COUNT(*) FROM {table} GROUP BY status")
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        conn.execute("ROLLBACK")
+        raise
+
+def _generate(conn, rng, sizes, statuses_mix, chunk):
+    pets, users = sizes.get('pets', 0), sizes.get('users', 0)
+    questionnaires, adoptions = sizes.get('questionnaires', 0), sizes.get('adoptions', 0)
+
+    def next_id(table, column='id'):
+        return conn.execute(f"SELECT coalesce(max({column}), 0) + 1 FROM {table}").fetchone()[0]
+
+    counts = {}
+    counts['pets'] = _load(conn, """
+        INSERT INTO pets (id, name, type, size, activity_level, maintenance_level, budget)
+        VALUES (?, ?, ?, ?, ?, ?, ?)""", _pet_rows(rng, next_id('pets'), pets, chunk))
+    # one shared hash: bcrypt per row would dominate the load time
+    password = bcrypt.hashpw(GENERATED_PASSWORD.encode('utf-8'),
+                             _salt(rng, MIN_COST)).decode('ascii')
+    # user<id> must not be a name someone already registered
+    taken = conn.execute("SELECT max(CAST(substr(username, 5) AS INTEGER)) FROM users"
+                         " WHERE username GLOB 'user[0-9]*'").fetchone()[0]
+    first_user = max(next_id('users'), (taken or 0) + 1)
+    counts['users'] = _load(conn, "INSERT INTO users (id, username, password) VALUES (?, ?, ?)",
+                            _user_rows(first_user, users, password, chunk))
+    # only generated users: their names can be derived from their ids
+    user_ids = range(first_user, first_user + users)
+    approved = []
+    if questionnaires and user_ids:
+        counts['questionnaire_answers'] = _load(conn, """
+            INSERT INTO questionnaire_answers
+                (username, living_space, activity_level, maintenance_level, budget, pet_type, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            _questionnaire_rows(rng, user_ids, (questionnaires, chunk), statuses_mix, approved))
+    pets_by_type = {'dog': [], 'cat': []}
+    for pet_id, pet_type in conn.execute("SELECT id, type FROM pets ORDER BY id"):
+        pets_by_type.setdefault(pet_type, []).append(pet_id)
+    approved = [(u, t) for u, t in approved if pets_by_type.get(t)]
+    approved_pairs = []
+    for rows in _approved_rows(rng, approved, pets_by_type, chunk):
+        approved_pairs.extend(rows)
+    counts['approved_pets'] = _load(
+        conn, "INSERT INTO approved_pets (user_id, pet_id) VALUES (?, ?)",
+        _chunk_list(approved_pairs, chunk))
+    pet_ids = pets_by_type['dog'] + pets_by_type['cat']
+    if adoptions and pet_ids and user_ids:
+        counts['adoptions'] = _load(conn, """
+            INSERT INTO adoptions (pet_id, username, status, pet_name) VALUES (?, ?, ?, ?)""",
+            _adoption_rows(rng, approved_pairs, pet_ids, user_ids, (adoptions, chunk)))
+    return counts
+
+def _salt(rng, cost):
+    """bcrypt.gensalt() drawn from rng rather than os.urandom, for repeatable rows."""
+    alphabet = './ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'
+    # the last character only carries two bits of the 128-bit salt
+    return f"$2b${cost:02d}${''.join(rng.choices(alphabet, k=21))}.".encode('ascii')
+
+def _chunk_list(rows, chunk):
+    for start in range(0, len(rows), chunk):
+        yield rows[start:start + chunk]
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Seed the sample data, optionally followed by generated rows.')
+    parser.add_argument('--db', help='database path (default backend/pets.db)')
+    parser.add_argument('--pets', type=int, default=0)
+    parser.add_argument('--users', type=int, default=0)
+    parser.add_argument('--questionnaires', type=int, default=0)
+    parser.add_argument('--adoptions', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pending-share', type=float, default=0.05)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    db_path = args.db or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pets.db')
+    seed_db(db_path)
+    sizes = {'pets': args.pets, 'users': args.users,
+             'questionnaires': args.questionnaires, 'adoptions': args.adoptions}
+    if any(sizes.values()):
+        start = time.perf_counter()
+        counts = generate_data(db_path, sizes, args.seed, args.pending_share, args.chunk_size)
+        print(f"Generated {counts} in {time.perf_counter() - start:.1f}s")
+
 if __name__ == '__main__':
-    seed_db()
- 
\ No newline at end of file
+    main()
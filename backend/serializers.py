@@ -0,0 +1,95 @@
+import json
+import operator
+from flask import request
+
+try:
+    import orjson
+except ImportError:   # optional: the standard library encoder is used instead
+    orjson = None
+
+JSON_MIMETYPE = 'application/json'
+COLUMNS_MIMETYPE = 'application/vnd.pets.columns+json'
+FORMATS = ('objects', 'columns')
+
+def _json_dumps(obj):
+    # same bytes as jsonify() outside debug mode
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+# name -> dumps(obj) -> bytes; must accept lists, tuples, dicts and SQLite values
+ENCODERS = {'json': _json_dumps}
+if orjson is not None:
+    ENCODERS['orjson'] = orjson.dumps  # pylint: disable=no-member  # C extension
+
+class UnknownFormat(ValueError):
+    """The client asked for a response format the list endpoints do not have."""
+
+def register_encoder(name, dumps):
+    """Make another JSON encoder available to RowSerializer.configure()."""
+    ENCODERS[name] = dumps
+
+def response_format():
+    """'columns' or 'objects', from the format query arg, else the Accept header."""
+    fmt = request.args.get('format')
+    if fmt is not None:
+        if fmt not in FORMATS:
+            raise UnknownFormat(f"format must be one of {', '.join(FORMATS)}")
+        return fmt
+    best = request.accept_mimetypes.best_match((JSON_MIMETYPE, COLUMNS_MIMETYPE))
+    return 'columns' if best == COLUMNS_MIMETYPE else 'objects'
+
+class RowSerializer:
+    """Writes cursor rows (plain tuples) as list response bodies.
+
+    'objects' is the usual array of objects, keys sorted as jsonify()
+    sorts them. 'columns' is {"columns": [...], "rows": [[...], ...]}:
+    the tuples go to the encoder as they come from the cursor and the
+    key names are written once. Bodies are built from fragments so a
+    stream can emit them chunk by chunk: open() + chunk() joined by
+    b',' + close().
+
+    The encoder is pluggable (see ENCODERS); 'auto' picks orjson when it
+    is installed and the standard library otherwise.
+    """
+
+    def __init__(self, encoder='auto'):
+        self.encoder = None
+        self.dumps = None
+        self.configure(encoder)
+
+    def configure(self, encoder):
+        if encoder == 'auto':
+            encoder = 'orjson' if 'orjson' in ENCODERS else 'json'
+        if encoder not in ENCODERS:
+            raise ValueError(f"unknown JSON encoder {encoder!r}; "
+                             f"available: {', '.join(sorted(ENCODERS))}")
+        self.encoder = encoder
+        self.dumps = ENCODERS[encoder]
+
+    @staticmethod
+    def mimetype(fmt):
+        return COLUMNS_MIMETYPE if fmt == 'columns' else JSON_MIMETYPE
+
+    def open(self, columns, fmt):
+        if fmt == 'columns':
+            return b'{"columns":' + self.dumps(list(columns)) + b',"rows":['
+        return b'['
+
+    def chunk(self, columns, rows, fmt):
+        """Comma-separated encoded rows, without the enclosing brackets."""
+        if fmt == 'columns':
+            return self.dumps(rows)[1:-1]
+        keys = sorted(columns)
+        if len(keys) == 1:
+            return self.dumps([{keys[0]: row[0]} for row in rows])[1:-1]
+        pick = operator.itemgetter(*(columns.index(key) for key in keys))
+        return self.dumps([dict(zip(keys, pick(row))) for row in rows])[1:-1]
+
+    @staticmethod
+    def close(fmt):
+        return b']}\n' if fmt == 'columns' else b']\n'
+
+    def body(self, columns, rows, fmt):
+        """A whole response body for a list of rows."""
+        return self.open(columns, fmt) + self.chunk(columns, rows, fmt) + self.close(fmt)
+
+row_serializer = RowSerializer()
@@ -0,0 +1,236 @@
+"""Production entry point: pre-forked worker processes with a thread pool each.
+
+    python serve.py --workers 4 --threads 8 --port 5000
+
+Settings come from config.load_config() (environment variables of the
+same names), overridden by the command line. The master opens the
+listening socket once and every worker inherits it, so the port never
+closes while workers come and go. Signals to the master:
+
+    SIGHUP           graceful restart: start fresh workers, then drain the old ones
+    SIGTERM, SIGINT  graceful stop: workers finish in-flight requests and exit
+
+Workers that die unexpectedly are replaced. A worker still busy
+GRACEFUL_TIMEOUT seconds after being told to stop is killed.
+
+With --mode async (SERVER_MODE) each worker accepts and reads requests
+on an asyncio event loop and only runs the app on its thread pool, so
+open connections are cheap (see async_server.py).
+
+Without SECRET_KEY the master makes up a signing key before forking, so
+tokens verify on every worker but not across restarts of the master.
+
+Workers write their request metrics to METRICS_DIR (a temporary
+directory unless configured), so /metrics on any worker covers all.
+"""
+import argparse
+import glob
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer
+from app_logging import JsonFormatter
+from config import load_config
+
+logger = logging.getLogger('serve')
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug WSGI server that handles connections on a fixed thread pool.
+
+    Accepting stops while every thread is busy and `threads` more
+    connections are queued, so an overloaded worker leaves new connections
+    in the shared listen backlog for its siblings instead of hoarding them.
+    """
+
+    multithread = True
+
+    def __init__(self, app, fd, threads):
+        self._executor = ThreadPoolExecutor(threads, thread_name_prefix='http')
+        self._slots = threading.BoundedSemaphore(threads * 2)
+        super().__init__('0.0.0.0', 0, app, fd=fd)
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()  # pylint: disable=consider-using-with
+        self._executor.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:  # pylint: disable=broad-except
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def drain(self):
+        """Wait for in-flight requests once serve_forever() has returned."""
+        self._executor.shutdown(wait=True)
+
+def run_worker(sock, config):
+    """Worker process body; never returns."""
+    for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(signum, signal.SIG_DFL)
+    # Imported after the fork so no pool, logging thread or executor of the
+    # app is ever shared between processes.
+    from main import create_app  # pylint: disable=import-outside-toplevel
+    from app_logging import shutdown_logging  # pylint: disable=import-outside-toplevel
+    from metrics import request_metrics  # pylint: disable=import-outside-toplevel
+    from events import event_broadcaster  # pylint: disable=import-outside-toplevel
+    if config['SERVER_MODE'] == 'async':
+        from async_server import AsyncWSGIServer  # pylint: disable=import-outside-toplevel
+        server = AsyncWSGIServer(create_app(config), sock, config['THREADS'],
+                                 config['MAX_CONTENT_LENGTH'])
+    else:
+        server = PooledWSGIServer(create_app(config), sock.fileno(), config['THREADS'])
+        sock.close()
+
+    def stop(_signum, _frame):
+        # shutdown() blocks until serve_forever returns, so not from this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+        # open event streams would hold up the drain; their clients reconnect elsewhere
+        event_broadcaster.close()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info("worker %d serving with %d threads (%s)",
+                os.getpid(), config['THREADS'], config['SERVER_MODE'])
+    code = 0
+    try:
+        server.serve_forever()
+        server.drain()
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("worker %d crashed", os.getpid())
+        code = 1
+    request_metrics.flush()   # the final counts outlive the worker
+    shutdown_logging()
+    os._exit(code)
+
+class Master:
+    """Forks, watches and replaces workers sharing one listening socket."""
+
+    def __init__(self, config):
+        self.config = config
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((config['HOST'], config['PORT']))
+        self.sock.listen(config['BACKLOG'])
+        self.sock.set_inheritable(True)
+        self.workers = {}    # pid -> time it was told to stop, or None while serving
+        self.signals = []
+        self.own_metrics_dir = not config['METRICS_DIR']
+        if self.own_metrics_dir:
+            config['METRICS_DIR'] = tempfile.mkdtemp(prefix='pet-adoption-metrics-')
+        else:
+            # counters start from zero with every master
+            for path in glob.glob(os.path.join(config['METRICS_DIR'], '*.json')):
+                os.remove(path)
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(self.sock, self.config)
+            finally:
+                # never unwind into the master's loop from a worker
+                os._exit(1)
+        self.workers[pid] = None
+        return pid
+
+    def stop_workers(self, pids):
+        now = time.monotonic()
+        for pid in pids:
+            if self.workers.get(pid) is None:
+                self.workers[pid] = now
+                self._kill(pid, signal.SIGTERM)
+
+    @staticmethod
+    def _kill(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def reap(self):
+        """Collect exited workers; return how many died while still serving."""
+        died = 0
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if self.workers.pop(pid, 0) is None:
+                died += 1
+                logger.warning("worker %d exited unexpectedly (status %d)", pid, status)
+        return died
+
+    def run(self):
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(signum, lambda s, _f: self.signals.append(s))
+        logger.info("master %d listening on %s:%d with %d workers x %d threads",
+                    os.getpid(), self.config['HOST'], self.config['PORT'],
+                    self.config['WORKERS'], self.config['THREADS'])
+        for _ in range(self.config['WORKERS']):
+            self.spawn()
+        stopping = False
+        while self.workers:
+            while self.signals:
+                signum = self.signals.pop(0)
+                if signum == signal.SIGHUP and not stopping:
+                    old = list(self.workers)
+                    logger.info("graceful restart of %d workers", len(old))
+                    for _ in range(self.config['WORKERS']):
+                        self.spawn()
+                    self.stop_workers(old)
+                elif signum in (signal.SIGTERM, signal.SIGINT):
+                    stopping = True
+                    self.stop_workers(list(self.workers))
+            for _ in range(self.reap()):
+                if not stopping:
+                    time.sleep(1)   # don't spin if workers crash on start
+                    self.spawn()
+            deadline = time.monotonic() - self.config['GRACEFUL_TIMEOUT']
+            for pid, stopped in self.workers.items():
+                if stopped is not None and stopped < deadline:
+                    logger.warning("worker %d did not stop in time, killing", pid)
+                    self._kill(pid, signal.SIGKILL)
+            time.sleep(0.2)
+        self.sock.close()
+        if self.own_metrics_dir:
+            shutil.rmtree(self.config['METRICS_DIR'], ignore_errors=True)
+        logger.info("master %d stopped", os.getpid())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--threads', type=int)
+    parser.add_argument('--database')
+    parser.add_argument('--mode', dest='server_mode', choices=('threaded', 'async'))
+    args = parser.parse_args()
+    overrides = {key.upper(): value for key, value in vars(args).items() if value is not None}
+    config = load_config(overrides)
+    # every request and DB executor thread of a worker may hold a pooled connection at once
+    config['POOL_SIZE'] = max(config['POOL_SIZE'], config['THREADS'] + config['DB_THREADS'])
+
+    # The master logs synchronously: a queue-listener thread must not exist at fork time.
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    logging.basicConfig(level=config['LOG_LEVEL'].upper(), handlers=[handler])
+    if not config['SECRET_KEY']:
+        # one key for every worker, or a token only verifies on the worker that issued it
+        config['SECRET_KEY'] = os.urandom(32).hex()
+        logger.warning("SECRET_KEY is not set; issued tokens stop working when the master restarts")
+    Master(config).run()
+
+if __name__ == '__main__':
+    main()
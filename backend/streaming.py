@@ -0,0 +1,107 @@
+# pylint: disable=R0902,R0913,R0917
+from flask import Response, has_request_context, request
+from init_db import get_db_connection, get_pool
+from serializers import response_format, row_serializer
+
+STREAM_CHUNK_ROWS = 1000   # rows fetched, encoded and sent per chunk
+
+class RowStream:
+    """Response body that writes a keyset query's rows as they are fetched.
+
+    The first chunk was read by the view; every later one re-runs the
+    query from the last key sent, on a connection borrowed from the pool
+    just for that fetch. Memory stays flat however large the result is,
+    and no connection is held while a slow client reads, so slow readers
+    cannot starve the pool. Each chunk is its own snapshot: rows written
+    meanwhile may or may not appear, but none is sent twice.
+
+    tee(callback, max_bytes) hands the complete body to callback once it
+    has been sent in full, if it is no larger than max_bytes.
+    """
+
+    def __init__(self, query, params, key, columns, first_rows, fmt,
+                 chunk_rows=STREAM_CHUNK_ROWS):
+        self._query = query
+        self._params = list(params)
+        self._key = columns.index(key)
+        self._columns = columns
+        self._first_rows = first_rows
+        self._format = fmt
+        self._chunk_rows = chunk_rows
+        self._pool = get_pool()
+        rule = request.url_rule if has_request_context() else None
+        self._tag = rule.rule if rule is not None else None
+        self._tee = None
+
+    def tee(self, callback, max_bytes):
+        self._tee = (callback, max_bytes, [], 0)
+
+    def _fetch(self, after):
+        conn = self._pool.acquire()
+        try:
+            conn.begin(self._tag)
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(self._query, [after] + self._params[1:] + [self._chunk_rows])
+            return cursor.fetchall()
+        finally:
+            self._pool.release(conn)
+
+    def _chunks(self):
+        rows, self._first_rows = self._first_rows, None
+        yield (row_serializer.open(self._columns, self._format)
+               + row_serializer.chunk(self._columns, rows, self._format))
+        while len(rows) == self._chunk_rows:
+            rows = self._fetch(rows[-1][self._key])
+            if not rows:
+                break
+            yield b',' + row_serializer.chunk(self._columns, rows, self._format)
+        yield row_serializer.close(self._format)
+
+    def __iter__(self):
+        for chunk in self._chunks():
+            if self._tee is not None:
+                callback, max_bytes, parts, size = self._tee
+                size += len(chunk)
+                parts.append(chunk)
+                # past the limit the body is not worth keeping
+                self._tee = (callback, max_bytes, parts, size) if size <= max_bytes else None
+            yield chunk
+        if self._tee is not None:
+            callback, _, parts, _ = self._tee
+            self._tee = None
+            callback(b''.join(parts))
+
+def rows_response(cursor, rows, fmt=None):
+    """List response of rows already fetched from cursor, in the requested format."""
+    fmt = fmt or response_format()
+    columns = tuple(column[0] for column in cursor.description)
+    response = Response(row_serializer.body(columns, rows, fmt),
+                        mimetype=row_serializer.mimetype(fmt))
+    response.vary.add('Accept')
+    return response
+
+def json_rows(query, params, key, chunk_rows=STREAM_CHUNK_ROWS, fmt=None):
+    """List response of a keyset query's rows, streamed when large.
+
+    query selects rows with key > ? (the first parameter) ordered by key,
+    and takes no LIMIT: json_rows appends one. key must be among the
+    selected columns. The first chunk runs on the request's connection
+    (get_db_connection()); a result that fits in it is returned whole, a
+    larger one streams (see RowStream). Either way the body is the same.
+    fmt defaults to what the request asked for. sqlite3.Error from the
+    first fetch propagates to the caller.
+    """
+    fmt = fmt or response_format()
+    query += ' LIMIT ?'
+    cursor = get_db_connection().cursor()
+    cursor.row_factory = None
+    cursor.execute(query, list(params) + [chunk_rows])
+    rows = cursor.fetchall()
+    if len(rows) < chunk_rows:
+        return rows_response(cursor, rows, fmt)
+    columns = tuple(column[0] for column in cursor.description)
+    response = Response(RowStream(query, params, key, columns, rows, fmt, chunk_rows),
+                        mimetype=row_serializer.mimetype(fmt))
+    response.vary.add('Accept')
+    return response
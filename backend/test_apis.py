@@ -1,13 +1,22 @@
 # pylint: disable=C0114,C0115,C0116,C0301,C0303,C0304
 import unittest
+import glob
 import os
+import re
+import threading
 import sqlite3
-from main import app
-from init_db import init_db
+import tempfile
+from main import app, create_app
+from config import load_config
+from init_db import init_db, get_pool
 from seed_db import seed_db
+from pet_cache import catalog_cache
+from passwords import password_hasher
+from tokens import token_issuer
+from questionaire import questionnaire_writer
 
-class TestAPI(unittest.TestCase):
-    """Test suite for API endpoints.
+class APITestCase(unittest.TestCase):
+    """A freshly seeded database and a test client for every test.
     ---
     tags:
       - tests
@@ -20,6 +29,8 @@ class TestAPI(unittest.TestCase):
           - tests
         description: Set up test database, seed initial data and ensure required tables exist
         """
+        # cheapest bcrypt cost keeps the suite fast; calibration is covered by the benchmark
+        password_hasher.cost = 4
         init_db()
         seed_db()
         backend_dir = os.path.dirname(os.path.abspath(__file__))
@@ -59,6 +70,7 @@ class TestAPI(unittest.TestCase):
         """
         self.app = app.test_client()
         self.app.testing = True
+        self.admin = self.auth('admin', 'admin')
         backend_dir = os.path.dirname(os.path.abspath(__file__))
         self.db_path = os.path.join(backend_dir, 'pets.db')
         # Reinitialize and seed the database
@@ -66,11 +78,23 @@ class TestAPI(unittest.TestCase):
         conn.close()
         seed_db()
 
+    @staticmethod
+    def auth(username='testuser', role='user'):
+        """Authorization header carrying a fresh access token."""
+        return {'Authorization': f'Bearer {token_issuer.issue(username, role)}'}
+
     def tearDown(self):
         """Clean up test database."""
         if os.path.exists(self.db_path):
             os.remove(self.db_path)
 
+
+class TestAPI(APITestCase):
+    """Test suite for API endpoints.
+    ---
+    tags:
+      - tests
+    """
     def test_register(self):
         """Test user registration endpoint.
         ---
@@ -108,19 +132,6 @@ class TestAPI(unittest.TestCase):
         })
         self.assertEqual(response.status_code, 200)
 
-    def test_get_pets(self):
-        """Test get all pets endpoint.
-        ---
-        tags:
-          - tests
-        description: Test retrieving all pets
-        responses:
-            200:
-                description: List of pets retrieved successfully
-        """
-        response = self.app.get('/api/pets')
-        self.assertEqual(response.status_code, 200)
-
     def test_questionnaire(self):
         """Test complete questionnaire flow.
         ---
@@ -137,7 +148,7 @@ class TestAPI(unittest.TestCase):
             'password': 'testpass',
         })
         # Then submit questionnaire with updated key "maintenance_level"
-        response = self.app.post('/api/questionnaire', json={
+        response = self.app.post('/api/questionnaire', headers=self.auth(), json={
             'username': 'testuser',
             'answers': {
                 'living_space': 'apartment',
@@ -148,6 +159,301 @@ class TestAPI(unittest.TestCase):
             }
         })
         self.assertEqual(response.status_code, 200)
+        # only with a token, and only for its own user
+        body = {'username': 'testuser', 'answers': {'pet_type': 'dog'}}
+        self.assertEqual(self.app.post('/api/questionnaire', json=body).status_code, 401)
+        self.assertEqual(self.app.post('/api/questionnaire', headers=self.auth('someone'),
+                                       json=body).status_code, 403)
+        # answers must be an object with a string for every field, checked before anything is queued
+        answers = {'living_space': 'apartment', 'activity_level': 'high',
+                   'maintenance_level': 'medium', 'budget': 'high', 'pet_type': 'dog'}
+        for bad in ('x', ['dog'], {'pet_type': 'dog'}, dict(answers, budget=3),
+                    dict(answers, pet_type=None), dict(answers, living_space={'a': 'b'})):
+            with self.subTest(answers=bad):
+                response = self.app.post('/api/questionnaire', headers=self.auth(),
+                                         json={'username': 'testuser', 'answers': bad})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.get_json())
+        response = self.app.post('/api/questionnaire', headers=self.admin,
+                                 json={'username': ['testuser'], 'answers': answers})
+        self.assertEqual(response.status_code, 400)
+
+    def test_group_commit(self):
+        """Test that concurrent questionnaire submissions are committed in batches.
+        ---
+        tags:
+          - tests
+        description: One transaction carries several submissions; a bad one fails alone and unknown users get a 404
+        """
+        answers = {
+            'living_space': 'house',
+            'activity_level': 'high',
+            'maintenance_level': 'low',
+            'budget': 'medium',
+            'pet_type': 'dog'
+        }
+        settings = questionnaire_writer.stats()
+        self.addCleanup(questionnaire_writer.configure,
+                        settings['batch_size'], settings['max_wait_ms'])
+        questionnaire_writer.configure(64, 200.0)
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany("INSERT INTO users (username, password) VALUES (?, 'x')",
+                         [(f'walker{i}',) for i in range(4)])
+        conn.commit()
+        conn.close()
+        statuses = []
+
+        def post(username, submitted):
+            response = app.test_client().post('/api/questionnaire', headers=self.auth(username),
+                                              json={'username': username, 'answers': submitted})
+            statuses.append(response.status_code)
+
+        def write(username, submitted):
+            # straight to the writer: the route turns these answers away with a 400
+            try:
+                questionnaire_writer.submit((username, submitted))
+                statuses.append(200)
+            except sqlite3.Error:
+                statuses.append(500)
+
+        def submit_all(submissions, submit=post):
+            threads = [threading.Thread(target=submit, args=submission)
+                       for submission in submissions]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        submit_all([(f'walker{i % 3}', answers) for i in range(6)])
+        self.assertEqual(statuses, [200] * 6)
+        stats = questionnaire_writer.stats()
+        self.assertLess(stats['batches'] - settings['batches'], 6)
+        self.assertEqual(stats['items'] - settings['items'], 6)
+
+        statuses.clear()
+        submit_all([('walker0', dict(answers, budget={'not': 'a string'})), ('walker3', answers)],
+                   submit=write)
+        self.assertEqual(sorted(statuses), [200, 500])
+        conn = sqlite3.connect(self.db_path)
+        users = conn.execute("SELECT username FROM users WHERE username LIKE 'walker%'"
+                             " ORDER BY username").fetchall()
+        count, = conn.execute("SELECT COUNT(*) FROM questionnaire_answers"
+                              " WHERE username LIKE 'walker%'").fetchone()
+        conn.close()
+        self.assertEqual(users, [('walker0',), ('walker1',), ('walker2',), ('walker3',)])
+        self.assertEqual(count, 7)
+        # an unknown username is refused, not given an account
+        unknown = self.app.post('/api/questionnaire', headers=self.auth('walker9'),
+                                json={'username': 'walker9', 'answers': answers})
+        self.assertEqual(unknown.status_code, 404)
+        conn = sqlite3.connect(self.db_path)
+        self.assertIsNone(conn.execute("SELECT 1 FROM users WHERE username = 'walker9'").fetchone())
+        conn.close()
+        self.assertIn('questionnaire', self.app.get('/api/admin/writes', headers=self.admin).get_json())
+
+    def test_pending_questionnaire_suggestions(self):
+        """Test that pending questionnaires come with ranked pet suggestions.
+        ---
+        tags:
+          - tests
+        description: A high-energy dog questionnaire ranks Max first; new pets are picked up incrementally
+        """
+        self.app.post('/api/questionnaire', headers=self.auth(), json={
+            'username': 'testuser',
+            'answers': {
+                'living_space': 'any',
+                'activity_level': 'high',
+                'maintenance_level': 'medium',
+                'budget': 'high',
+                'pet_type': 'dog'
+            }
+        })
+        pending = self.app.get('/api/admin/questionnaires', headers=self.admin).get_json()
+        suggested = [p['id'] for p in pending[0]['suggested_pets']]
+        self.assertEqual(suggested, [1, 4, 3])
+        self.assertEqual(pending[0]['suggested_pets'][0]['score'], 1.0)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""INSERT INTO pets (name, type, size, activity_level, maintenance_level, budget)
+                        VALUES ('Rex', 'dog', 'small', 'high', 'medium', 'low')""")
+        conn.commit()
+        conn.close()
+        catalog_cache.invalidate(6)
+        pending = self.app.get('/api/admin/questionnaires?suggest=2', headers=self.admin).get_json()
+        self.assertEqual([p['id'] for p in pending[0]['suggested_pets']], [1, 6])
+
+    def test_bulk_review_questionnaires(self):
+        """Test approving and rejecting several questionnaires in one call.
+        ---
+        tags:
+          - tests
+        description: Valid decisions apply together; bad, duplicate and processed items get their own outcome
+        """
+        answers = {
+            'living_space': 'apartment',
+            'activity_level': 'low',
+            'maintenance_level': 'low',
+            'budget': 'medium',
+            'pet_type': 'cat'
+        }
+        for _ in range(3):
+            self.app.post('/api/questionnaire', headers=self.auth(),
+                          json={'username': 'testuser', 'answers': answers})
+        response = self.app.post('/api/admin/questionnaires/bulk', headers=self.admin, json={
+            'approve': [{'questionnaire_id': 1, 'pet_ids': [2, 5]}, {'questionnaire_id': 2}],
+            'reject': [3, 1, 99]
+        })
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual((body['approved'], body['rejected']), (1, 1))
+        self.assertEqual(
+            [r['status'] for r in body['results']],
+            ['APPROVED', 'invalid', 'REJECTED', 'duplicate', 'not_found']
+        )
+        recommendations = self.app.get('/api/questionnaire/testuser', headers=self.auth()).get_json()
+        self.assertEqual(recommendations['status'], 'REJECTED')
+        again = self.app.post('/api/admin/questionnaires/bulk', headers=self.admin, json={'reject': [1]}).get_json()
+        self.assertEqual(again['results'][0]['status'], 'not_found')
+        # booleans are not ids, though Python counts True as 1
+        booleans = self.app.post('/api/admin/questionnaires/bulk', headers=self.admin, json={
+            'approve': [{'questionnaire_id': 2, 'pet_ids': [True]}], 'reject': [True, False]
+        }).get_json()
+        self.assertEqual([r['status'] for r in booleans['results']], ['invalid'] * 3)
+        # the single-questionnaire route checks pet_ids the same way
+        for body in (None, [2], {}, {'pet_ids': []}, {'pet_ids': 2}, {'pet_ids': [True]},
+                     {'pet_ids': ['2']}, {'pet_ids': [2, None]}):
+            with self.subTest(body=body):
+                response = self.app.post('/api/admin/questionnaires/2/approve',
+                                         headers=self.admin, json=body)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.get_json())
+        response = self.app.post('/api/admin/questionnaires/2/approve',
+                                 headers=self.admin, json={'pet_ids': [2]})
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_dashboard(self):
+        """Test the single-call user dashboard aggregate.
+        ---
+        tags:
+          - tests
+        description: Questionnaire state and adoptions with embedded pets come back together
+        """
+        response = self.app.get('/api/users/testuser/dashboard', headers=self.auth())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['questionnaire'], None)
+        self.app.post('/api/questionnaire', headers=self.auth(), json={
+            'username': 'testuser',
+            'answers': {
+                'living_space': 'apartment',
+                'activity_level': 'low',
+                'maintenance_level': 'low',
+                'budget': 'medium',
+                'pet_type': 'cat'
+            }
+        })
+        self.app.post('/api/admin/questionnaires/1/approve', headers=self.admin, json={'pet_ids': [2]})
+        self.app.post('/api/admin/adoptions', headers=self.auth(), json={'pet_id': 2, 'username': 'testuser'})
+        body = self.app.get('/api/users/testuser/dashboard', headers=self.auth()).get_json()
+        self.assertEqual(body['questionnaire']['status'], 'APPROVED')
+        self.assertEqual([p['name'] for p in body['questionnaire']['recommendations']], ['Bella'])
+        self.assertEqual(len(body['adoptions']), 1)
+        self.assertEqual(body['adoptions'][0]['status'], 'PENDING')
+        self.assertEqual(body['adoptions'][0]['pet']['name'], 'Bella')
+
+    def test_admin_queue(self):
+        """Test the paginated admin queue with status filters and counts.
+        ---
+        tags:
+          - tests
+        description: Pending items come oldest first with a cursor; closed adoptions only when asked
+        """
+        answers = {
+            'living_space': 'apartment',
+            'activity_level': 'high',
+            'maintenance_level': 'medium',
+            'budget': 'high',
+            'pet_type': 'dog'
+        }
+        for _ in range(3):
+            self.app.post('/api/questionnaire', headers=self.auth(),
+                          json={'username': 'testuser', 'answers': answers})
+        self.app.post('/api/admin/questionnaires/3/reject', headers=self.admin)
+        for pet_id in (1, 2):
+            self.app.post('/api/admin/adoptions', headers=self.auth(), json={'pet_id': pet_id, 'username': 'testuser'})
+        self.app.post('/api/admin/adoptions/1/approve', headers=self.admin)
+
+        body = self.app.get('/api/admin/queue?limit=1', headers=self.admin).get_json()
+        questionnaires, adoptions = body['questionnaires'], body['adoptions']
+        self.assertEqual([q['id'] for q in questionnaires['items']], [1])
+        self.assertEqual(questionnaires['next_after_id'], 1)
+        self.assertIn('suggested_pets', questionnaires['items'][0])
+        self.assertEqual(questionnaires['counts'], {'PENDING': 2, 'APPROVED': 0, 'REJECTED': 1})
+        self.assertEqual([a['request_id'] for a in adoptions['items']], [2])
+        self.assertEqual(adoptions['counts'], {'PENDING': 1, 'APPROVE': 1, 'REJECT': 0})
+
+        body = self.app.get('/api/admin/queue?limit=1&questionnaire_after_id=1', headers=self.admin).get_json()
+        self.assertEqual([q['id'] for q in body['questionnaires']['items']], [2])
+        self.assertIsNone(body['questionnaires']['next_after_id'])
+        body = self.app.get('/api/admin/queue?adoption_status=ALL', headers=self.admin).get_json()
+        self.assertEqual([a['request_id'] for a in body['adoptions']['items']], [1, 2])
+        self.assertEqual(self.app.get('/api/admin/queue?adoption_status=OPEN', headers=self.admin).status_code, 400)
+        for query, name in (('limit=abc', 'limit'), ('limit=0', 'limit'), ('limit=501', 'limit'),
+                            ('suggest=1.5', 'suggest'), ('suggest=-1', 'suggest'),
+                            ('questionnaire_after_id=x', 'questionnaire_after_id'),
+                            ('adoption_after_id=99999999999999999999', 'adoption_after_id')):
+            with self.subTest(query=query):
+                response = self.app.get(f'/api/admin/queue?{query}', headers=self.admin)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.get_json()['error'].split(' must be ')[0], name)
+
+    def test_create_adoption_idempotent(self):
+        """Test that repeated adoption submissions return the open request.
+        ---
+        tags:
+          - tests
+        description: One PENDING request per user and pet; Idempotency-Key replays the original
+        """
+        response = self.app.post('/api/admin/adoptions', headers=self.auth(), json={'pet_id': 1, 'username': 'testuser'})
+        self.assertEqual(response.status_code, 201)
+        created = response.get_json()
+        self.assertEqual((created['pet_name'], created['status']), ('Max', 'PENDING'))
+        self.assertNotIn('Idempotent-Replayed', response.headers)
+        response = self.app.post('/api/admin/adoptions', headers=self.auth(), json={'pet_id': 1, 'username': 'testuser'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(response.get_json(), created)
+        # once decided, the user may ask again
+        self.app.post(f"/api/admin/adoptions/{created['request_id']}/reject", headers=self.admin)
+        response = self.app.post('/api/admin/adoptions', headers=self.auth(), json={'pet_id': 1, 'username': 'testuser'})
+        self.assertEqual(response.status_code, 201)
+
+        keyed = {**self.auth(), 'Idempotency-Key': 'order-7'}
+        response = self.app.post('/api/admin/adoptions', headers=keyed,
+                                 json={'pet_id': 2, 'username': 'testuser'})
+        self.assertEqual(response.status_code, 201)
+        first = response.get_json()
+        self.app.post(f"/api/admin/adoptions/{first['request_id']}/approve", headers=self.admin)
+        response = self.app.post('/api/admin/adoptions', headers=keyed,
+                                 json={'pet_id': 2, 'username': 'testuser'})
+        self.assertEqual((response.status_code, response.get_json()['request_id']),
+                         (200, first['request_id']))
+        response = self.app.post('/api/admin/adoptions', headers=keyed,
+                                 json={'pet_id': 3, 'username': 'testuser'})
+        self.assertEqual(response.status_code, 422)
+        response = self.app.post('/api/admin/adoptions', headers=self.auth(), json={'pet_id': 999, 'username': 'testuser'})
+        self.assertEqual(response.status_code, 404)
+        response = self.app.post('/api/admin/adoptions', headers=self.auth(), json={'username': 'testuser'})
+        self.assertEqual(response.status_code, 400)
+        for pet_id in (True, [1], '1', 0, -2, 1.0):
+            with self.subTest(pet_id=pet_id):
+                response = self.app.post('/api/admin/adoptions', headers=self.auth(),
+                                         json={'pet_id': pet_id, 'username': 'testuser'})
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.app.post('/api/admin/adoptions', headers=self.auth(),
+                                       json=[1]).status_code, 400)
+        conn = sqlite3.connect(self.db_path)
+        count, = conn.execute("SELECT COUNT(*) FROM adoptions").fetchone()
+        conn.close()
+        self.assertEqual(count, 3)
 
     def test_admin_login(self):
         """Test admin login endpoint.
@@ -165,5 +471,173 @@ class TestAPI(unittest.TestCase):
         })
         self.assertEqual(response.status_code, 200)
 
+    def test_credentials_must_be_strings(self):
+        """Test that non-string credentials are a client error.
+        ---
+        tags:
+          - tests
+        description: Numbers, lists or objects as username or password, missing fields and non-object bodies get a 400 from login, register and admin login
+        """
+        for path in ('/api/login', '/api/register', '/api/admin/login'):
+            for body in ({'username': 'testuser', 'password': 12345678},
+                         {'username': 'testuser', 'password': ['password123']},
+                         {'username': {'name': 'admin'}, 'password': 'admin123'}):
+                with self.subTest(path=path, body=body):
+                    self.assertEqual(self.app.post(path, json=body).status_code, 400)
+        self.assertEqual(self.app.post('/api/login', json={'username': 'testuser'}).status_code, 400)
+        for path in ('/api/login', '/api/register', '/api/admin/login'):
+            for body in ({}, {'username': 'admin'}, [1], 'x'):
+                with self.subTest(path=path, body=body):
+                    response = self.app.post(path, json=body)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('error', response.get_json())
+
+    def test_password_rehash(self):
+        """Test bcrypt storage and upgrade of legacy and low-cost passwords.
+        ---
+        tags:
+          - tests
+        description: Seeded plaintext passwords are rehashed on login, hashes below the current cost are upgraded
+        """
+        def stored(table, username):
+            conn = sqlite3.connect(self.db_path)
+            try:
+                return conn.execute(
+                    f"SELECT password FROM {table} WHERE username = ?", (username,)
+                ).fetchone()[0]
+            finally:
+                conn.close()
+
+        self.assertEqual(stored('users', 'testuser'), 'password123')
+        response = self.app.post('/api/login', json={
+            'username': 'testuser', 'password': 'wrong'
+        })
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(stored('users', 'testuser'), 'password123')
+        response = self.app.post('/api/login', json={
+            'username': 'testuser', 'password': 'password123'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(stored('users', 'testuser').startswith('$2b$04$'))
+
+        self.app.post('/api/register', json={'username': 'hashed', 'password': 'pw'})
+        self.assertTrue(stored('users', 'hashed').startswith('$2b$04$'))
+
+        response = self.app.post('/api/admin/login', json={
+            'username': 'admin', 'password': 'admin123'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(stored('admins', 'admin').startswith('$2b$04$'))
+        password_hasher.cost = 5
+        try:
+            response = self.app.post('/api/admin/login', json={
+                'username': 'admin', 'password': 'admin123'
+            })
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(stored('admins', 'admin').startswith('$2b$05$'))
+        finally:
+            password_hasher.cost = 4
+        stats = self.app.get('/api/admin/passwords', headers=self.admin).get_json()
+        self.assertGreater(stats['jobs'], 0)
+        self.assertEqual(stats['queue_depth'], 0)
+
+    def test_access_tokens(self):
+        """Test bearer tokens on user-scoped routes and logout revocation.
+        ---
+        tags:
+          - tests
+        description: Login issues a token that only opens the owner's routes until it is revoked; admin routes need an admin token
+        """
+        token = self.app.post('/api/login', json={
+            'username': 'testuser', 'password': 'password123'
+        }).get_json()['token']
+        headers = {'Authorization': f'Bearer {token}'}
+        self.assertEqual(self.app.get('/api/adoptions/testuser').status_code, 401)
+        self.assertEqual(self.app.get('/api/adoptions/testuser', headers=headers).status_code, 200)
+        self.assertEqual(self.app.get('/api/adoptions/someone', headers=headers).status_code, 403)
+        forged = {'Authorization': f'Bearer {token[:-2]}xx'}
+        self.assertEqual(self.app.get('/api/adoptions/testuser', headers=forged).status_code, 401)
+        admin_token = self.app.post('/api/admin/login', json={
+            'username': 'admin', 'password': 'admin123'
+        }).get_json()['token']
+        admin_headers = {'Authorization': f'Bearer {admin_token}'}
+        self.assertEqual(
+            self.app.get('/api/adoptions/someone', headers=admin_headers).status_code, 200
+        )
+        # admin routes want an admin token; users only file adoption requests for themselves
+        self.assertEqual(self.app.get('/api/admin/queue').status_code, 401)
+        self.assertEqual(self.app.get('/api/admin/queue', headers=headers).status_code, 403)
+        self.assertEqual(self.app.post('/api/admin/questionnaires/bulk', headers=headers,
+                                       json={'reject': [1]}).status_code, 403)
+        self.assertEqual(self.app.get('/api/admin/queue', headers=admin_headers).status_code, 200)
+        self.assertEqual(self.app.post('/api/admin/adoptions', headers=headers, json={
+            'pet_id': 1, 'username': 'someone'}).status_code, 403)
+        self.assertEqual(self.app.post('/api/admin/adoptions', headers=admin_headers, json={
+            'pet_id': 1, 'username': 'someone'}).status_code, 201)
+        self.assertEqual(self.app.post('/api/logout', headers=headers).status_code, 200)
+        self.assertEqual(self.app.get('/api/adoptions/testuser', headers=headers).status_code, 401)
+
+    def test_create_app(self):
+        """Test the app factory and environment-driven configuration.
+        ---
+        tags:
+          - tests
+        description: Environment strings are coerced to the setting's type and toggles switch features off
+        """
+        config = load_config({'PORT': 8000}, environ={'WORKERS': '3', 'ENABLE_CORS': 'false'})
+        self.assertEqual((config['WORKERS'], config['ENABLE_CORS'], config['PORT']), (3, False, 8000))
+        plain = create_app({'ENABLE_SWAGGER': False, 'ENABLE_CORS': False}).test_client()
+        self.assertEqual(plain.get('/apidocs/').status_code, 404)
+        response = plain.get('/api/pets/1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Access-Control-Allow-Origin', response.headers)
+        self.assertEqual(self.app.get('/apidocs/').status_code, 200)
+
+    def test_lazy_api_docs(self):
+        """Test that the API spec is generated on demand and cached on disk.
+        ---
+        tags:
+          - tests
+        description: The first spec request writes the cache; a new app serves the cached file
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            client = create_app({'SWAGGER_CACHE_DIR': cache_dir}).test_client()
+            response = client.get('/apispec_1.json')
+            self.assertEqual(response.status_code, 200)
+            spec = response.get_json()
+            self.assertIn('/api/login', spec['paths'])
+            # every schema a docstring $refs is defined in the spec
+            refs = set()
+            for name in glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py')):
+                with open(name, encoding='utf-8') as source:
+                    refs.update(re.findall(r"\$ref: '#/definitions/(\w+)'", source.read()))
+            self.assertIn('Pet', refs)
+            self.assertLessEqual(refs, set(spec['definitions']))
+            cached = os.listdir(cache_dir)
+            self.assertEqual(len(cached), 1)
+            with open(os.path.join(cache_dir, cached[0]), 'w', encoding='utf-8') as f:
+                f.write('{"cached": true}')
+            client = create_app({'SWAGGER_CACHE_DIR': cache_dir}).test_client()
+            self.assertEqual(client.get('/apispec_1.json').get_json(), {'cached': True})
+
+    def test_connection_pool_reuse(self):
+        """Test that requests reuse pooled connections.
+        ---
+        tags:
+          - tests
+        description: Sequential requests should share one pragma-tuned connection
+        """
+        for _ in range(5):
+            self.assertEqual(self.app.get('/api/pets/1').status_code, 200)
+        pool = get_pool()
+        # 'open' counts pooled connections only: the events poller's own connect() is not one
+        self.assertEqual(pool.stats()['open'], 1)
+        conn = pool.acquire()
+        try:
+            mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+            self.assertEqual(mode.lower(), 'wal')
+        finally:
+            pool.release(conn)
+
 if __name__ == '__main__':
     unittest.main()
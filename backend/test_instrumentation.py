@@ -0,0 +1,96 @@
+# pylint: disable=C0114,C0115,C0116,C0301,C0303,C0304
+import unittest
+import json
+import os
+import re
+import tempfile
+from main import app
+from init_db import get_db_connection
+from metrics import request_metrics
+from query_stats import query_stats, fingerprint
+
+from test_apis import APITestCase
+
+class TestInstrumentation(APITestCase):
+    """Test suite for request metrics and query statistics.
+    ---
+    tags:
+      - tests
+    """
+    def test_metrics(self):
+        """Test the Prometheus metrics endpoint.
+        ---
+        tags:
+          - tests
+        description: Requests are counted per route template and other workers' totals are merged in
+        """
+        for pet_id in (1, 2, 3):
+            self.assertEqual(self.app.get(f'/api/pets/{pet_id}').status_code, 200)
+        self.assertEqual(self.app.get('/api/pets/9999').status_code, 404)
+        response = self.app.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        text = response.get_data(as_text=True)
+        pets_route = 'method="GET",route="/api/pets/<int:pet_id>"'
+        count = re.search(r'http_request_duration_seconds_count\{%s,status="200"\} (\d+)' % pets_route, text)
+        self.assertGreaterEqual(int(count.group(1)), 3)   # counts accumulate across tests
+        self.assertIn(f'http_request_duration_seconds_count{{{pets_route},status="404"}}', text)
+        self.assertIn(f'http_request_db_seconds_bucket{{{pets_route},le="+Inf"}}', text)
+        self.assertIn('http_requests_in_flight{route="/metrics"} 1', text)
+        with tempfile.TemporaryDirectory() as metrics_dir:
+            # a worker that has exited: its counts stay, its in-flight gauge goes
+            other = {'pid': 2 ** 22 + 1, 'series': [
+                ['http_request_duration_seconds', [['method', 'GET'], ['route', '/api/test'], ['status', '200']],
+                 [5] + [0] * 13 + [0.004]],
+                ['http_requests_in_flight', [['route', '/api/test']], 2],
+            ]}
+            with open(os.path.join(metrics_dir, 'other.json'), 'w', encoding='utf-8') as f:
+                json.dump(other, f)
+            request_metrics.configure(metrics_dir)
+            try:
+                text = self.app.get('/metrics').get_data(as_text=True)
+            finally:
+                request_metrics.configure('')
+            self.assertIn('http_request_duration_seconds_count{method="GET",route="/api/test",status="200"} 5', text)
+            self.assertNotIn('http_requests_in_flight{route="/api/test"}', text)
+            self.assertTrue(os.path.exists(os.path.join(metrics_dir, f'{os.getpid()}.json')))
+
+    def test_query_stats(self):
+        """Test SQL fingerprinting, the slow-query log and N+1 detection.
+        ---
+        tags:
+          - tests
+        description: Statements are grouped per fingerprint and route, slow and repeated ones are logged
+        """
+        self.assertEqual(
+            fingerprint("SELECT *\n  FROM pets -- all\n WHERE id IN (1, 2, 3) AND name = 'it''s'"),
+            'SELECT * FROM pets WHERE id IN (?, ...) AND name = ?')
+        self.assertEqual(fingerprint('INSERT INTO t VALUES (?, ?), (?, ?), (?, ?)'),
+                         'INSERT INTO t VALUES (?, ...), ...')
+        query_stats.reset()
+        for pet_id in (1, 2, 3):
+            self.assertEqual(self.app.get(f'/api/pets/{pet_id}').status_code, 200)
+        report = self.app.get('/api/admin/queries?order_by=count', headers=self.admin).get_json()
+        pet_queries = [q for q in report['top'] if q['route'] == '/api/pets/<int:pet_id>']
+        self.assertTrue(pet_queries)
+        self.assertEqual(pet_queries[0]['count'], 3)
+        self.assertIn('?', pet_queries[0]['fingerprint'])
+        self.assertEqual(self.app.get('/api/admin/queries?order_by=rows', headers=self.admin).status_code, 400)
+
+        with app.test_request_context('/api/pets/1'):
+            conn = get_db_connection()
+            with self.assertLogs('query_stats', 'WARNING') as logs:
+                for pet_id in range(1, query_stats.repeat_threshold + 1):
+                    conn.execute('SELECT name FROM pets WHERE id = ?', (pet_id,)).fetchone()
+            self.assertIn('N+1 query', logs.output[0])
+            slow_ms = query_stats.slow_seconds * 1000
+            query_stats.configure(0, query_stats.repeat_threshold)
+            try:
+                with self.assertLogs('slow_query', 'WARNING'):
+                    conn.execute('SELECT count(*) FROM pets').fetchall()
+            finally:
+                query_stats.configure(slow_ms, query_stats.repeat_threshold)
+        self.assertTrue(query_stats.slow_queries())
+
+if __name__ == '__main__':
+    unittest.main()
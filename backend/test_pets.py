@@ -0,0 +1,295 @@
+# pylint: disable=C0114,C0115,C0116,C0301,C0303,C0304
+import unittest
+import json
+import sqlite3
+import zlib
+from unittest.mock import patch
+from flask import Flask, Response
+from init_db import get_pool
+from seed_db import generate_data
+from pet_cache import catalog_cache
+from serializers import COLUMNS_MIMETYPE, ENCODERS, row_serializer
+from response_compression import ResponseCompressor, response_compressor
+
+from test_apis import APITestCase
+
+class TestPets(APITestCase):
+    """Test suite for the pet catalog endpoints.
+    ---
+    tags:
+      - tests
+    """
+    def test_get_pets(self):
+        """Test get all pets endpoint.
+        ---
+        tags:
+          - tests
+        description: Test retrieving all pets
+        responses:
+            200:
+                description: List of pets retrieved successfully
+        """
+        response = self.app.get('/api/pets')
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_pets_paginated(self):
+        """Test keyset pagination, filters and field projection on /api/pets.
+        ---
+        tags:
+          - tests
+        description: Page through the seeded dogs two at a time with a projected column list
+        """
+        response = self.app.get('/api/pets?type=dog&limit=2&fields=name')
+        self.assertEqual(response.status_code, 200)
+        first = response.get_json()
+        self.assertEqual([set(p) for p in first], [{'id', 'name'}] * 2)
+        cursor = response.headers['X-Next-After-Id']
+        response = self.app.get(f'/api/pets?type=dog&limit=2&fields=name&after_id={cursor}')
+        second = response.get_json()
+        self.assertEqual(len(second), 1)
+        self.assertNotIn('X-Next-After-Id', response.headers)
+        self.assertEqual([p['name'] for p in first + second], ['Max', 'Charlie', 'Lucy'])
+        self.assertEqual(self.app.get('/api/pets?fields=owner').status_code, 400)
+        self.assertEqual(self.app.get('/api/pets?limit=0').status_code, 400)
+
+    def test_pet_cache_etag(self):
+        """Test cached pet responses and If-None-Match revalidation.
+        ---
+        tags:
+          - tests
+        description: A repeat request is a cache hit and a matching ETag yields 304 until the catalog changes
+        """
+        first = self.app.get('/api/pets/1')
+        etag = first.headers['ETag']
+        before = catalog_cache.stats()
+        again = self.app.get('/api/pets/1')
+        self.assertEqual(again.get_json(), first.get_json())
+        self.assertEqual(catalog_cache.stats()['hits'], before['hits'] + 1)
+        revalidated = self.app.get('/api/pets/1', headers={'If-None-Match': etag})
+        self.assertEqual(revalidated.status_code, 304)
+        catalog_cache.invalidate()
+        changed = self.app.get('/api/pets/1', headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+        # these two queries' cache keys share a CRC-32; their ETags must still differ
+        page = self.app.get('/api/pets?after_id=394&limit=8')
+        other = self.app.get('/api/pets?after_id=15040&limit=230',
+                             headers={'If-None-Match': page.headers['ETag']})
+        self.assertEqual(other.status_code, 200)
+        self.assertIn('evictions', self.app.get('/api/admin/cache', headers=self.admin).get_json())
+
+    def test_search_pets(self):
+        """Test full-text pet search with prefixes, ranking and pagination.
+        ---
+        tags:
+          - tests
+        description: Prefix words are ANDed, name hits rank first, pages follow X-Next-Offset and the index tracks writes
+        """
+        response = self.app.get('/api/pets/search?q=bel')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['name'] for p in response.get_json()], ['Bella'])
+        self.assertEqual(response.headers['X-Search-Order'], 'rank')
+        dogs = self.app.get('/api/pets/search?q=Dog+MED').get_json()
+        self.assertEqual(sorted(p['name'] for p in dogs), ['Charlie', 'Lucy', 'Max'])
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""INSERT INTO pets (name, type, size, activity_level, maintenance_level, budget)
+                        VALUES ('Large Marge', 'cat', 'small', 'low', 'low', 'low')""")
+        conn.commit()
+        catalog_cache.invalidate(6)
+        # the name hit outranks Charlie's size
+        large = self.app.get('/api/pets/search?q=large').get_json()
+        self.assertEqual([p['name'] for p in large], ['Large Marge', 'Charlie'])
+        first = self.app.get('/api/pets/search?q=large&limit=1')
+        self.assertEqual(first.headers['X-Next-Offset'], '1')
+        second = self.app.get('/api/pets/search?q=large&limit=1&offset=1')
+        self.assertEqual(first.get_json() + second.get_json(), large)
+        self.assertNotIn('X-Next-Offset', second.headers)
+        conn.execute("UPDATE pets SET name = 'Marge' WHERE id = 6")
+        conn.execute("DELETE FROM pets WHERE id = 3")
+        conn.commit()
+        conn.close()
+        catalog_cache.invalidate()
+        self.assertEqual(self.app.get('/api/pets/search?q=large').get_json(), [])
+        self.assertEqual(len(self.app.get('/api/pets/search?q=marge').get_json()), 1)
+        with patch('pets.SEARCH_RANK_LIMIT', 1):
+            response = self.app.get('/api/pets/search?q=dog')
+        self.assertEqual(response.headers['X-Search-Order'], 'id')
+        self.assertEqual([p['id'] for p in response.get_json()], [1, 4])
+        self.assertEqual(self.app.get('/api/pets/search?q=+%22*').status_code, 400)
+        self.assertEqual(self.app.get('/api/pets/search?q=max&limit=0').status_code, 400)
+
+    def test_streamed_lists(self):
+        """Test that large list responses stream and small ones do not.
+        ---
+        tags:
+          - tests
+        description: Lists longer than one chunk are sent without Content-Length and hold no pooled connection between chunks; a pets list is cached once sent in full
+        """
+        generate_data(self.db_path, {'pets': 1500, 'users': 20, 'adoptions': 1500}, seed=3)
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        expected = {
+            '/api/pets': [dict(r) for r in conn.execute("SELECT * FROM pets ORDER BY id")],
+            '/api/admin/adoptions': [dict(r) for r in
+                                     conn.execute("SELECT * FROM adoptions ORDER BY request_id")],
+        }
+        conn.close()
+        bodies = {}
+        for path, rows in expected.items():
+            response = self.app.get(path, headers=self.admin)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('Content-Length', response.headers)
+            chunks = iter(response.response)
+            body = next(chunks)
+            # a client that stops reading mid-body holds no connection
+            stats = get_pool().stats()
+            self.assertEqual(stats['idle'], stats['open'])
+            bodies[path] = body + b''.join(chunks)
+            self.assertEqual(json.loads(bodies[path]), rows)
+            response.close()
+        # the full pets list was kept once sent, and replays byte for byte
+        self.assertEqual(catalog_cache.stats()['list_entries'], 1)
+        replay = self.app.get('/api/pets')
+        self.assertEqual(replay.get_data(), bodies['/api/pets'])
+        self.assertIn('Content-Length', replay.headers)
+        self.assertEqual(self.app.get('/api/pets', headers={
+            'If-None-Match': replay.headers['ETag']}).status_code, 304)
+        # a write while the body is being sent keeps the stale body out of the cache
+        catalog_cache.invalidate()
+        response = self.app.get('/api/pets?fields=name')
+        chunks = iter(response.response)
+        next(chunks)
+        catalog_cache.invalidate()
+        b''.join(chunks)
+        response.close()
+        self.assertEqual(catalog_cache.stats()['list_entries'], 0)
+        columns = self.app.get('/api/admin/adoptions?format=columns', headers=self.admin)
+        body = json.loads(columns.get_data())
+        columns.close()
+        self.assertEqual([dict(zip(body['columns'], row)) for row in body['rows']],
+                         expected['/api/admin/adoptions'])
+        stats = get_pool().stats()
+        self.assertEqual(stats['idle'], stats['open'])
+        small = self.app.get('/api/adoptions/testuser', headers=self.auth())
+        self.assertEqual(small.get_json(), [])
+        self.assertEqual(small.headers['Content-Length'], '3')
+        self.assertIn('Content-Length', self.app.get('/api/pets?limit=500').headers)
+
+    def test_list_formats(self):
+        """Test the columnar list format and the pluggable JSON encoder.
+        ---
+        tags:
+          - tests
+        description: format=columns or the columns media type returns {columns, rows}; every encoder writes the same data
+        """
+        objects = self.app.get('/api/pets?limit=3')
+        self.assertEqual(objects.mimetype, 'application/json')
+        self.assertIn('Accept', objects.headers['Vary'])
+        response = self.app.get('/api/pets?limit=3&fields=name,type&format=columns')
+        self.assertEqual(response.mimetype, COLUMNS_MIMETYPE)
+        self.assertEqual(response.get_json(), {
+            'columns': ['id', 'name', 'type'],
+            'rows': [[1, 'Max', 'dog'], [2, 'Bella', 'cat'], [3, 'Charlie', 'dog']],
+        })
+        self.assertEqual(response.headers['X-Next-After-Id'], '3')
+        # cached per format: the second request replays the columns body
+        negotiated = self.app.get('/api/pets?limit=3&fields=name,type',
+                                  headers={'Accept': COLUMNS_MIMETYPE})
+        self.assertEqual(negotiated.get_data(), response.get_data())
+        self.assertEqual(negotiated.mimetype, COLUMNS_MIMETYPE)
+        search = self.app.get('/api/pets/search?q=dog&format=columns').get_json()
+        self.assertEqual(len(search['rows']), 3)
+        self.assertEqual(self.app.get('/api/pets?format=xml').status_code, 400)
+        self.assertEqual(self.app.get('/api/admin/adoptions?format=xml', headers=self.admin).status_code, 400)
+        bodies = []
+        try:
+            for encoder in sorted(ENCODERS):
+                row_serializer.configure(encoder)
+                catalog_cache.invalidate()
+                bodies.append(self.app.get('/api/pets').get_json())
+        finally:
+            row_serializer.configure('auto')
+        self.assertEqual(bodies[0][:3], objects.get_json())
+        self.assertTrue(all(body == bodies[0] for body in bodies))
+        self.assertRaises(ValueError, row_serializer.configure, 'pickle')
+
+    def test_compression(self):
+        """Test negotiated response compression.
+        ---
+        tags:
+          - tests
+        description: Large bodies are gzip or deflate encoded per Accept-Encoding, cacheable ones are compressed once, streams are compressed as they go and small bodies are left alone
+        """
+        generate_data(self.db_path, {'pets': 1500}, seed=5)
+        plain = self.app.get('/api/pets?limit=500')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertIn('Accept-Encoding', plain.headers['Vary'])
+        before = response_compressor.stats()
+        gzipped = self.app.get('/api/pets?limit=500', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(gzipped.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(zlib.decompress(gzipped.get_data(), 31), plain.get_data())
+        etag, weak = gzipped.get_etag()
+        self.assertTrue(weak)
+        again = self.app.get('/api/pets?limit=500', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(again.get_data(), gzipped.get_data())
+        self.assertEqual(response_compressor.stats()['cache_hits'], before['cache_hits'] + 1)
+        revalidated = self.app.get('/api/pets?limit=500', headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': f'W/"{etag}"'})
+        self.assertEqual(revalidated.status_code, 304)
+        deflated = self.app.get('/api/pets?limit=500',
+                                headers={'Accept-Encoding': 'gzip;q=0.5, deflate'})
+        self.assertEqual(deflated.headers['Content-Encoding'], 'deflate')
+        self.assertEqual(zlib.decompress(deflated.get_data()), plain.get_data())
+        streamed = self.app.get('/api/pets', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Length', streamed.headers)
+        self.assertEqual(len(json.loads(zlib.decompress(streamed.get_data(), 31))), 1505)
+        streamed.close()
+        stats = get_pool().stats()
+        self.assertEqual(stats['idle'], stats['open'])
+        small = self.app.get('/api/pets/1', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', small.headers)
+        gzip_stats = self.app.get('/api/admin/compression', headers=self.admin).get_json()['compressed']['gzip']
+        self.assertGreater(gzip_stats['ratio'], 5)
+        self.assertIn('http_compression_output_bytes_total{encoding="gzip"',
+                      self.app.get('/metrics').get_data(as_text=True))
+
+    def test_compressor_on_other_app(self):
+        """Test the compressor's caching and streaming on a bare Flask app.
+        ---
+        tags:
+          - tests
+        description: Equal ETags on two paths keep two bodies, and each streamed chunk is decodable as soon as it is sent
+        """
+        # an ETag is only unique per resource: equal tags on two paths keep two bodies
+        other = Flask(__name__)
+        ResponseCompressor().instrument(other)
+        for path in ('/a', '/b'):
+            other.add_url_rule(path, path, lambda path=path: Response(
+                path * 1024, mimetype='text/plain', headers={'ETag': '"same"'}))
+        parts = (b'[{"id": 1}', b', {"id": 2}', b']')
+        produced = []
+
+        def produce():
+            for part in parts:
+                produced.append(part)
+                yield part
+        other.add_url_rule('/stream', 'stream', lambda: Response(produce(), mimetype='application/json'))
+        client = other.test_client()
+        for path in ('/a', '/b', '/a'):
+            body = client.get(path, headers={'Accept-Encoding': 'gzip'}).get_data()
+            self.assertEqual(zlib.decompress(body, 31), path.encode() * 1024)
+        # each streamed chunk decodes as soon as it is sent, not when the stream ends
+        for encoding, wbits in (('gzip', 31), ('deflate', 15)):
+            with self.subTest(encoding=encoding):
+                produced.clear()
+                response = client.get('/stream', buffered=False, headers={'Accept-Encoding': encoding})
+                self.assertEqual(response.headers['Content-Encoding'], encoding)
+                decoder = zlib.decompressobj(wbits)
+                chunks = iter(response.response)
+                for sent, part in enumerate(parts, 1):
+                    self.assertEqual(decoder.decompress(next(chunks)), part)
+                    self.assertEqual(len(produced), sent)
+                response.close()
+
+if __name__ == '__main__':
+    unittest.main()
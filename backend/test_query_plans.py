@@ -0,0 +1,151 @@
+# pylint: disable=C0114,C0115,C0116,C0301,C0303,C0304,R1732
+import os
+import re
+import sqlite3
+import tempfile
+import unittest
+import init_db
+from main import app
+from seed_db import seed_db
+from passwords import password_hasher
+
+ANSWERS = {
+    'living_space': 'apartment',
+    'activity_level': 'high',
+    'maintenance_level': 'medium',
+    'budget': 'high',
+    'pet_type': 'dog'
+}
+
+def walks(conn, sql):
+    """Return the plan steps of sql that read a whole table or index."""
+    plan = conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+    return [
+        row[3] for row in plan
+        if row[3].startswith('SCAN ') and 'VIRTUAL TABLE' not in row[3]
+        and '(subquery' not in row[3]
+    ]
+
+def full_scans(conn, sql):
+    """Return the plan steps of sql that scan a table without an index."""
+    plan = conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+    return [
+        row[3] for row in plan
+        if row[3].startswith('SCAN ') and 'INDEX' not in row[3]
+        and 'CONSTANT ROW' not in row[3] and '(subquery' not in row[3]
+    ]
+
+class TestQueryPlans(unittest.TestCase):
+    """Every filtered query the API runs must be answered from an index.
+    ---
+    tags:
+      - tests
+    description: Drives each route once, records the SQL through a trace callback and checks EXPLAIN QUERY PLAN
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.db_path = os.path.join(cls.tmp.name, 'plans.db')
+        cls.saved = (init_db.DATABASE, init_db.POOL_SIZE)
+        password_hasher.cost = 4
+        init_db.init_db(cls.db_path).close()
+        seed_db(cls.db_path)
+        # A single pooled connection means every request runs on the traced one.
+        init_db.DATABASE, init_db.POOL_SIZE = cls.db_path, 1
+        init_db.close_pool()
+        pool = init_db.get_pool()
+        conn = pool.acquire()
+        cls.statements = []
+        conn.set_trace_callback(cls.statements.append)
+        pool.release(conn)
+        cls.exercise_routes(app.test_client())
+        conn.set_trace_callback(None)
+
+    @classmethod
+    def tearDownClass(cls):
+        init_db.close_pool()
+        init_db.DATABASE, init_db.POOL_SIZE = cls.saved
+        cls.tmp.cleanup()
+
+    @staticmethod
+    def exercise_routes(client):
+        client.post('/api/register', json={'username': 'planner', 'password': 'pw'})
+        login = client.post('/api/login', json={'username': 'planner', 'password': 'pw'}).get_json()
+        auth = {'Authorization': f"Bearer {login['token']}"}
+        # admin123 is seeded as plaintext, so this also runs the rehash UPDATE
+        admin_login = client.post('/api/admin/login', json={'username': 'admin', 'password': 'admin123'}).get_json()
+        admin = {'Authorization': f"Bearer {admin_login['token']}"}
+        client.post('/api/questionnaire', headers=auth, json={'username': 'planner', 'answers': ANSWERS})
+        client.get('/api/questionnaire/planner', headers=auth)
+        client.get('/api/pets/search?q=dog+med')
+        pending = client.get('/api/admin/questionnaires', headers=admin).get_json()
+        client.post(f"/api/admin/questionnaires/{pending[0]['id']}/approve", json={'pet_ids': [1, 2]}, headers=admin)
+        client.get('/api/questionnaire/planner', headers=auth)
+        client.post('/api/questionnaire', headers=auth, json={'username': 'planner', 'answers': ANSWERS})
+        pending = client.get('/api/admin/questionnaires', headers=admin).get_json()
+        client.post(f"/api/admin/questionnaires/{pending[0]['id']}/reject", headers=admin)
+        client.post('/api/questionnaire', headers=auth, json={'username': 'planner', 'answers': ANSWERS})
+        client.post('/api/questionnaire', headers=auth, json={'username': 'planner', 'answers': ANSWERS})
+        pending = client.get('/api/admin/questionnaires', headers=admin).get_json()
+        client.post('/api/admin/questionnaires/bulk', headers=admin, json={
+            'approve': [{'questionnaire_id': pending[0]['id'], 'pet_ids': [3]}],
+            'reject': [pending[1]['id']]
+        })
+        client.get('/api/pets')
+        client.get('/api/pets/1')
+        for attribute in ('type=dog', 'size=small', 'activity_level=low', 'maintenance_level=low', 'budget=high'):
+            client.get(f'/api/pets?{attribute}&limit=2&after_id=1&fields=name')
+        created = client.post('/api/admin/adoptions', headers=auth, json={'pet_id': 1, 'username': 'planner'}).get_json()
+        client.post('/api/admin/adoptions', headers=auth, json={'pet_id': 1, 'username': 'planner'})
+        client.post('/api/admin/adoptions', json={'pet_id': 2, 'username': 'planner'},
+                    headers={**auth, 'Idempotency-Key': 'plan'})
+        client.post('/api/admin/adoptions', json={'pet_id': 2, 'username': 'planner'},
+                    headers={**auth, 'Idempotency-Key': 'plan'})
+        client.get('/api/adoptions/planner', headers=auth)
+        client.get('/api/users/planner/dashboard', headers=auth)
+        client.get('/api/admin/queue?limit=1', headers=admin)
+        client.get('/api/admin/queue?questionnaire_status=APPROVED&adoption_status=APPROVE', headers=admin)
+        client.get('/api/admin/adoptions', headers=admin)
+        client.post(f"/api/admin/adoptions/{created['request_id']}/approve", headers=admin)
+        client.post('/api/logout', headers=auth)
+        client.get('/api/adoptions/planner', headers=auth)
+
+    def lookups(self):
+        """Statements that filter rows; bare listings are scans by design."""
+        return sorted({
+            sql.strip() for sql in self.statements
+            if re.match(r'\s*(SELECT|UPDATE|DELETE)\b', sql, re.I)
+            and re.search(r'\bWHERE\b', sql, re.I)
+        })
+
+    def test_routes_were_traced(self):
+        self.assertGreaterEqual(len(self.lookups()), 8)
+
+    def test_no_full_table_scans(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for sql in self.lookups():
+                with self.subTest(sql=' '.join(sql.split())):
+                    self.assertEqual(full_scans(conn, sql), [])
+        finally:
+            conn.close()
+
+    def test_no_counts_over_history(self):
+        """Counts and groupings must not walk a table, even through a covering index."""
+        aggregates = sorted({
+            sql.strip() for sql in self.statements
+            if re.match(r'\s*SELECT\b', sql, re.I)
+            and re.search(r'\bCOUNT\s*\(|\bGROUP\s+BY\b', sql, re.I)
+        })
+        # the admin queue's counts come from the trigger-kept status_counts
+        self.assertTrue(any('status_counts' in sql for sql in self.statements))
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for sql in aggregates:
+                with self.subTest(sql=' '.join(sql.split())):
+                    self.assertEqual(walks(conn, sql), [])
+        finally:
+            conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
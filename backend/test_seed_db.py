@@ -0,0 +1,75 @@
+# pylint: disable=C0114,C0115,C0116,C0301,C0303,C0304
+import unittest
+import os
+import sqlite3
+import tempfile
+from unittest.mock import patch
+from init_db import init_db
+from seed_db import generate_data
+from passwords import password_hasher
+
+from test_apis import APITestCase
+
+class TestSeedData(APITestCase):
+    """Test suite for the seed data generator.
+    ---
+    tags:
+      - tests
+    """
+    def test_generate_data(self):
+        """Test the deterministic bulk data generator.
+        ---
+        tags:
+          - tests
+        description: The same seed yields identical databases, queue counts match and generated users can log in
+        """
+        sizes = {'pets': 200, 'users': 50, 'questionnaires': 300, 'adoptions': 100}
+        with tempfile.TemporaryDirectory() as tmp:
+            dumps = []
+            for name in ('a.db', 'b.db'):
+                path = os.path.join(tmp, name)
+                init_db(path).close()
+                counts = generate_data(path, sizes, seed=7, chunk_size=64)
+                conn = sqlite3.connect(path)
+                dumps.append(list(conn.iterdump()))
+                statuses = dict(conn.execute(
+                    "SELECT status, count(*) FROM questionnaire_answers GROUP BY status"))
+                # the queue counts were rebuilt after the trigger-less load
+                self.assertEqual(dict(conn.execute(
+                    "SELECT status, n FROM status_counts WHERE table_name = 'questionnaire_answers'"
+                )), statuses)
+                stored = conn.execute(
+                    "SELECT password FROM users WHERE username = 'user2'").fetchone()[0]
+                # the search index was rebuilt to match the loaded pets
+                conn.execute("INSERT INTO pets_fts (pets_fts, rank) VALUES ('integrity-check', 1)")
+                conn.close()
+            self.assertEqual(dumps[0], dumps[1])
+            self.assertEqual(counts['pets'], 200)
+            self.assertEqual(counts['adoptions'], 100)
+            self.assertEqual(sum(statuses.values()), 300)
+            self.assertGreater(statuses['APPROVED'], statuses['PENDING'])
+            self.assertTrue(password_hasher.verify('password123', stored)[0])
+            # a registered name of the generated form is skipped, not duplicated
+            path = os.path.join(tmp, 'c.db')
+            init_db(path).close()
+            conn = sqlite3.connect(path)
+            conn.execute("INSERT INTO users (username, password) VALUES ('user4', 'x')")
+            conn.commit()
+            schema = conn.execute("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall()
+            conn.close()
+            generate_data(path, {'users': 5}, seed=7)
+            conn = sqlite3.connect(path)
+            names = [row[0] for row in conn.execute("SELECT username FROM users ORDER BY id")]
+            conn.close()
+            self.assertEqual(names, ['testuser', 'user4', 'user5', 'user6', 'user7', 'user8', 'user9'])
+            # a failed load still puts back every index and trigger it dropped
+            with patch('seed_db._generate', side_effect=sqlite3.OperationalError('boom')):
+                with self.assertRaises(sqlite3.OperationalError):
+                    generate_data(path, {'pets': 5}, seed=7)
+            conn = sqlite3.connect(path)
+            self.assertEqual(conn.execute(
+                "SELECT name, sql FROM sqlite_master ORDER BY name").fetchall(), schema)
+            conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,261 @@
+# pylint: disable=C0114,C0115,C0116,C0301,C0303,C0304
+import unittest
+import http.client
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+import tempfile
+from main import app
+from async_server import AsyncWSGIServer
+from events import event_broadcaster
+
+from test_apis import APITestCase
+
+class TestServers(APITestCase):
+    """Test suite for the serving modes and the event stream.
+    ---
+    tags:
+      - tests
+    """
+    def test_async_server(self):
+        """Test the asyncio serving mode.
+        ---
+        tags:
+          - tests
+        description: Keep-alive requests, request bodies and graceful shutdown through AsyncWSGIServer
+        """
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(16)
+        server = AsyncWSGIServer(app, sock, threads=2)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', sock.getsockname()[1], timeout=10)
+            conn.request('GET', '/api/pets/1')
+            response = conn.getresponse()
+            self.assertEqual(response.status, 200)
+            self.assertEqual(json.loads(response.read())['name'], 'Max')
+            # same connection, with a body
+            conn.request('POST', '/api/login', body=json.dumps(
+                {'username': 'testuser', 'password': 'password123'}),
+                headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            self.assertEqual(response.status, 200)
+            self.assertIn('token', json.loads(response.read()))
+            conn.request('GET', '/api/users/testuser/dashboard', headers=self.auth())
+            response = conn.getresponse()
+            self.assertEqual(response.status, 200)
+            self.assertEqual(json.loads(response.read())['username'], 'testuser')
+            conn.close()
+            # refused before any of the body is read
+            for length, status in (('-1', 400), (str(server.max_body + 1), 413)):
+                with socket.create_connection(sock.getsockname()[:2], timeout=10) as raw:
+                    raw.sendall(f'POST /api/login HTTP/1.1\r\nHost: x\r\n'
+                                f'Content-Length: {length}\r\n\r\n'.encode('ascii'))
+                    self.assertTrue(raw.recv(1024).startswith(f'HTTP/1.1 {status} '.encode()))
+            # and the threaded server's app applies the same limit
+            self.assertEqual(self.app.post('/api/login', data=b'x' * (server.max_body + 1),
+                                           content_type='application/json').status_code, 413)
+        finally:
+            server.shutdown()
+            thread.join(10)
+            server.drain()
+        self.assertFalse(thread.is_alive())
+
+    def test_serve_workers_share_tokens(self):
+        """Test that a token issued by one pre-forked worker opens every worker until logout.
+        ---
+        tags:
+          - tests
+        description: Without SECRET_KEY serve.py gives all workers one key; a logout on one worker revokes the token on all
+        """
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, True)
+        env = {key: value for key, value in os.environ.items() if key != 'SECRET_KEY'}
+        env.update(DATABASE=self.db_path, METRICS_DIR=metrics_dir, BCRYPT_COST='4',
+                   ENABLE_SWAGGER='0', LOG_LEVEL='WARNING', EVENTS_POLL_MS='50')
+        backend_dir = os.path.dirname(os.path.abspath(__file__))
+
+        def request(method, path, body=None, headers=None):
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                return response.status, response.read()
+            finally:
+                conn.close()
+
+        with subprocess.Popen(
+            [sys.executable, 'serve.py', '--host', '127.0.0.1', '--port', str(port),
+             '--workers', '3', '--threads', '2'],
+            cwd=backend_dir, env=env, stderr=subprocess.DEVNULL) as master:
+            try:
+                for _ in range(100):
+                    try:
+                        request('GET', '/api/test')
+                        break
+                    except OSError:
+                        time.sleep(0.1)
+                status, body = request('POST', '/api/login', json.dumps(
+                    {'username': 'testuser', 'password': 'password123'}),
+                    {'Content-Type': 'application/json'})
+                self.assertEqual(status, 200)
+                headers = {'Authorization': f"Bearer {json.loads(body)['token']}"}
+                # a new connection each time, so the workers take turns accepting
+                statuses = [request('GET', '/api/adoptions/testuser', headers=headers)[0]
+                            for _ in range(60)]
+                self.assertEqual(statuses, [200] * 60)
+                self.assertEqual(request('POST', '/api/logout', headers=headers)[0], 200)
+                # the other workers hear of it at their next events poll
+                time.sleep(0.5)
+                statuses = [request('GET', '/api/adoptions/testuser', headers=headers)[0]
+                            for _ in range(30)]
+                self.assertEqual(statuses, [401] * 30)
+            finally:
+                master.terminate()
+                master.wait(30)
+        served = self._statuses_per_worker(metrics_dir, '/api/adoptions/<username>')
+        # several workers accepted the token, and several refused it after the logout
+        self.assertGreater(sum('200' in statuses for statuses in served.values()), 1)
+        self.assertGreater(sum('401' in statuses for statuses in served.values()), 1)
+
+    @staticmethod
+    def _statuses_per_worker(metrics_dir, route):
+        """Response statuses each worker's metrics file recorded for route."""
+        served = {}
+        for name in os.listdir(metrics_dir):
+            with open(os.path.join(metrics_dir, name), encoding='utf-8') as f:
+                for metric, labels, _value in json.load(f)['series']:
+                    labels = dict(labels)
+                    if metric == 'http_request_duration_seconds' and labels['route'] == route:
+                        served.setdefault(name, set()).add(labels['status'])
+        return served
+
+    def _wait_for_events(self, condition):
+        """Poll the broadcaster's stats until condition(stats) holds."""
+        for _ in range(200):
+            if condition(event_broadcaster.stats()):
+                return
+            threading.Event().wait(0.01)
+        self.fail(f"events never reached the expected state: {event_broadcaster.stats()}")
+
+    def test_event_stream(self):
+        """Test the status change event stream.
+        ---
+        tags:
+          - tests
+        description: Users get their own changes as they commit, admins all; resume, reset, lag
+        """
+        self.assertEqual(self.app.get('/api/events').status_code, 401)
+        self.assertEqual(self.app.get('/api/events?username=someone',
+                                      headers=self.auth()).status_code, 403)
+        answers = {
+            'living_space': 'apartment',
+            'activity_level': 'low',
+            'maintenance_level': 'low',
+            'budget': 'medium',
+            'pet_type': 'cat'
+        }
+        self.app.post('/api/register', json={'username': 'otheruser', 'password': 'password123'})
+        for username in ('testuser', 'otheruser'):
+            self.app.post('/api/questionnaire', headers=self.auth(username),
+                          json={'username': username, 'answers': answers})
+        self.app.post('/api/admin/adoptions', headers=self.auth(), json={'pet_id': 2, 'username': 'testuser'})
+
+        response = self.app.get('/api/events', headers=self.auth(), buffered=False)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertNotIn('Content-Encoding', response.headers)
+        stream = iter(response.response)
+        self.assertEqual(next(stream), b'retry: 3000\n\n')
+        self.app.post('/api/admin/questionnaires/2/reject', headers=self.admin)   # otheruser's: filtered out
+        self.app.post('/api/admin/questionnaires/1/reject', headers=self.admin)
+        self.assertEqual(next(stream).decode(), 'id: 2\nevent: questionnaire\ndata: '
+                         '{"type":"questionnaire","username":"testuser","id":1,"status":"REJECTED"}'
+                         '\n\n')
+        # token revocations travel through the events table but never reach a stream
+        self.app.post('/api/logout', headers=self.auth())
+        self.app.post('/api/admin/adoptions/1/approve', headers=self.admin)
+        event = json.loads(next(stream).decode().split('data: ')[1])
+        self.assertEqual((event['type'], event['pet_name'], event['status']),
+                         ('adoption', 'Bella', 'APPROVE'))
+        response.close()
+        self.assertEqual(event_broadcaster.stats()['streams'], 0)
+
+        admin = self.auth('admin', 'admin')
+        response = self.app.get('/api/events', headers={**admin, 'Last-Event-ID': '1'},
+                                buffered=False)
+        head = next(iter(response.response)).decode()
+        response.close()
+        self.assertEqual(re.findall(r'^id: (\d+)$', head, re.M), ['2', '4'])
+
+        settings = {name: getattr(event_broadcaster, name) for name in (
+            'buffer_size', 'subscriber_buffer', 'poll_interval', 'keepalive', 'max_streams',
+            'max_blocking_streams')}
+        self.addCleanup(event_broadcaster.configure, **settings)
+        event_broadcaster.configure(**{**settings, 'buffer_size': 2, 'subscriber_buffer': 1})
+        response = self.app.get('/api/events', headers={**admin, 'Last-Event-ID': '0'},
+                                buffered=False)
+        stream = iter(response.response)
+        self.assertIn(b'event: reset\n', next(stream))   # event 1 has left the ring
+        dropped = event_broadcaster.stats()['dropped_streams']
+        self.app.post('/api/admin/questionnaires/1/reject', headers=self.admin)
+        self.app.post('/api/admin/questionnaires/2/reject', headers=self.admin)
+        self._wait_for_events(lambda stats: stats['dropped_streams'] > dropped)
+        # the slow stream gets what it buffered, then ends; the client resumes from there
+        self.assertEqual([re.findall(rb'^id: (\d+)$', chunk, re.M) for chunk in stream], [[b'5']])
+        response.close()
+
+    def test_event_stream_async(self):
+        """Test that event streams hold no thread under the asyncio server.
+        ---
+        tags:
+          - tests
+        description: With one executor thread, a stream stays open while other requests run
+        """
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(16)
+        server = AsyncWSGIServer(app, sock, threads=1)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            port = sock.getsockname()[1]
+            events = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            events.request('GET', '/api/events', headers=self.auth())
+            stream = events.getresponse()
+            self.assertEqual(stream.status, 200)
+            self.assertEqual(stream.readline(), b'retry: 3000\n')
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            conn.request('POST', '/api/admin/adoptions', body=json.dumps(
+                {'pet_id': 1, 'username': 'testuser'}),
+                headers={**self.auth(), 'Content-Type': 'application/json'})
+            created = conn.getresponse()
+            created.read()
+            self.assertEqual(created.status, 201)
+            conn.request('POST', '/api/admin/adoptions/1/reject', headers=self.admin)
+            self.assertEqual(conn.getresponse().status, 200)
+            conn.close()
+            lines = [stream.readline() for _ in range(4)]
+            self.assertEqual(lines[:3], [b'\n', b'id: 1\n', b'event: adoption\n'])
+            self.assertIn(b'"status":"REJECT"', lines[3])
+            # shutting the worker down ends open streams so the drain can finish
+            event_broadcaster.close()
+            events.close()
+        finally:
+            server.shutdown()
+            thread.join(10)
+            server.drain()
+        self.assertFalse(thread.is_alive())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+# pylint: disable=R0902
+import contextlib
+import functools
+import inspect
+import os
+import threading
+import time
+from flask import g, has_app_context, has_request_context, jsonify, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from events import event_broadcaster, record_events
+from init_db import get_pool
+
+TOKEN_TTL = int(os.environ.get('TOKEN_TTL', 3600))
+REVOKED_EVENT = 'token_revoked'
+PRUNE_INTERVAL = 60.0   # seconds between sweeps of expired entries from the revoked map
+
+class TokenIssuer:
+    """Signed, expiring access tokens verified without touching the database.
+
+    A token carries the username, role and a random token id (jti), signed
+    with itsdangerous. Verification is an HMAC check plus a lookup in an
+    in-memory map of revoked jtis to their expiry. revoke() records the
+    jti in the revoked_tokens table and, in the same transaction, as an
+    event: every worker's event poller adds it to its map within a poll
+    interval (this worker's at once), and the table is what a worker loads
+    when its poller starts. Entries are dropped once the token would have
+    expired anyway. SECRET_KEY must be shared by all workers; without it
+    each process signs with its own random key.
+    """
+
+    def __init__(self, secret=None, ttl=TOKEN_TTL):
+        self.ttl = ttl
+        self._revoked = {}   # jti -> unix time the token expires
+        self._lock = threading.Lock()
+        self._synced = False
+        self._next_prune = 0.0
+        self.configure(secret or os.environ.get('SECRET_KEY') or os.urandom(32).hex())
+        event_broadcaster.listen(REVOKED_EVENT, self._on_revoked, self._load_revoked)
+
+    def configure(self, secret=None, ttl=None):
+        """Switch signing key and/or lifetime; tokens signed with an old key stop verifying."""
+        if secret:
+            self.secret = secret
+            self._serializer = URLSafeTimedSerializer(secret, salt='access-token')
+        if ttl:
+            self.ttl = ttl
+
+    def issue(self, username, role='user'):
+        return self._serializer.dumps({'sub': username, 'role': role, 'jti': os.urandom(8).hex()})
+
+    def verify(self, token):
+        """Claims dict for a valid, unexpired, unrevoked token, else None."""
+        try:
+            claims = self._serializer.loads(token, max_age=self.ttl)
+        except (SignatureExpired, BadSignature):
+            return None
+        if not self._synced:
+            event_broadcaster.sync()   # once per worker: loads the revoked jtis
+        return None if claims.get('jti') in self._revoked else claims
+
+    def revoke(self, claims):
+        """Reject a verified token's claims in every worker from now until it expires."""
+        now = time.time()
+        expires_at = now + self.ttl
+        with _connection() as conn:
+            conn.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (now,))
+            conn.execute("INSERT OR REPLACE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)",
+                         (claims['jti'], expires_at))
+            record_events(conn, [(REVOKED_EVENT, claims['sub'],
+                                  {'jti': claims['jti'], 'expires_at': expires_at})])
+            conn.commit()
+        self._add_revoked([(claims['jti'], expires_at)])
+        event_broadcaster.notify()
+
+    def _on_revoked(self, _username, data):
+        self._add_revoked([(data['jti'], data['expires_at'])])
+
+    def _load_revoked(self, conn):
+        rows = conn.execute("SELECT jti, expires_at FROM revoked_tokens WHERE expires_at > ?",
+                            (time.time(),)).fetchall()
+        with self._lock:
+            self._revoked = dict(rows)
+        self._synced = True
+
+    def _add_revoked(self, entries):
+        now = time.time()
+        with self._lock:
+            if now >= self._next_prune:
+                # expired tokens fail the signature check anyway
+                self._revoked = {jti: at for jti, at in self._revoked.items() if at > now}
+                self._next_prune = now + PRUNE_INTERVAL
+            self._revoked.update(entries)
+
+    def stats(self):
+        return {'ttl': self.ttl, 'revoked': len(self._revoked)}
+
+@contextlib.contextmanager
+def _connection():
+    """The request's connection if it has one, else a pooled one for just this write.
+
+    Borrowing instead of get_db_connection() keeps async views, whose
+    queries run on db_executor threads, from pinning a connection for the
+    whole request only to record a logout.
+    """
+    if has_app_context() and 'db_conn' in g:
+        yield g.db_conn
+        return
+    pool = get_pool()
+    conn = pool.acquire()
+    conn.begin(request.url_rule.rule if has_request_context() and request.url_rule else None)
+    try:
+        yield conn
+    finally:
+        if has_app_context():
+            g.db_seconds = g.get('db_seconds', 0.0) + conn.take_db_time()
+        pool.release(conn)
+
+# Shared by the login handlers and require_token
+token_issuer = TokenIssuer()
+
+def bearer_token():
+    header = request.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' else None
+
+def require_token(role=None, owner_arg=None):
+    """Route decorator that requires a valid bearer token.
+
+    role limits access to tokens of that role. owner_arg names a URL
+    argument holding a username: user tokens may only access their own,
+    admin tokens may access any. The verified claims are left in g.token.
+    Works on `async def` views too.
+    """
+    def denied(kwargs):
+        token = bearer_token()
+        claims = token_issuer.verify(token) if token else None
+        if claims is None:
+            return jsonify({'error': 'Invalid or missing token'}), 401
+        if role and claims['role'] != role:
+            return jsonify({'error': 'Forbidden'}), 403
+        if (owner_arg and claims['role'] != 'admin'
+                and kwargs.get(owner_arg) != claims['sub']):
+            return jsonify({'error': 'Forbidden'}), 403
+        g.token = claims
+        return None
+
+    def decorator(view):
+        if inspect.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(*args, **kwargs):
+                return denied(kwargs) or await view(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            return denied(kwargs) or view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,51 +1,36 @@
 import { useState, useEffect } from 'react';
 
+// Every admin route checks the token issued at admin login
+const adminHeaders = () => ({ Authorization: `Bearer ${localStorage.getItem('adminToken')}` });
+
 export default function AdminDashboard() {
   const [questionnaires, setQuestionnaires] = useState([]);
   const [adoptions, setAdoptions] = useState([]);
   const [selectedQuestionnaire, setSelectedQuestionnaire] = useState(null);
   const [pets, setPets] = useState([]);  // state to store available pets
   const [petChoices, setPetChoices] = useState({});  // Track admin pet recommendations keyed by questionnaire id
+  const [counts, setCounts] = useState(null);  // per-status totals from the queue endpoint
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
   useEffect(() => {
-    // Fetch questionnaires from admin route
-    fetch('http://localhost:5000/api/admin/questionnaires')
+    // Pending questionnaires and adoption requests, oldest first, in one call
+    fetch('http://localhost:5000/api/admin/queue', { headers: adminHeaders() })
       .then(r => {
-        if (!r.ok) throw new Error('Failed to fetch questionnaires');
+        if (!r.ok) throw new Error('Failed to fetch admin queue');
         return r.json();
       })
       .then(data => {
-        console.log('Fetched questionnaires:', data);
-        setQuestionnaires(data);
-      })
-      .catch(err => {
-        console.error('Error fetching questionnaires:', err);
-        setError('Failed to load questionnaires');
-      });
-
-    // Fetch adoption requests
-    console.log("DEBUG: Fetching adoptions for admin");
-    fetch('http://localhost:5000/api/admin/adoptions')
-      .then(r => {
-        console.log("DEBUG: Adoption response status:", r.status);
-        return r.text();
-      })
-      .then(text => {
-        console.log("DEBUG: Raw adoption response text:", text);
-        try {
-          const data = JSON.parse(text);
-          console.log("DEBUG: Parsed adoption data:", data);
-          setAdoptions(data);
-        } catch (err) {
-          console.error("DEBUG: JSON parse error in adoption response:", err);
-          setError("Failed to load adoption requests");
-        }
+        setQuestionnaires(data.questionnaires.items);
+        setAdoptions(data.adoptions.items);
+        setCounts({
+          questionnaires: data.questionnaires.counts,
+          adoptions: data.adoptions.counts
+        });
       })
       .catch(err => {
-        console.error("DEBUG: Error fetching adoptions:", err);
-        setError("Failed to load adoption requests");
+        console.error('Error fetching admin queue:', err);
+        setError('Failed to load the admin queue');
       });
 
     // Fetch the pet list for the dropdown
@@ -91,7 +76,7 @@ export default function AdminDashboard() {
 
     fetch(`http://localhost:5000/api/admin/${type}/${id}/${action}`, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { ...adminHeaders(), 'Content-Type': 'application/json' },
       body: JSON.stringify(payload)
     })
       .then(r => {
@@ -159,7 +144,9 @@ export default function AdminDashboard() {
       )}
       
       <section style={{ width: '80%', maxWidth: '800px', marginTop: '2rem' }}>
-        <h2 style={{ fontSize: '1.5rem' }}>Questionnaire Reviews</h2>
+        <h2 style={{ fontSize: '1.5rem' }}>
+          Questionnaire Reviews{counts && ` (${counts.questionnaires.PENDING} pending)`}
+        </h2>
         <ul style={{ listStyle: 'none', padding: 0 }}>
           {questionnaires.length > 0 ? (
             questionnaires.map(q => (
@@ -193,7 +180,7 @@ export default function AdminDashboard() {
                     <table style={{ width: '100%', borderCollapse: 'collapse' }}>
                       <tbody>
                         {Object.entries(q)
-                          .filter(([key]) => !['id', 'username', 'status'].includes(key))
+                          .filter(([key]) => !['id', 'username', 'status', 'suggested_pets'].includes(key))
                           .map(([key, value]) => (
                             <tr key={key}>
                               <td style={{ padding: '5px', borderBottom: '1px solid #eee', fontWeight: 'bold' }}>
@@ -211,7 +198,7 @@ export default function AdminDashboard() {
                     <label style={{ marginRight: '10px' }}>
                       Choose Recommended Pet:
                       <select
-                        value={petChoices[q.id] || ''}
+                        value={petChoices[q.id] || q.suggested_pets?.[0]?.id || ''}
                         onChange={(e) =>
                           setPetChoices({ ...petChoices, [q.id]: e.target.value })
                         }
@@ -233,7 +220,7 @@ export default function AdminDashboard() {
                     </label>
                     <div style={{ display: 'flex', gap: '10px', marginTop: '10px' }}>
                       <button
-                        onClick={() => handleAction('questionnaires', q.id, 'approve', petChoices[q.id])}
+                        onClick={() => handleAction('questionnaires', q.id, 'approve', petChoices[q.id] || q.suggested_pets?.[0]?.id)}
                         style={{
                           padding: '0.4em 0.8em',
                           fontSize: '0.9rem',
@@ -270,7 +257,9 @@ export default function AdminDashboard() {
       </section>
       
       <section style={{ width: '80%', maxWidth: '800px', marginTop: '2rem' }}>
-        <h2 style={{ fontSize: '1.5rem' }}>Adoption Requests</h2>
+        <h2 style={{ fontSize: '1.5rem' }}>
+          Adoption Requests{counts && ` (${counts.adoptions.PENDING} pending)`}
+        </h2>
         <ul style={{ listStyle: 'none', padding: 0 }}>
           {adoptions.length > 0 ? (
             adoptions.map(a => (
@@ -42,6 +42,7 @@ function AdminLogin() {
 
       console.log('Admin login successful:', data);
       localStorage.setItem('adminUsername', data.admin.username);
+      localStorage.setItem('adminToken', data.token);
       alert('Admin login successful!');
       setFormData({ username: '', password: '' });
       navigate('/admin-dashboard');
@@ -18,67 +18,87 @@ export default function Dashboard() {
   };
 
   useEffect(() => {
-    // Fetch questionnaire data for the current user.
-    fetch(`http://localhost:5000/api/questionnaire/${user}`)
+    const headers = { Authorization: `Bearer ${localStorage.getItem('token')}` };
+    let closed = false;
+    let controller = null;
+    let timer = null;
+
+    // One round trip: questionnaire state plus adoption requests with their pets.
+    const load = () => fetch(`http://localhost:5000/api/users/${user}/dashboard`, { headers })
       .then(r => {
         if (!r.ok) {
-          throw new Error('Failed to fetch questionnaire');
+          throw new Error('Failed to fetch dashboard');
         }
         return r.json();
       })
       .then(data => {
-        console.log('Fetched questionnaire data:', data);
-        if (data.answers) {
-          console.log('Questionnaire answers:', data.answers);
-        } else {
-          console.warn('No answers found in the questionnaire data');
+        if (data.questionnaire) {
+          setQuestionnaire(data.questionnaire);
         }
-        setQuestionnaire(data);
+        setAdoptions(data.adoptions);
+        const pending = data.adoptions.find(a => a.status === "PENDING");
+        setPendingAdoption(pending && pending.pet ? pending : null);
+        setPendingPet(pending && pending.pet ? pending.pet : null);
       })
-      .catch(error => console.error('Error fetching questionnaire:', error));
-  }, [user]);
+      .catch(error => console.error('Error fetching dashboard:', error));
 
-  useEffect(() => {
-    console.log("DEBUG: Fetching adoptions for user", user);
-    fetch(`http://localhost:5000/api/adoptions/${user}`)
-      .then(r => {
-        console.log("DEBUG: Adoption response status:", r.status);
-        return r.text();  // first get as text for debugging
-      })
-      .then(text => {
-        console.log("DEBUG: Adoption response text:", text);
-        try {
-          const data = JSON.parse(text);
-          setAdoptions(data);
-        } catch (err) {
-          console.error("DEBUG: JSON parse error:", err);
+    // Reload whenever an admin decides on our questionnaire or adoption requests.
+    // EventSource cannot send the Authorization header, so read the stream with fetch
+    // and resume from the last event id on reconnect.
+    let lastEventId = null;
+    let retry = 3000;
+    const subscribe = async () => {
+      controller = new AbortController();
+      try {
+        const response = await fetch(`http://localhost:5000/api/events?username=${user}`, {
+          headers: lastEventId ? { ...headers, 'Last-Event-ID': lastEventId } : headers,
+          signal: controller.signal
+        });
+        if (!response.ok) {
+          throw new Error('Failed to open event stream');
         }
-      })
-      .catch(error => {
-        console.error("DEBUG: Error fetching adoptions:", error);
-      });
-  }, [user]);
-
-  useEffect(() => {
-    // Find a pending adoption request.
-    const pending = adoptions.find(a => a.status === "PENDING");
-    if (pending && pending.pet_id) {
-      setPendingAdoption(pending);
-      // Fetch full pet details for the pending adoption request.
-      fetch(`http://localhost:5000/api/pets/${pending.pet_id}`)
-        .then(response => {
-          if (!response.ok) {
-            throw new Error('Failed to fetch pending pet details');
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffered = '';
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) {
+            break;
           }
-          return response.json();
-        })
-        .then(petData => {
-          console.log('Fetched pending pet details:', petData);
-          setPendingPet(petData);
-        })
-        .catch(err => console.error('Error fetching pending pet details:', err));
-    }
-  }, [adoptions]);
+          buffered += value;
+          const messages = buffered.split('\n\n');
+          buffered = messages.pop();
+          if (messages.some(message => message.split('\n').some(line => {
+            if (line.startsWith('id: ')) {
+              lastEventId = line.slice(4);
+            } else if (line.startsWith('retry: ')) {
+              retry = Number(line.slice(7));
+            }
+            return line.startsWith('event: ');
+          }))) {
+            load();
+          }
+        }
+      } catch (error) {
+        if (closed) {
+          return;
+        }
+        console.error('Event stream error:', error);
+      }
+      if (!closed) {
+        timer = setTimeout(subscribe, retry);
+      }
+    };
+
+    load();
+    subscribe();
+    return () => {
+      closed = true;
+      clearTimeout(timer);
+      if (controller) {
+        controller.abort();
+      }
+    };
+  }, [user]);
 
   return (
     <div style={{
@@ -60,8 +60,9 @@ function LoginPage() {
 
         console.log('Login successful:', data);
         
-        // Store username in localStorage
+        // Store username and access token in localStorage
         localStorage.setItem('username', formData.username);
+        localStorage.setItem('token', data.token);
 
         alert('Login successful!');
         setFormData({
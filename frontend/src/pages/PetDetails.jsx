@@ -34,7 +34,10 @@ function PetDetails() {
 
     fetch(`http://localhost:5000/api/admin/adoptions`, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: {
+        Authorization: `Bearer ${localStorage.getItem('token')}`,
+        'Content-Type': 'application/json'
+      },
       body: JSON.stringify({ pet_id: id, username })
     })
       .then(response => {
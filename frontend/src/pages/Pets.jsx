@@ -1,21 +1,30 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 
+const PAGE_SIZE = 50;
+
 function Pets() {
   const navigate = useNavigate();
   const [pets, setPets] = useState([]);
   const [error, setError] = useState(null);
+  const [nextAfterId, setNextAfterId] = useState(null);  // keyset cursor for the next page
 
-  useEffect(() => {
-    fetch('http://localhost:5000/api/pets')
+  // Only request the columns this list renders, one page at a time.
+  const loadPage = (afterId = 0) => {
+    fetch(`http://localhost:5000/api/pets?fields=name,type&limit=${PAGE_SIZE}&after_id=${afterId}`)
       .then(response => {
         if (!response.ok) {
           throw new Error('Network response was not ok');
         }
+        setNextAfterId(response.headers.get('X-Next-After-Id'));
         return response.json();
       })
-      .then(data => setPets(data))
+      .then(data => setPets(prev => (afterId ? [...prev, ...data] : data)))
       .catch(err => setError(err));
+  };
+
+  useEffect(() => {
+    loadPage();
   }, []);
 
   const handlePetClick = id => {
@@ -76,6 +85,13 @@ function Pets() {
               </button>
             </li>
           ))}
+          {nextAfterId && (
+            <li>
+              <button onClick={() => loadPage(nextAfterId)} style={{ padding: '0.5rem 1rem', cursor: 'pointer' }}>
+                Load more
+              </button>
+            </li>
+          )}
         </ul>
       ) : (
         <p style={{ fontSize: '1.2rem' }}>